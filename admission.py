@@ -0,0 +1,218 @@
+"""
+Admission checks run before an upload is accepted.
+
+Keeps nodes healthy under sustained load by refusing work the node cannot
+hold, instead of failing half way through a job.
+
+Memory: rendered pages dominate a job's footprint. Rendering runs ahead of
+extraction, so in the worst case every page image of the document is held at
+once. plan_render reads only the page sizes of a PDF and estimates that peak for
+the configured zoom. A document over the per-job limit is rendered at a lower
+zoom, and one that fits at no zoom down to MIN_RENDER_ZOOM is rejected. Admitted
+jobs reserve their estimate from the node's MemoryBudget and wait while the
+budget is taken by running jobs.
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict, Optional
+
+import config
+
+# Bytes per rendered pixel (RGB) and the PNG + base64 copies of a page being sent
+BYTES_PER_PIXEL = 3
+SEND_COPIES = 2
+
+
+def check_disk_space(incoming_bytes: int, path: str = None, janitor=None) -> Optional[str]:
+    """
+    Check that accepting an upload leaves enough free disk space
+
+    When space is short and a janitor is given, artifacts are evicted first
+    to make room before the upload is refused.
+
+    Args:
+        incoming_bytes (int): Size of the upload (request Content-Length)
+        path (str): Directory the upload will be written to, defaults to the temp dir
+        janitor: Optional ArtifactJanitor used to free space
+
+    Returns:
+        Optional[str]: Reason for refusing the upload, None if it can be accepted
+    """
+    path = path or tempfile.gettempdir()
+    needed = int((incoming_bytes or 0) * config.DISK_EXPANSION_FACTOR) + config.MIN_FREE_DISK_BYTES
+
+    free = shutil.disk_usage(path).free
+    if free >= needed:
+        return None
+
+    if janitor is not None:
+        janitor.sweep(free_bytes=needed - free)
+        free = shutil.disk_usage(path).free
+        if free >= needed:
+            return None
+
+    return (f"Insufficient disk space: {free // (1024 ** 2)} MB free, "
+            f"{needed // (1024 ** 2)} MB needed for this upload")
+
+
+def page_sizes(pdf_path: str):
+    """Page sizes in points, read without rendering"""
+    import fitz  # PyMuPDF
+
+    with fitz.open(pdf_path) as doc:
+        return [(page.rect.width, page.rect.height) for page in doc]
+
+
+def estimate_render_memory(sizes, zoom: float, pages_in_flight: int = None) -> int:
+    """
+    Peak bytes of a job rendering pages of the given sizes at a zoom
+
+    All page images may be held at once, plus the encoded copies of the pages
+    being sent to the model concurrently.
+
+    Args:
+        sizes: Page sizes in points (see page_sizes)
+        zoom (float): Render zoom
+        pages_in_flight (int): Pages of one job sent at once, defaults to the
+            page scheduler's config.TENANT_MAX_PAGES_IN_FLIGHT
+    """
+    if not sizes:
+        return config.JOB_BASE_MEMORY_BYTES
+    pages = [int(width * zoom) * int(height * zoom) * BYTES_PER_PIXEL for width, height in sizes]
+    in_flight = min(len(pages), pages_in_flight or config.TENANT_MAX_PAGES_IN_FLIGHT)
+    return config.JOB_BASE_MEMORY_BYTES + sum(pages) + in_flight * SEND_COPIES * max(pages)
+
+
+def node_memory_budget() -> int:
+    """Memory jobs may reserve on this node, 0 when unknown (no limit)"""
+    if config.NODE_MEMORY_BUDGET_BYTES:
+        return config.NODE_MEMORY_BUDGET_BYTES
+    try:
+        physical = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return 0
+    return int(physical * config.NODE_MEMORY_FRACTION)
+
+
+def plan_render(pdf_path: str, pages_in_flight: int = None) -> Dict:
+    """
+    Pick the render zoom of a document from its estimated peak memory
+
+    Args:
+        pdf_path (str): Path to the PDF file
+        pages_in_flight (int): Pages sent at once (see estimate_render_memory)
+
+    Returns:
+        Dict with "pages", "zoom" and "peak_bytes"; "zoom" is None and "error"
+        explains why when the document does not fit even at MIN_RENDER_ZOOM
+    """
+    sizes = page_sizes(pdf_path)
+    limit = config.JOB_MEMORY_MAX_BYTES or node_memory_budget()
+
+    zoom = config.RENDER_ZOOM
+    while True:
+        peak = estimate_render_memory(sizes, zoom, pages_in_flight)
+        if not limit or peak <= limit:
+            return {"pages": len(sizes), "zoom": zoom, "peak_bytes": peak}
+        lower = round(zoom - config.RENDER_ZOOM_STEP, 2)
+        if lower < config.MIN_RENDER_ZOOM:
+            return {"pages": len(sizes), "zoom": None, "peak_bytes": peak,
+                    "error": (f"Document too large: {len(sizes)} pages need ~{peak // (1024 ** 2)} MB "
+                              f"even at {zoom}x, the limit is {limit // (1024 ** 2)} MB")}
+        zoom = lower
+
+
+def check_memory(pdf_path: str, pages_in_flight: int = None) -> Optional[str]:
+    """
+    Check that a saved upload can be rendered within the memory limits
+
+    Args:
+        pdf_path (str): Path to the PDF file
+        pages_in_flight (int): Pages sent at once (see estimate_render_memory)
+
+    Returns:
+        Optional[str]: Reason for refusing the upload, None if it can be accepted
+    """
+    if not config.MEMORY_ADMISSION:
+        return None
+    return plan_render(pdf_path, pages_in_flight).get("error")
+
+
+class MemoryBudget:
+    """Memory reserved by running jobs against the node budget"""
+
+    def __init__(self, budget_bytes: int = None):
+        """
+        Args:
+            budget_bytes (int): Bytes jobs may reserve in total, 0 = unlimited
+        """
+        self.budget_bytes = node_memory_budget() if budget_bytes is None else budget_bytes
+        self.reserved = 0
+        self._condition = threading.Condition()
+
+    def reserve(self, nbytes: int, timeout: float = None) -> bool:
+        """
+        Wait until nbytes fit in the budget and reserve them
+
+        A job larger than the whole budget is admitted once nothing else runs.
+
+        Args:
+            nbytes (int): Bytes to reserve
+            timeout (float): Seconds to wait, defaults to config.ADMISSION_QUEUE_SECONDS
+
+        Returns:
+            bool: True when reserved, False when the wait timed out
+        """
+        timeout = config.ADMISSION_QUEUE_SECONDS if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self.budget_bytes and self.reserved and self.reserved + nbytes > self.budget_bytes:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            self.reserved += nbytes
+            return True
+
+    async def reserve_async(self, nbytes: int, timeout: float = None, poll: float = 0.05) -> bool:
+        """
+        reserve() for coroutines: waits on the event loop instead of blocking a thread
+
+        Args:
+            nbytes (int): Bytes to reserve
+            timeout (float): Seconds to wait, defaults to config.ADMISSION_QUEUE_SECONDS
+            poll (float): Seconds between attempts
+
+        Returns:
+            bool: True when reserved, False when the wait timed out
+        """
+        timeout = config.ADMISSION_QUEUE_SECONDS if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while not self.reserve(nbytes, timeout=0):
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(poll)
+        return True
+
+    def release(self, nbytes: int):
+        """Return a reservation"""
+        with self._condition:
+            self.reserved = max(0, self.reserved - nbytes)
+            self._condition.notify_all()
+
+
+_memory_budget = None
+_memory_budget_lock = threading.Lock()
+
+
+def get_memory_budget() -> MemoryBudget:
+    """Process-wide memory budget shared by all jobs"""
+    global _memory_budget
+    with _memory_budget_lock:
+        if _memory_budget is None:
+            _memory_budget = MemoryBudget()
+        return _memory_budget
@@ -0,0 +1,39 @@
+"""
+Parsing of amounts as they appear in extracted financial tables.
+
+Values keep the formatting of the filing: thousands separators ("13,542.40"),
+negatives in parentheses ("(135.30)"), and a dash for nil ("-").
+"""
+import re
+from typing import Optional
+
+_AMOUNT = re.compile(r'^\(?-?[0-9][0-9,]*(\.[0-9]+)?\)?%?$')
+_NIL = {'-', '–', '—', 'nil', 'Nil', 'NIL'}
+
+
+def parse_amount(text) -> Optional[float]:
+    """
+    Convert a table cell to a number
+
+    Args:
+        text: Cell value as extracted
+
+    Returns:
+        float value, 0.0 for nil markers, None for text or empty cells
+    """
+    if text is None:
+        return None
+    if isinstance(text, (int, float)):
+        return float(text)
+
+    value = str(text).strip().replace('₹', '').replace(' ', '')
+    if not value:
+        return None
+    if value in _NIL:
+        return 0.0
+    if not _AMOUNT.match(value):
+        return None
+
+    negative = value.startswith('(') and value.endswith(')')
+    number = float(value.strip('()%').replace(',', ''))
+    return -number if negative else number
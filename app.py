@@ -1,14 +1,86 @@
-from flask import Flask, request, jsonify
+from flask import Flask, has_request_context, request, jsonify
+import json
+import multiprocessing
 import os
 import tempfile
+import threading
 import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import config
+
+from admission import check_disk_space, check_memory
+from artifacts import TableCSVReader, artifact_encoding, iter_decompressed, logical_name, output_compression
+from janitor import ArtifactJanitor
+from table_index import TableIndex
+
+# Refuse to start with an artifact compression that cannot be written
+output_compression()
+
 app = Flask(__name__)
 
 # Simple in-memory storage
 results_store = {}
 
+def forget_artifact(path):
+    """Drop stored results whose files were evicted by the janitor"""
+    # The janitor reports absolute paths; output directories are stored relative
+    path = os.path.abspath(path)
+    for extraction_id, results in list(results_store.items()):
+        if any(stored and os.path.abspath(stored) == path
+               for stored in (results.get('temp_dir'), results.get('output_directory'))):
+            results_store.pop(extraction_id, None)
+    with batches_lock:
+        for batch_id, batch in list(batches.items()):
+            if os.path.abspath(batch['temp_dir']) == path:
+                batches.pop(batch_id, None)
+
+# Bulk uploads: batch id -> documents and their status (see /upload_bulk)
+batches = {}
+batches_lock = threading.Lock()
+bulk_executor = ThreadPoolExecutor(max_workers=config.BULK_DOCUMENT_WORKERS, thread_name_prefix="bulk")
+
+# Removes old uploads and extraction outputs in the background (TTL + size quota)
+janitor = ArtifactJanitor(on_evict=forget_artifact)
+# Checkpoint journals of jobs that were never resubmitted
+janitor.register_directory(config.CHECKPOINT_DIR, config.CHECKPOINT_TTL_SECONDS)
+# Render and local extraction workers re-import the main module; only the
+# serving process sweeps
+if multiprocessing.parent_process() is None:
+    janitor.start()
+
+# Line items of every extraction, queryable across filings through /query
+table_index = TableIndex()
+
+def index_extraction(extraction_id, pdf_name, csv_files, company=None):
+    """Add an extraction's tables to the line-item index (failures are only logged)"""
+    try:
+        if company is None and has_request_context():
+            company = request.form.get('company', '').strip() or None
+        table_index.ingest(extraction_id, pdf_name, csv_files, company=company)
+    except Exception as e:
+        print(f"Index error: {e}")
+
+# One extractor per API key, shared by all requests using that key; only the
+# EXTRACTOR_CACHE_SIZE most recently used keys are kept
+extractors = OrderedDict()
+extractors_lock = threading.Lock()
+
+def get_extractor(api_key):
+    """Return the shared PDFTableExtractor for an API key, creating it when not cached"""
+    with extractors_lock:
+        if api_key in extractors:
+            extractors.move_to_end(api_key)
+        else:
+            from pdf_extractor import PDFTableExtractor
+            extractors[api_key] = PDFTableExtractor(api_key)
+            # Jobs still running keep their evicted extractor alive
+            while len(extractors) > max(1, config.EXTRACTOR_CACHE_SIZE):
+                extractors.popitem(last=False)
+        return extractors[api_key]
+
 @app.route('/')
 def home():
     """Simple HTML page"""
@@ -103,6 +175,7 @@ def home():
                                 `<p><a href="/download_csv/${data.extraction_id}/${file}">📄 Download ${file}</a></p>`
                             ).join('')}
                             <p><a href="/download/${data.extraction_id}">📦 Download All (ZIP)</a></p>
+                            <p><a href="/download/${data.extraction_id}?format=xlsx">📊 Download All (XLSX)</a></p>
                         `;
                     } else {
                         message.innerHTML = `<div class="alert alert-error">❌ Error: ${data.error}</div>`;
@@ -124,6 +197,21 @@ def home():
 def health():
     return jsonify({'status': 'ok', 'message': 'Server running'})
 
+def probe_api_key(api_key):
+    """Send one test request with the key; returns an error response, or None if the key works"""
+    print("Testing API key...")
+    try:
+        # Quick test
+        get_extractor(api_key).transport.generate("Hello")
+        print("✓ API key works")
+        return None
+    except ImportError as e:
+        print(f"Import error: {e}")
+        return jsonify({'error': 'google-generativeai not installed'}), 500
+    except Exception as e:
+        print(f"API error: {e}")
+        return jsonify({'error': f'Invalid API key: {str(e)}'}), 400
+
 @app.route('/upload', methods=['POST'])
 def upload():
     """Handle file upload with maximum error protection"""
@@ -147,23 +235,33 @@ def upload():
         if not file or not file.filename:
             return jsonify({'error': 'No file selected'}), 400
             
-        if not api_key:
-            return jsonify({'error': 'API key required'}), 400
-            
         if not file.filename.lower().endswith('.pdf'):
             return jsonify({'error': 'Must be PDF file'}), 400
         
+        mode = request.form.get('mode', 'local').strip().lower()
+        if mode not in ('local', 'model'):
+            return jsonify({'error': f'Unknown mode: {mode}'}), 400
+        
+        # Local extraction does not call the model
+        if mode == 'model' and not api_key:
+            return jsonify({'error': 'API key required'}), 400
+        
+        # Keys that used up their token budget are refused before any work
+        if mode == 'model':
+            from usage import get_token_ledger
+            if get_token_ledger().exhausted(api_key):
+                return jsonify({'error': 'Token budget exhausted for this API key, try again later'}), 429
+        
+        # Refuse the upload early if the node cannot hold it
+        disk_error = check_disk_space(request.content_length, janitor=janitor)
+        if disk_error:
+            print(f"Admission refused: {disk_error}")
+            return jsonify({'error': disk_error}), 507
+        
         # Test imports safely
         print("Testing imports...")
         try:
-            import google.generativeai as genai
-            print("✓ google.generativeai imported")
-        except ImportError as e:
-            print(f"Import error: {e}")
-            return jsonify({'error': 'google-generativeai not installed'}), 500
-            
-        try:
-            import PyMuPDF as fitz
+            import fitz  # PyMuPDF
             print("✓ PyMuPDF imported")
         except ImportError as e:
             print(f"Import error: {e}")
@@ -176,17 +274,11 @@ def upload():
             print(f"Import error: {e}")
             return jsonify({'error': 'pandas not installed'}), 500
         
-        # Test API key
-        print("Testing API key...")
-        try:
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel('gemini-2.0-flash-exp')
-            # Quick test
-            test_response = model.generate_content("Hello")
-            print("✓ API key works")
-        except Exception as e:
-            print(f"API error: {e}")
-            return jsonify({'error': f'Invalid API key: {str(e)}'}), 400
+        # Test API key through the configured transport (live, record or replay)
+        if mode == 'model':
+            key_error = probe_api_key(api_key)
+            if key_error:
+                return key_error
         
         # Save file safely
         print("Saving file...")
@@ -203,67 +295,29 @@ def upload():
         except Exception as e:
             return jsonify({'error': f'File save failed: {str(e)}'}), 500
         
-        # Process PDF (simplified)
-        print("Processing PDF...")
+        # The upload directory is tracked by the janitor whatever the outcome; a
+        # streamed job registers it itself once the extraction has finished
+        streaming = False
         try:
-            # Open PDF
-            doc = fitz.open(file_path)
-            total_pages = len(doc)
-            print(f"✓ PDF opened: {total_pages} pages")
-            
-            # Simple table extraction
-            tables_found = 0
-            csv_files = []
-            
-            for page_num in range(min(total_pages, 5)):  # Limit to 5 pages for safety
-                page = doc[page_num]
-                tables = page.find_tables()
-                
-                for i, table in enumerate(tables):
-                    try:
-                        df = table.to_pandas()
-                        if not df.empty:
-                            csv_filename = f"table_page{page_num+1}_{i+1}.csv"
-                            csv_path = os.path.join(temp_dir, csv_filename)
-                            df.to_csv(csv_path, index=False)
-                            csv_files.append(csv_path)
-                            tables_found += 1
-                            print(f"✓ Table {i+1} extracted from page {page_num+1}")
-                    except Exception as e:
-                        print(f"Table extraction error: {e}")
-                        continue
-            
-            doc.close()
-            
-            # Store results
-            results = {
-                'pdf_name': file.filename,
-                'total_pages': total_pages,
-                'pages_with_tables': len([p for p in range(total_pages) if len(doc[p].find_tables()) > 0]) if total_pages <= 5 else "Unknown",
-                'total_tables_extracted': tables_found,
-                'csv_files': csv_files,
-                'temp_dir': temp_dir
-            }
-            
-            results_store[extraction_id] = results
+            # Documents that cannot be rendered within the node's memory even at low zoom
+            if mode == 'model':
+                memory_error = check_memory(file_path)
+                if memory_error:
+                    print(f"Admission refused: {memory_error}")
+                    return jsonify({'error': memory_error}), 413
             
-            print(f"✓ Processing complete: {tables_found} tables")
-            
-            return jsonify({
-                'success': True,
-                'extraction_id': extraction_id,
-                'results': {
-                    'pdf_name': results['pdf_name'],
-                    'total_pages': results['total_pages'],
-                    'pages_with_tables': results['pages_with_tables'],
-                    'total_tables_extracted': results['total_tables_extracted'],
-                    'csv_files': [os.path.basename(f) for f in csv_files]
-                }
-            })
-            
-        except Exception as e:
-            print(f"Processing error: {e}")
-            return jsonify({'error': f'PDF processing failed: {str(e)}'}), 500
+            if mode == 'model':
+                trace = request.form.get('trace', '').strip().lower() in ('1', 'true', 'yes')
+                if request.form.get('stream', '').strip().lower() in ('1', 'true', 'yes'):
+                    company = request.form.get('company', '').strip() or None
+                    response = stream_with_model(api_key, file.filename, file_path, temp_dir, extraction_id, company)
+                    streaming = True
+                    return response
+                return process_with_model(api_key, file.filename, file_path, temp_dir, extraction_id, trace)
+            return process_locally(file.filename, file_path, temp_dir, extraction_id)
+        finally:
+            if not streaming:
+                janitor.register(temp_dir, 'upload')
         
     except Exception as e:
         print(f"General error: {e}")
@@ -271,9 +325,225 @@ def upload():
         traceback.print_exc()
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+def process_locally(pdf_name, file_path, temp_dir, extraction_id):
+    """Extract tables with PyMuPDF's find_tables, without calling the model"""
+    print("Processing PDF...")
+    try:
+        return jsonify(extract_and_store_locally(pdf_name, file_path, temp_dir, extraction_id))
+    except Exception as e:
+        print(f"Processing error: {e}")
+        return jsonify({'error': f'PDF processing failed: {str(e)}'}), 500
+
+def extract_and_store_locally(pdf_name, file_path, temp_dir, extraction_id, company=None):
+    """Run the local extraction and keep its results; returns the /upload response body"""
+    from local_extraction import extract_locally
+    
+    results = extract_locally(file_path, temp_dir, pdf_name)
+        
+    # Store results
+    results_store[extraction_id] = {
+        'pdf_name': pdf_name,
+        'total_pages': results['total_pages'],
+        'pages_with_tables': results['pages_with_tables'],
+        'total_tables_extracted': results['total_tables_extracted'],
+        'csv_files': results['csv_files'],
+        'page_results': results['page_results'],
+        'table_pages': results['table_pages'],
+        'temp_dir': temp_dir
+    }
+    index_extraction(extraction_id, pdf_name, results['csv_files'], company=company)
+    
+    print(f"✓ Processing complete: {results['total_tables_extracted']} tables")
+    
+    return {
+        'success': True,
+        'extraction_id': extraction_id,
+        'results': {
+            'pdf_name': pdf_name,
+            'total_pages': results['total_pages'],
+            'pages_with_tables': results['pages_with_tables'],
+            'total_tables_extracted': results['total_tables_extracted'],
+            'csv_files': [logical_name(f) for f in results['csv_files']]
+        }
+    }
+
+def store_model_results(extraction_id, pdf_name, results, temp_dir):
+    """Keep a finished model extraction for the download routes"""
+    results_store[extraction_id] = {
+        'pdf_name': pdf_name,
+        'total_pages': results['total_pages'],
+        'pages_with_tables': results['pages_with_tables'],
+        'total_tables_extracted': results['total_tables_extracted'],
+        'csv_files': results['csv_files'],
+        'trace_files': results.get('trace_files', {}),
+        'validation': results.get('validation', []),
+        'table_pages': results.get('table_pages', {}),
+        'model_stats': results.get('model_stats', {}),
+        'usage': results.get('usage', {}),
+        'budget_exceeded': results.get('budget_exceeded'),
+        'output_directory': results['output_directory'],
+        'temp_dir': temp_dir
+    }
+    janitor.register(results['output_directory'], 'extraction')
+
+def process_with_model(api_key, pdf_name, file_path, temp_dir, extraction_id, trace=False):
+    """Run the Gemini extraction pipeline on an uploaded PDF"""
+    print("Processing PDF with model...")
+    try:
+        results = get_extractor(api_key).process_pdf(file_path, trace=trace)
+        
+        if results.get('error'):
+            return jsonify({'error': f"PDF processing failed: {results['error']}"}), 500
+        
+        store_model_results(extraction_id, pdf_name, results, temp_dir)
+        index_extraction(extraction_id, pdf_name, results['csv_files'])
+        
+        print(f"✓ Processing complete: {results['total_tables_extracted']} tables")
+        
+        return jsonify(model_response(extraction_id, pdf_name, results))
+        
+    except Exception as e:
+        print(f"Processing error: {e}")
+        return jsonify({'error': f'PDF processing failed: {str(e)}'}), 500
+
+def model_response(extraction_id, pdf_name, results):
+    """/upload response body of a finished model extraction"""
+    return {
+        'success': True,
+        'extraction_id': extraction_id,
+        'results': {
+            'pdf_name': pdf_name,
+            'total_pages': results['total_pages'],
+            'pages_with_tables': results['pages_with_tables'],
+            'total_tables_extracted': results['total_tables_extracted'],
+            'csv_files': [logical_name(f) for f in results['csv_files']],
+            'model_stats': results.get('model_stats', {}),
+            'usage': results.get('usage', {}),
+            'budget_exceeded': results.get('budget_exceeded'),
+            'page_usage': [
+                {'page': page['page_number'], 'usage': page.get('usage'), 'image_size': page.get('image_size')}
+                for page in results.get('page_results', [])
+            ],
+            'tables_failing_checks': [
+                dict(report, csv_file=logical_name(report['csv_file']))
+                for report in results.get('validation', []) if not report['valid']
+            ]
+        }
+    }
+
+def row_records(extraction_id, table_name, title, headers, rows, pages=None, page_rows=None):
+    """
+    NDJSON records of a table's rows, each tagged with its table, page and column names
+    
+    Args:
+        rows: Iterable of rows, consumed lazily
+        pages: Source pages of the table
+        page_rows: Rows taken from each source page, locates every row's page
+    """
+    pages = list(pages or [])
+    boundaries = []
+    if page_rows and len(page_rows) == len(pages):
+        total = 0
+        for page, count in zip(pages, page_rows):
+            total += count
+            boundaries.append((total, page))
+    
+    columns = []
+    for i, header in enumerate(headers):
+        name = str(header).strip() or f"Column_{i + 1}"
+        while name in columns:
+            name = f"{name}_{i + 1}"
+        columns.append(name)
+    
+    for number, row in enumerate(rows):
+        while len(columns) < len(row):
+            columns.append(f"Column_{len(columns) + 1}")
+        if boundaries:
+            page = next((page for end, page in boundaries if number < end), boundaries[-1][1])
+        else:
+            page = pages[0] if len(pages) == 1 else None
+        yield {
+            'type': 'row',
+            'extraction_id': extraction_id,
+            'table': table_name,
+            'title': title,
+            'page': page,
+            'row': number + 1,
+            'values': dict(zip(columns, list(row) + [''] * (len(columns) - len(row))))
+        }
+
+def ndjson(record):
+    return json.dumps(record, ensure_ascii=False, default=str) + '\n'
+
+def event_lines(extraction_id, pdf_name, kind, payload, csv_path=None):
+    """
+    NDJSON lines of one streamed extraction event
+    
+    Args:
+        kind: 'table' (payload is the saved table), 'done' (payload is the
+            job's results) or 'error' (payload is the message)
+    """
+    if kind == 'table':
+        for record in row_records(extraction_id, logical_name(csv_path), payload.get('title'),
+                                  payload.get('headers', []), payload.get('data', []),
+                                  payload.get('pages'), payload.get('page_rows')):
+            yield ndjson(record)
+    elif kind == 'done' and not payload.get('error'):
+        yield ndjson({
+            'type': 'summary',
+            'extraction_id': extraction_id,
+            'pdf_name': pdf_name,
+            'total_pages': payload['total_pages'],
+            'total_tables_extracted': payload['total_tables_extracted'],
+            'csv_files': [logical_name(f) for f in payload['csv_files']]
+        })
+    else:
+        error = payload.get('error') if kind == 'done' else payload
+        yield ndjson({'type': 'error', 'extraction_id': extraction_id,
+                      'error': f'PDF processing failed: {error}'})
+
+def stream_with_model(api_key, pdf_name, file_path, temp_dir, extraction_id, company=None):
+    """Run the model pipeline and stream each table's rows as NDJSON as soon as the table is saved"""
+    from flask import Response
+    import queue
+    
+    events = queue.Queue()
+    
+    def run():
+        try:
+            results = get_extractor(api_key).process_pdf(
+                file_path, on_table=lambda table, csv_path: events.put(('table', table, csv_path)))
+            if not results.get('error'):
+                store_model_results(extraction_id, pdf_name, results, temp_dir)
+                index_extraction(extraction_id, pdf_name, results['csv_files'], company=company)
+            events.put(('done', results, None))
+        except Exception as e:
+            print(f"Processing error: {e}")
+            events.put(('error', str(e), None))
+        finally:
+            # The upload is handed to the janitor only once the PDF is no longer read
+            janitor.register(temp_dir, 'upload')
+    
+    threading.Thread(target=run, name=f"stream-{extraction_id}", daemon=True).start()
+    
+    def generate():
+        while True:
+            kind, payload, csv_path = events.get()
+            yield from event_lines(extraction_id, pdf_name, kind, payload, csv_path)
+            if kind != 'table':
+                return
+    
+    return Response(generate(), mimetype='application/x-ndjson', headers={'X-Extraction-Id': extraction_id})
+
+def touch_artifacts(results):
+    """Mark an extraction's artifacts as recently downloaded for the janitor"""
+    janitor.touch(results['temp_dir'])
+    if results.get('output_directory'):
+        janitor.touch(results['output_directory'])
+
 @app.route('/download/<extraction_id>')
 def download_zip(extraction_id):
-    """Download all CSV files as ZIP"""
+    """Download all CSV files as ZIP, or as one XLSX workbook with ?format=xlsx"""
     try:
         if extraction_id not in results_store:
             return jsonify({'error': 'Results not found'}), 404
@@ -286,12 +556,33 @@ def download_zip(extraction_id):
         import zipfile
         from flask import send_file
         
-        zip_path = os.path.join(results['temp_dir'], 'tables.zip')
+        # ?format=xlsx: one workbook with a sheet per table instead of the CSV archive
+        if request.args.get('format', 'zip').lower() == 'xlsx':
+            from xlsx_export import write_workbook
+            
+            # Named after the extraction: a batch's documents share one temp_dir
+            xlsx_path = os.path.join(results['temp_dir'], f'{extraction_id}.xlsx')
+            write_workbook([f for f in results['csv_files'] if os.path.exists(f)], xlsx_path,
+                           results.get('table_pages'))
+            
+            janitor.refresh(results['temp_dir'])
+            touch_artifacts(results)
+            
+            return send_file(xlsx_path, as_attachment=True, download_name='extracted_tables.xlsx')
+        
+        zip_path = os.path.join(results['temp_dir'], f'{extraction_id}.zip')
         
-        with zipfile.ZipFile(zip_path, 'w') as zipf:
+        # ZIP entries hold the plain CSVs, whatever the at-rest compression
+        with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED) as zipf:
             for csv_file in results['csv_files']:
                 if os.path.exists(csv_file):
-                    zipf.write(csv_file, os.path.basename(csv_file))
+                    with zipf.open(logical_name(csv_file), 'w') as entry:
+                        for chunk in iter_decompressed(csv_file):
+                            entry.write(chunk)
+        
+        # Record the new ZIP's size and mark the artifacts as recently used
+        janitor.refresh(results['temp_dir'])
+        touch_artifacts(results)
         
         return send_file(zip_path, as_attachment=True, download_name='extracted_tables.zip')
         
@@ -300,7 +591,7 @@ def download_zip(extraction_id):
 
 @app.route('/download_csv/<extraction_id>/<filename>')
 def download_csv(extraction_id, filename):
-    """Download single CSV file"""
+    """Download single CSV file, passing compressed artifacts through when the client accepts them"""
     try:
         if extraction_id not in results_store:
             return jsonify({'error': 'Results not found'}), 404
@@ -308,16 +599,277 @@ def download_csv(extraction_id, filename):
         results = results_store[extraction_id]
         
         for csv_file in results['csv_files']:
-            if os.path.basename(csv_file) == filename:
+            if filename in (logical_name(csv_file), os.path.basename(csv_file)):
                 if os.path.exists(csv_file):
-                    from flask import send_file
-                    return send_file(csv_file, as_attachment=True, download_name=filename)
+                    from flask import send_file, Response
+                    touch_artifacts(results)
+                    download_name = logical_name(csv_file)
+                    encoding = artifact_encoding(csv_file)
+                    
+                    if encoding is None:
+                        return send_file(csv_file, as_attachment=True, download_name=download_name)
+                    
+                    # Client accepts the stored encoding: send the compressed bytes as they are
+                    if encoding in request.accept_encodings:
+                        response = send_file(csv_file, mimetype='text/csv', as_attachment=True,
+                                             download_name=download_name, conditional=False)
+                        response.headers['Content-Encoding'] = encoding
+                        response.headers['Vary'] = 'Accept-Encoding'
+                        return response
+                    
+                    # Otherwise decompress on the fly
+                    return Response(
+                        iter_decompressed(csv_file),
+                        mimetype='text/csv',
+                        headers={
+                            'Content-Disposition': f'attachment; filename="{download_name}"',
+                            'Vary': 'Accept-Encoding'
+                        }
+                    )
         
         return jsonify({'error': 'File not found'}), 404
         
     except Exception as e:
         return jsonify({'error': f'Download error: {str(e)}'}), 500
 
+def bulk_paths(paths):
+    """
+    Resolve server-side PDF paths of a bulk request
+    
+    Only files under config.BULK_PATHS_ROOT are accepted.
+    
+    Returns:
+        Tuple of (list of real paths, error message or None)
+    """
+    if not config.BULK_PATHS_ROOT:
+        return [], 'Server-side paths are not enabled (BULK_PATHS_ROOT)'
+    root = os.path.realpath(config.BULK_PATHS_ROOT)
+    resolved = []
+    for path in paths:
+        real = os.path.realpath(os.path.join(root, str(path)))
+        if os.path.commonpath([root, real]) != root:
+            return [], f'Path outside the allowed directory: {path}'
+        if not real.lower().endswith('.pdf') or not os.path.isfile(real):
+            return [], f'Not a PDF file: {path}'
+        resolved.append(real)
+    return resolved, None
+
+def run_bulk_document(api_key, batch, document, file_path):
+    """Extract one document of a batch (runs on the bulk executor)"""
+    temp_dir = batch['temp_dir']
+    document['status'] = 'processing'
+    try:
+        results = get_extractor(api_key).process_pdf(file_path)
+        if results.get('error'):
+            raise RuntimeError(results['error'])
+        store_model_results(document['extraction_id'], document['pdf_name'], results, temp_dir)
+        index_extraction(document['extraction_id'], document['pdf_name'], results['csv_files'],
+                         company=document.get('company'))
+        document.update(status='done', total_pages=results['total_pages'],
+                        total_tables_extracted=results['total_tables_extracted'],
+                        csv_files=[logical_name(f) for f in results['csv_files']])
+    except Exception as e:
+        print(f"Bulk document error ({document['pdf_name']}): {e}")
+        document.update(status='failed', error=str(e))
+    finally:
+        # The batch's uploads are handed to the janitor once the last document
+        # finished, so a long batch cannot expire while it is still running
+        with batches_lock:
+            finished = all(d['status'] in ('done', 'failed') for d in batch['documents'])
+        if finished:
+            janitor.register(temp_dir, 'upload')
+
+def batch_status(batch_id, batch):
+    """Status of a batch as returned by the bulk endpoints"""
+    documents = [dict(document) for document in batch['documents']]
+    finished = sum(1 for document in documents if document['status'] in ('done', 'failed'))
+    return {
+        'batch_id': batch_id,
+        'status': 'done' if finished == len(documents) else 'running',
+        'completed': finished,
+        'total': len(documents),
+        'documents': documents,
+        'download': f'/batch/{batch_id}/download'
+    }
+
+@app.route('/upload_bulk', methods=['POST'])
+def upload_bulk():
+    """
+    Extract many PDFs with one request
+    
+    Accepts several "files" fields in one multipart request and/or "paths",
+    server-side PDFs under BULK_PATHS_ROOT (a JSON list, or one path per line).
+    The API key is checked once and the documents' pages share the page
+    scheduler. Returns a batch id right away; progress is at /batch/<id>.
+    """
+    try:
+        payload = request.get_json(silent=True) or {}
+        api_key = (request.form.get('api_key') or payload.get('api_key') or '').strip()
+        if not api_key:
+            return jsonify({'error': 'API key required'}), 400
+        
+        files = [f for f in request.files.getlist('files') + request.files.getlist('file') if f and f.filename]
+        paths = payload.get('paths') or request.form.get('paths') or []
+        if isinstance(paths, str):
+            try:
+                paths = json.loads(paths)
+            except ValueError:
+                paths = [line.strip() for line in paths.splitlines() if line.strip()]
+        
+        if not files and not paths:
+            return jsonify({'error': 'No files or paths in request'}), 400
+        if len(files) + len(paths) > config.BULK_MAX_DOCUMENTS:
+            return jsonify({'error': f'At most {config.BULK_MAX_DOCUMENTS} documents per batch'}), 413
+        if any(not f.filename.lower().endswith('.pdf') for f in files):
+            return jsonify({'error': 'Must be PDF files'}), 400
+        
+        server_paths, path_error = bulk_paths(paths)
+        if path_error:
+            return jsonify({'error': path_error}), 400
+        
+        from usage import get_token_ledger
+        if get_token_ledger().exhausted(api_key):
+            return jsonify({'error': 'Token budget exhausted for this API key, try again later'}), 429
+        
+        incoming = (request.content_length or 0) + sum(os.path.getsize(p) for p in server_paths)
+        disk_error = check_disk_space(incoming, janitor=janitor)
+        if disk_error:
+            return jsonify({'error': disk_error}), 507
+        
+        # One key check for the whole batch
+        key_error = probe_api_key(api_key)
+        if key_error:
+            return key_error
+        
+        batch_id = str(uuid.uuid4())
+        temp_dir = tempfile.mkdtemp()
+        company = (request.form.get('company') or payload.get('company') or '').strip() or None
+        
+        jobs = []
+        for f in files:
+            extraction_id = str(uuid.uuid4())
+            file_path = os.path.join(temp_dir, f"upload_{extraction_id}.pdf")
+            f.save(file_path)
+            jobs.append((extraction_id, f.filename, file_path))
+        for path in server_paths:
+            jobs.append((str(uuid.uuid4()), os.path.basename(path), path))
+        
+        batch = {'temp_dir': temp_dir, 'created': datetime.now().isoformat(), 'documents': []}
+        for extraction_id, pdf_name, file_path in jobs:
+            document = {'extraction_id': extraction_id, 'pdf_name': pdf_name, 'status': 'queued',
+                        'company': company}
+            batch['documents'].append(document)
+        with batches_lock:
+            batches[batch_id] = batch
+        
+        for document, (_, _, file_path) in zip(batch['documents'], jobs):
+            bulk_executor.submit(run_bulk_document, api_key, batch, document, file_path)
+        
+        print(f"✓ Batch {batch_id}: {len(jobs)} document(s) queued")
+        return jsonify(batch_status(batch_id, batch)), 202
+        
+    except Exception as e:
+        print(f"Bulk upload error: {e}")
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@app.route('/batch/<batch_id>')
+def batch_info(batch_id):
+    """Per-document status of a bulk upload"""
+    with batches_lock:
+        batch = batches.get(batch_id)
+    if batch is None:
+        return jsonify({'error': 'Batch not found'}), 404
+    return jsonify(batch_status(batch_id, batch))
+
+@app.route('/batch/<batch_id>/download')
+def download_batch(batch_id):
+    """Download the tables of every finished document of a batch as one ZIP"""
+    try:
+        with batches_lock:
+            batch = batches.get(batch_id)
+        if batch is None:
+            return jsonify({'error': 'Batch not found'}), 404
+        
+        import zipfile
+        from flask import send_file
+        
+        zip_path = os.path.join(batch['temp_dir'], f'batch_{batch_id}.zip')
+        folders = set()
+        
+        # One folder per document, named after the uploaded file
+        with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED) as zipf:
+            for document in batch['documents']:
+                results = results_store.get(document['extraction_id'])
+                if document['status'] != 'done' or results is None:
+                    continue
+                folder = os.path.splitext(document['pdf_name'])[0] or document['extraction_id']
+                if folder in folders:
+                    folder = f"{folder}_{document['extraction_id'][:8]}"
+                folders.add(folder)
+                for csv_file in results['csv_files']:
+                    if os.path.exists(csv_file):
+                        with zipf.open(f"{folder}/{logical_name(csv_file)}", 'w') as entry:
+                            for chunk in iter_decompressed(csv_file):
+                                entry.write(chunk)
+                touch_artifacts(results)
+        
+        if not folders:
+            return jsonify({'error': 'No finished documents in this batch yet'}), 404
+        
+        janitor.refresh(batch['temp_dir'])
+        return send_file(zip_path, as_attachment=True, download_name=f'batch_{batch_id}.zip')
+        
+    except Exception as e:
+        return jsonify({'error': f'Download error: {str(e)}'}), 500
+
+@app.route('/rows/<extraction_id>')
+def download_rows(extraction_id):
+    """Stream every row of an extraction's tables as newline-delimited JSON"""
+    if extraction_id not in results_store:
+        return jsonify({'error': 'Results not found'}), 404
+    
+    from flask import Response
+    
+    results = results_store[extraction_id]
+    touch_artifacts(results)
+    
+    def generate():
+        for csv_file in results['csv_files']:
+            if not os.path.exists(csv_file):
+                continue
+            layout = results.get('table_pages', {}).get(csv_file, {})
+            with TableCSVReader(csv_file) as table:
+                for record in row_records(extraction_id, logical_name(csv_file), table.title, table.headers,
+                                          table.rows(), table.pages or layout.get('pages'),
+                                          layout.get('page_rows')):
+                    yield ndjson(record)
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@app.route('/query')
+def query():
+    """Look up line items across all indexed extractions"""
+    try:
+        try:
+            limit = max(1, min(int(request.args.get('limit', 500)), 5000))
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        
+        facts = table_index.query(
+            line_item=request.args.get('line_item') or request.args.get('q'),
+            company=request.args.get('company'),
+            statement_type=request.args.get('statement_type'),
+            scope=request.args.get('scope'),
+            period_type=request.args.get('period_type'),
+            period_from=request.args.get('period_from'),
+            period_to=request.args.get('period_to'),
+            limit=limit
+        )
+        return jsonify({'count': len(facts), 'facts': facts})
+        
+    except Exception as e:
+        return jsonify({'error': f'Query error: {str(e)}'}), 500
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     print(f"🚀 Starting server on port {port}")
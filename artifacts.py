@@ -0,0 +1,198 @@
+"""
+Reading and writing extraction artifacts, optionally compressed at rest.
+
+CSV outputs can be stored gzip- or zstd-compressed (config.OUTPUT_COMPRESSION).
+The compressed file keeps the CSV name plus a ".gz" / ".zst" suffix; everything
+user-facing (download names, ZIP entries, result listings) uses the logical
+name without the suffix. Download routes either pass the compressed bytes
+through with a Content-Encoding header or decompress on the fly.
+"""
+import csv
+import gzip
+import io
+import re
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import config
+
+SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+ENCODINGS = {suffix: encoding for encoding, suffix in SUFFIXES.items()}
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _zstandard():
+    """Import the optional zstandard package"""
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+
+def output_compression() -> Optional[str]:
+    """
+    Compression configured for new artifacts
+
+    Returns:
+        "gzip", "zstd" or None
+
+    Raises:
+        ValueError: OUTPUT_COMPRESSION is unknown
+        RuntimeError: zstd is configured but the zstandard package is not installed
+    """
+    compression = config.OUTPUT_COMPRESSION
+    if compression in ("", "none", "off"):
+        return None
+    if compression not in SUFFIXES:
+        raise ValueError(f"Unknown OUTPUT_COMPRESSION: {compression}")
+    if compression == "zstd" and _zstandard() is None:
+        raise RuntimeError("OUTPUT_COMPRESSION=zstd needs the zstandard package")
+    return compression
+
+
+def artifact_path(path, compression: Optional[str]) -> Path:
+    """Path an artifact is stored at for the given compression"""
+    path = Path(path)
+    return path.with_name(path.name + SUFFIXES[compression]) if compression else path
+
+
+def artifact_encoding(path) -> Optional[str]:
+    """Content-Encoding of a stored artifact ("gzip", "zstd") or None"""
+    return ENCODINGS.get(Path(path).suffix)
+
+
+def logical_name(path) -> str:
+    """File name of an artifact without its compression suffix"""
+    path = Path(path)
+    return path.stem if artifact_encoding(path) else path.name
+
+
+def open_artifact(path, mode: str = 'r'):
+    """
+    Open an artifact as text, compressing or decompressing by its suffix
+
+    Args:
+        path: Artifact path (already including any compression suffix)
+        mode (str): "r" or "w"
+
+    Returns:
+        Text file object; use it as a context manager
+    """
+    encoding = artifact_encoding(path)
+    if encoding == "gzip":
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='')
+    if encoding == "zstd":
+        zstandard = _zstandard()
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read or write .zst artifacts")
+        if mode == 'w':
+            stream = zstandard.ZstdCompressor(level=config.ZSTD_LEVEL).stream_writer(open(path, 'wb'))
+        else:
+            stream = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'))
+        return io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def iter_decompressed(path, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Stream an artifact's original bytes, decompressing if needed
+
+    Args:
+        path: Artifact path
+        chunk_size (int): Bytes per chunk
+
+    Yields:
+        bytes: Decompressed chunks
+    """
+    encoding = artifact_encoding(path)
+    if encoding == "gzip":
+        stream = gzip.open(path, 'rb')
+    elif encoding == "zstd":
+        zstandard = _zstandard()
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read .zst artifacts")
+        stream = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'))
+    else:
+        stream = open(path, 'rb')
+
+    with stream:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def unescape_cell(value: str) -> str:
+    """Undo the leading quote added to stop Excel reading text as a formula"""
+    if value.startswith("'") and value[1:2] in ('-', '=', '+'):
+        return value[1:]
+    return value
+
+
+class TableCSVReader:
+    """
+    Stream a table CSV written by the extractor
+
+    Combined tables start with a quoted title line and, for tables spanning
+    several pages, a "Combined from pages: ..." line, each followed by a blank
+    line; local find_tables CSVs start directly with the header row. Opening
+    the reader parses that preamble; rows() then yields the data rows one at
+    a time, so memory does not grow with the table.
+
+    Example:
+        with TableCSVReader(path) as table:
+            print(table.title, table.pages, table.headers)
+            for row in table.rows():
+                ...
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.title = None
+        self.pages = []
+        self.headers = []
+        self._file = None
+        self._reader = None
+
+    def __enter__(self):
+        self._file = open_artifact(self.path, 'r')
+        self._reader = csv.reader(self._file)
+        for row in self._reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            if len(row) == 1:
+                pages = re.match(r'Combined from pages:\s*(.*)', row[0])
+                if pages:
+                    self.pages = [int(p) for p in re.findall(r'\d+', pages.group(1))]
+                elif self.title is None:
+                    self.title = row[0]
+                continue
+            self.headers = row
+            break
+        return self
+
+    def __exit__(self, *exc):
+        self._file.close()
+
+    def rows(self) -> Iterator[List[str]]:
+        """Data rows with the formula-guard quotes removed"""
+        for row in self._reader:
+            yield [unescape_cell(cell) for cell in row]
+
+
+def read_table_csv(path) -> Dict:
+    """
+    Read a table CSV written by the extractor back into its parts
+
+    Args:
+        path: Artifact path
+
+    Returns:
+        Dict with "title", "pages" (List[int]), "headers" and "rows"
+    """
+    with TableCSVReader(path) as table:
+        return {"title": table.title, "pages": table.pages, "headers": table.headers,
+                "rows": list(table.rows())}
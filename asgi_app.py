@@ -0,0 +1,247 @@
+"""
+ASGI entry point that extracts uploads without a thread per request.
+
+Under Flask every /upload holds a worker thread for the whole extraction,
+although nearly all of that time is spent waiting on the model, so the
+number of threads caps the number of documents in progress. Here /upload
+runs on an event loop: model-mode uploads go through
+PDFTableExtractor.process_pdf_async, whose pages await the transport's
+generate_async, so one process keeps hundreds of page requests in flight
+(ASYNC_MAX_PAGES_IN_FLIGHT, ASYNC_TENANT_MAX_PAGES_IN_FLIGHT per API key).
+Rendering, local extraction and file work run in the loop's default executor.
+
+/upload takes the same form fields and answers like app.py's, including
+stream=true NDJSON. Every other route (the upload page, downloads, /rows,
+/upload_bulk, /batch, /query, /health) is served by the Flask app itself,
+mounted through a2wsgi, so both share one results store, janitor and
+line-item index.
+
+Run one event loop per process, e.g.:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import uuid
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.datastructures import UploadFile
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+import app as flask_app
+import config
+from admission import check_disk_space, check_memory
+
+# Streaming extractions keep running after their client disconnects
+_background_tasks = set()
+
+
+def error_response(message, status_code):
+    return JSONResponse({'error': message}, status_code=status_code)
+
+
+def form_flag(form, name):
+    return (form.get(name) or '').strip().lower() in ('1', 'true', 'yes')
+
+
+def save_upload(upload, file_path):
+    """Copy an uploaded file to disk (runs in an executor), returns its size"""
+    upload.file.seek(0)
+    with open(file_path, 'wb') as f:
+        shutil.copyfileobj(upload.file, f)
+    return os.path.getsize(file_path)
+
+
+def store_results(extraction_id, pdf_name, results, temp_dir, company=None):
+    """Keep a finished model extraction for the Flask download routes and index it"""
+    flask_app.store_model_results(extraction_id, pdf_name, results, temp_dir)
+    flask_app.index_extraction(extraction_id, pdf_name, results['csv_files'], company=company)
+
+
+async def upload(request):
+    """Handle an upload on the event loop (same fields and responses as app.upload)"""
+    loop = asyncio.get_running_loop()
+    print("=== UPLOAD STARTED ===")
+
+    # Refuse the upload before reading it if the node cannot hold it
+    content_length = int(request.headers.get('content-length') or 0)
+    disk_error = await loop.run_in_executor(None, lambda: check_disk_space(content_length,
+                                                                           janitor=flask_app.janitor))
+    if disk_error:
+        print(f"Admission refused: {disk_error}")
+        return error_response(disk_error, 507)
+
+    form = await request.form()
+    try:
+        file = form.get('file')
+        if not isinstance(file, UploadFile):
+            return error_response('No file field', 400)
+        api_key = (form.get('api_key') or '').strip()
+
+        print(f"File: {file.filename}")
+        print(f"API key length: {len(api_key)}")
+
+        if not file.filename:
+            return error_response('No file selected', 400)
+        if not file.filename.lower().endswith('.pdf'):
+            return error_response('Must be PDF file', 400)
+
+        mode = (form.get('mode') or 'local').strip().lower()
+        if mode not in ('local', 'model'):
+            return error_response(f'Unknown mode: {mode}', 400)
+
+        # Local extraction does not call the model
+        extractor = None
+        if mode == 'model':
+            if not api_key:
+                return error_response('API key required', 400)
+
+            from usage import get_token_ledger
+            if get_token_ledger().exhausted(api_key):
+                return error_response('Token budget exhausted for this API key, try again later', 429)
+
+            # Test the key through the configured transport (live, record or replay)
+            print("Testing API key...")
+            try:
+                extractor = await loop.run_in_executor(None, flask_app.get_extractor, api_key)
+                await extractor.transport.generate_async("Hello")
+                print("✓ API key works")
+            except ImportError as e:
+                print(f"Import error: {e}")
+                return error_response('google-generativeai not installed', 500)
+            except Exception as e:
+                print(f"API error: {e}")
+                return error_response(f'Invalid API key: {str(e)}', 400)
+
+        print("Saving file...")
+        extraction_id = str(uuid.uuid4())
+        temp_dir = tempfile.mkdtemp()
+        file_path = os.path.join(temp_dir, f"upload_{extraction_id}.pdf")
+
+        try:
+            file_size = await loop.run_in_executor(None, save_upload, file, file_path)
+            print(f"✓ File saved: {file_size} bytes")
+        except Exception as e:
+            return error_response(f'File save failed: {str(e)}', 500)
+
+        company = (form.get('company') or '').strip() or None
+
+        # The upload directory is tracked by the janitor whatever the outcome; a
+        # streamed job registers it itself once the extraction has finished
+        streaming = False
+        try:
+            if mode == 'model':
+                # Documents that cannot be rendered within the node's memory even at low zoom
+                memory_error = await loop.run_in_executor(None, check_memory, file_path,
+                                                          config.ASYNC_TENANT_MAX_PAGES_IN_FLIGHT)
+                if memory_error:
+                    print(f"Admission refused: {memory_error}")
+                    return error_response(memory_error, 413)
+
+                if form_flag(form, 'stream'):
+                    response = stream_with_model(extractor, file.filename, file_path, temp_dir, extraction_id,
+                                                 company)
+                    streaming = True
+                    return response
+                return await process_with_model(extractor, file.filename, file_path, temp_dir, extraction_id,
+                                                form_flag(form, 'trace'), company)
+            return await process_locally(file.filename, file_path, temp_dir, extraction_id, company)
+        finally:
+            if not streaming:
+                flask_app.janitor.register(temp_dir, 'upload')
+
+    except Exception as e:
+        print(f"General error: {e}")
+        import traceback
+        traceback.print_exc()
+        return error_response(f'Server error: {str(e)}', 500)
+    finally:
+        await form.close()
+
+
+async def process_locally(pdf_name, file_path, temp_dir, extraction_id, company=None):
+    """Local extraction in an executor; its pages are spread over the local extraction processes"""
+    print("Processing PDF...")
+    try:
+        body = await asyncio.get_running_loop().run_in_executor(
+            None, flask_app.extract_and_store_locally, pdf_name, file_path, temp_dir, extraction_id, company)
+        return JSONResponse(body)
+    except Exception as e:
+        print(f"Processing error: {e}")
+        return error_response(f'PDF processing failed: {str(e)}', 500)
+
+
+async def process_with_model(extractor, pdf_name, file_path, temp_dir, extraction_id, trace=False, company=None):
+    """Run the model pipeline on the event loop"""
+    print("Processing PDF with model...")
+    try:
+        results = await extractor.process_pdf_async(file_path, trace=trace)
+
+        if results.get('error'):
+            return error_response(f"PDF processing failed: {results['error']}", 500)
+
+        await asyncio.get_running_loop().run_in_executor(None, store_results, extraction_id, pdf_name, results,
+                                                         temp_dir, company)
+
+        print(f"✓ Processing complete: {results['total_tables_extracted']} tables")
+
+        return JSONResponse(flask_app.model_response(extraction_id, pdf_name, results))
+
+    except Exception as e:
+        print(f"Processing error: {e}")
+        return error_response(f'PDF processing failed: {str(e)}', 500)
+
+
+def stream_with_model(extractor, pdf_name, file_path, temp_dir, extraction_id, company=None):
+    """Run the model pipeline and stream each table's rows as NDJSON as soon as the table is saved"""
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def on_table(table, csv_path):
+        # Tables are saved in executor threads
+        loop.call_soon_threadsafe(events.put_nowait, ('table', table, csv_path))
+
+    async def run():
+        try:
+            results = await extractor.process_pdf_async(file_path, on_table=on_table)
+            if not results.get('error'):
+                await loop.run_in_executor(None, store_results, extraction_id, pdf_name, results, temp_dir, company)
+            events.put_nowait(('done', results, None))
+        except Exception as e:
+            print(f"Processing error: {e}")
+            events.put_nowait(('error', str(e), None))
+        finally:
+            # The upload is handed to the janitor only once the PDF is no longer read
+            await loop.run_in_executor(None, flask_app.janitor.register, temp_dir, 'upload')
+
+    task = asyncio.ensure_future(run())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+    async def generate():
+        while True:
+            kind, payload, csv_path = await events.get()
+            for line in flask_app.event_lines(extraction_id, pdf_name, kind, payload, csv_path):
+                yield line
+            if kind != 'table':
+                return
+
+    return StreamingResponse(generate(), media_type='application/x-ndjson',
+                             headers={'X-Extraction-Id': extraction_id})
+
+
+app = Starlette(routes=[
+    Route('/upload', upload, methods=['POST']),
+    Mount('/', app=WSGIMiddleware(flask_app.app)),
+])
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    port = int(os.environ.get('PORT', 5000))
+    print(f"🚀 Starting async server on port {port}")
+    uvicorn.run(app, host='0.0.0.0', port=port)
@@ -0,0 +1,71 @@
+"""
+Hedged-request benchmark against the stub transport.
+
+Sends the same stream of calls through a StubTransport with a slow tail, once
+directly and once through a HedgingTransport, and compares latency percentiles
+and the share of calls that were hedged. Nothing leaves the machine, so the
+hedging policy (quantile, rate cap) can be tuned before enabling it with
+MODEL_HEDGING=true.
+
+Example:
+    python bench_hedging.py --calls 1500 --slow-fraction 0.03 --slow-latency 1.0
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from load_test import percentile
+from model_transport import HedgingTransport, StubTransport
+
+
+def run_calls(transport, calls: int, concurrency: int) -> Dict:
+    """Issue calls through a transport and summarize their latencies"""
+    def call(_):
+        start = time.perf_counter()
+        transport.generate("bench")
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(call, range(calls)))
+
+    return {
+        "p50": round(percentile(latencies, 50), 3),
+        "p95": round(percentile(latencies, 95), 3),
+        "p99": round(percentile(latencies, 99), 3),
+        "max": round(max(latencies), 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare model call latency with and without hedging")
+    parser.add_argument("--calls", type=int, default=1500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds of a normal call")
+    parser.add_argument("--slow-fraction", type=float, default=0.03, help="Share of slow calls")
+    parser.add_argument("--slow-latency", type=float, default=1.0, help="Seconds of a slow call")
+    parser.add_argument("--quantile", type=float, default=0.95)
+    parser.add_argument("--max-hedge-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    def stub():
+        return StubTransport(args.latency, args.slow_fraction, args.slow_latency, seed=args.seed)
+
+    direct = run_calls(stub(), args.calls, args.concurrency)
+
+    inner = stub()
+    hedging = HedgingTransport(inner, quantile=args.quantile, max_hedge_rate=args.max_hedge_rate)
+    hedged = run_calls(hedging, args.calls, args.concurrency)
+    hedged.update({
+        "hedge_rate": round(hedging.stats["hedged"] / hedging.stats["calls"], 3),
+        "hedge_wins": hedging.stats["hedge_wins"],
+        "backend_calls": inner.calls
+    })
+
+    print(json.dumps({"direct": direct, "hedged": hedged}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Import-time benchmark for cold starts.
+
+Measures, each in a fresh interpreter, how long it takes to import
+pdf_extractor, to import app, and to answer /health through Flask's test
+client. The slowest imports reported by `python -X importtime` are listed so
+regressions (a heavy dependency imported at module level again) are easy to
+spot.
+
+Example:
+    python bench_import.py --runs 5 --max-ms 1500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+SCENARIOS = {
+    "import pdf_extractor": "import pdf_extractor",
+    "import app": "import app",
+    "first /health": "import app; app.app.test_client().get('/health')",
+}
+
+TIMER = """
+import time
+_start = time.perf_counter()
+{code}
+print(round((time.perf_counter() - _start) * 1000, 2))
+"""
+
+
+def time_scenario(code: str, runs: int) -> List[float]:
+    """Run a snippet in fresh interpreters and return wall times in ms"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", TIMER.format(code=code)],
+            cwd=here, capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()
+        timings.append(float(output[-1]))
+    return timings
+
+
+def slowest_imports(module: str, top: int) -> List[Dict]:
+    """Parse `python -X importtime` output for the slowest cumulative imports"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=here, capture_output=True, text=True
+    ).stderr
+
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        entries.append({"module": name, "cumulative_ms": round(int(cumulative_us) / 1000, 2)})
+
+    entries.sort(key=lambda e: -e["cumulative_ms"])
+    return entries[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import benchmark")
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per scenario')
+    parser.add_argument('--top', type=int, default=10, help='Slowest imports to list')
+    parser.add_argument('--max-ms', type=float, help='Fail if the median first /health exceeds this')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    results = {"scenarios": {}, "slowest_imports": {}}
+    for name, code in SCENARIOS.items():
+        try:
+            timings = time_scenario(code, args.runs)
+        except subprocess.CalledProcessError as e:
+            print(f"✗ {name}: failed\n{e.stderr}")
+            results["scenarios"][name] = {"error": e.stderr.strip().splitlines()[-1:]}
+            continue
+        results["scenarios"][name] = {
+            "median_ms": round(statistics.median(timings), 2),
+            "min_ms": min(timings),
+            "max_ms": max(timings)
+        }
+        print(f"✓ {name}: median {results['scenarios'][name]['median_ms']} ms over {args.runs} runs")
+
+    for module in ("pdf_extractor", "app"):
+        results["slowest_imports"][module] = slowest_imports(module, args.top)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    health = results["scenarios"].get("first /health", {})
+    if args.max_ms is not None and health.get("median_ms", float("inf")) > args.max_ms:
+        print(f"❌ first /health took {health.get('median_ms')} ms (limit {args.max_ms} ms)")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
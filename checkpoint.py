@@ -0,0 +1,203 @@
+"""
+Page-level checkpoints of extraction jobs.
+
+Every page a job finishes is appended to a journal before the next page is
+grouped, so a worker killed on page 180 of 200 (crash, redeploy) loses at most
+the pages that were in flight. Journals are keyed by the SHA-256 of the PDF
+together with the job's scope, the tenant and every extraction setting a page
+result depends on (models, prompt, generation parameters): when the same
+tenant processes the same document with the same settings again, the
+journaled pages are not rendered or sent to the model. Their results are replayed through the normal
+grouping instead, which rebuilds tables_by_title (and the tables already
+written) exactly as the interrupted run had them, and extraction resumes at
+the first missing page.
+
+A journal is a JSON-lines file in config.CHECKPOINT_DIR: a header line with
+the document hash and the journal key, then one {"page", "result"} line per
+page. A line cut short by the crash is ignored. Pages that failed or were
+skipped by a token budget are not journaled, so they are retried. The journal
+is deleted once its job has saved all tables; journals of jobs that never
+finish are expired by the artifact janitor (CHECKPOINT_TTL_SECONDS).
+
+Only one job at a time may write a document's journal; a second job for the
+same PDF (in this or another process) runs without checkpoints.
+"""
+import errno
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import config
+
+try:
+    import fcntl
+except ImportError:  # Windows: journals are only locked within the process
+    fcntl = None
+
+JOURNAL_VERSION = 2
+
+# Journals held by jobs of this process
+_open_journals = set()
+_open_lock = threading.Lock()
+
+
+def file_sha256(path, chunk_size: int = 1024 * 1024) -> str:
+    """Hex SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def journal_key(pdf_sha256: str, scope: Dict = None) -> str:
+    """
+    Key of a document's journal within a scope
+
+    Args:
+        pdf_sha256 (str): Hash of the document
+        scope (Dict): Tenant and extraction settings the page results depend on;
+            only its hash is stored, never the values
+
+    Returns:
+        str: Hex digest
+    """
+    scope = json.dumps(scope or {}, sort_keys=True, default=str)
+    return hashlib.sha256(f"{pdf_sha256}\n{scope}".encode('utf-8')).hexdigest()
+
+
+class PageJournal:
+    """Append-only journal of one document's page results"""
+
+    def __init__(self, path: Path, pdf_sha256: str, handle, key: str = None):
+        """
+        Use open_journal() instead; the handle is already locked.
+
+        Args:
+            path (Path): Journal file
+            pdf_sha256 (str): Hash of the document
+            handle: Journal opened for reading and appending
+            key (str): Journal key (see journal_key)
+        """
+        self.path = path
+        self.pdf_sha256 = pdf_sha256
+        self.key = key or journal_key(pdf_sha256)
+        self._file = handle
+        # Journaled extraction results by page number
+        self.pages = self._load()
+
+    def _load(self) -> Dict[int, Dict]:
+        self._file.seek(0)
+        pages = {}
+        valid_end = 0
+        first = True
+        while True:
+            line = self._file.readline()
+            if not line.endswith("\n"):
+                break  # End of the journal, or a torn write of the interrupted run
+            try:
+                entry = json.loads(line)
+                if first:
+                    if (entry.get("pdf_sha256") != self.pdf_sha256 or entry.get("key") != self.key
+                            or entry.get("version") != JOURNAL_VERSION):
+                        break
+                else:
+                    pages[int(entry["page"])] = entry["result"]
+            except (ValueError, KeyError, TypeError):
+                break
+            first = False
+            valid_end = self._file.tell()
+
+        # Drop a torn or foreign tail before appending to it
+        self._file.seek(valid_end)
+        self._file.truncate()
+        if valid_end == 0:
+            self._write({"version": JOURNAL_VERSION, "pdf_sha256": self.pdf_sha256, "key": self.key,
+                         "created": time.time()})
+            return {}
+        return pages
+
+    def _write(self, entry: Dict):
+        self._file.write(json.dumps(entry, default=str) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def record(self, page_num: int, extraction_result: Dict):
+        """
+        Persist a finished page
+
+        Args:
+            page_num (int): Page number
+            extraction_result (Dict): The page's extraction result; results with
+                an error or skipped by a budget are not recorded
+        """
+        if extraction_result.get("error") or extraction_result.get("skipped"):
+            return
+        self._write({"page": page_num, "result": extraction_result})
+
+    def close(self):
+        """Release the journal, keeping it for a later resume"""
+        if self._file.closed:
+            return
+        self._file.close()
+        with _open_lock:
+            _open_journals.discard(str(self.path))
+
+    def complete(self):
+        """Delete the journal of a finished job"""
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        self.close()
+
+
+def open_journal(pdf_path: str, checkpoint_dir: str = None, scope: Dict = None) -> Optional[PageJournal]:
+    """
+    Open (or start) the journal of a document
+
+    Args:
+        pdf_path (str): Path to the PDF file
+        checkpoint_dir (str): Journal directory, defaults to config.CHECKPOINT_DIR
+        scope (Dict): Tenant and extraction settings; jobs only resume from a
+            journal written with the same scope
+
+    Returns:
+        PageJournal, or None when another job holds the document's journal or
+        the journal cannot be written
+    """
+    try:
+        pdf_sha256 = file_sha256(pdf_path)
+        key = journal_key(pdf_sha256, scope)
+        directory = Path(checkpoint_dir or config.CHECKPOINT_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{key}.jsonl"
+    except OSError as e:
+        print(f"⚠️ Page checkpoints disabled for this job: {e}")
+        return None
+
+    with _open_lock:
+        if str(path) in _open_journals:
+            return None
+        _open_journals.add(str(path))
+
+    handle = None
+    try:
+        handle = open(path, 'a+', encoding='utf-8')
+        if fcntl:
+            # lockf, not flock: render pool workers forked later must not inherit the lock
+            fcntl.lockf(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return PageJournal(path, pdf_sha256, handle, key)
+    except OSError as e:
+        # Locked by a job in another process, or not writable
+        if handle:
+            handle.close()
+        with _open_lock:
+            _open_journals.discard(str(path))
+        if e.errno not in (errno.EACCES, errno.EAGAIN):
+            print(f"⚠️ Page checkpoints disabled for this job: {e}")
+        return None
@@ -0,0 +1,162 @@
+"""
+Runtime configuration for the PDF table extractor.
+
+All settings are read from environment variables so they can be changed per
+deployment (see render.yaml) without touching the code.
+"""
+import json
+import os
+
+# Model used for table extraction
+MODEL_NAME = os.environ.get('GEMINI_MODEL', 'gemini-2.0-flash-exp')
+
+# Model cascade, cheapest first (comma separated). Each page goes to the first
+# model and escalates to the next only when the answer fails structural checks
+# (unparseable JSON, rows not matching the headers, totals not adding up)
+MODEL_CASCADE = [name.strip() for name in os.environ.get('MODEL_CASCADE', MODEL_NAME).split(',') if name.strip()]
+
+# Extractors (model clients, transports) kept for the most recently used API keys
+EXTRACTOR_CACHE_SIZE = int(os.environ.get('EXTRACTOR_CACHE_SIZE', '32'))
+
+# Model transport: "live" calls Gemini, "record" calls Gemini and archives every
+# request/response pair, "replay" answers from the archive without any network,
+# "stub" returns empty answers after an injected latency (STUB_* below)
+MODEL_TRANSPORT = os.environ.get('MODEL_TRANSPORT', 'live').strip().lower()
+MODEL_ARCHIVE_DIR = os.environ.get('MODEL_ARCHIVE_DIR', 'model_archive')
+
+# Replay latency: "recorded" sleeps for each entry's own latency, "sampled" draws
+# from the archive's latency distribution, "none" answers immediately
+REPLAY_LATENCY_MODE = os.environ.get('REPLAY_LATENCY_MODE', 'recorded').strip().lower()
+REPLAY_LATENCY_SCALE = float(os.environ.get('REPLAY_LATENCY_SCALE', '1.0'))
+
+# Stub transport latency: STUB_SLOW_FRACTION of the calls take STUB_SLOW_LATENCY
+STUB_LATENCY = float(os.environ.get('STUB_LATENCY', '0.2'))
+STUB_SLOW_FRACTION = float(os.environ.get('STUB_SLOW_FRACTION', '0'))
+STUB_SLOW_LATENCY = float(os.environ.get('STUB_SLOW_LATENCY', '5'))
+
+# Request hedging: a call still running after the rolling HEDGE_QUANTILE latency
+# of its model gets a duplicate request, first answer wins. At most
+# HEDGE_MAX_RATE of all calls are hedged; hedging starts after HEDGE_MIN_SAMPLES calls
+MODEL_HEDGING = os.environ.get('MODEL_HEDGING', 'false').strip().lower() in ('1', 'true', 'yes')
+HEDGE_QUANTILE = float(os.environ.get('HEDGE_QUANTILE', '0.95'))
+HEDGE_MAX_RATE = float(os.environ.get('HEDGE_MAX_RATE', '0.05'))
+HEDGE_MIN_SAMPLES = int(os.environ.get('HEDGE_MIN_SAMPLES', '20'))
+
+# Send only locally detected table regions to the model instead of whole pages
+CROP_TABLE_REGIONS = os.environ.get('CROP_TABLE_REGIONS', 'false').strip().lower() in ('1', 'true', 'yes')
+# Concurrent model requests per page when a page is split into crops or bands
+REGION_WORKERS = int(os.environ.get('REGION_WORKERS', '4'))
+
+# Output token limit per model request; dense pages are split into bands that fit
+MAX_OUTPUT_TOKENS = int(os.environ.get('MAX_OUTPUT_TOKENS', '8192'))
+# Estimate output size from the text layer and split dense pages up front
+ADAPTIVE_TILING = os.environ.get('ADAPTIVE_TILING', 'true').strip().lower() in ('1', 'true', 'yes')
+
+# Allow process_pdf(profile=True) to run cProfile and the stack sampler. Off by
+# default: profiling slows jobs down and only one job is profiled at a time
+TRACE_PROFILING = os.environ.get('TRACE_PROFILING', 'false').strip().lower() in ('1', 'true', 'yes')
+
+# Artifact janitor: uploads and extraction outputs not downloaded for the TTL are
+# removed, and the least recently downloaded are evicted beyond the size quota
+ARTIFACT_INDEX_PATH = os.environ.get('ARTIFACT_INDEX_PATH', os.path.join('extracted_tables', '.artifact_index.json'))
+ARTIFACT_TTL_SECONDS = float(os.environ.get('ARTIFACT_TTL_SECONDS', str(24 * 3600)))
+ARTIFACT_MAX_BYTES = int(os.environ.get('ARTIFACT_MAX_BYTES', str(2 * 1024 ** 3)))
+JANITOR_INTERVAL_SECONDS = float(os.environ.get('JANITOR_INTERVAL_SECONDS', '300'))
+
+# Uploads are refused unless this much disk stays free after accepting them;
+# an upload needs roughly DISK_EXPANSION_FACTOR times its size (PDF, CSVs, ZIP)
+MIN_FREE_DISK_BYTES = int(os.environ.get('MIN_FREE_DISK_BYTES', str(512 * 1024 ** 2)))
+DISK_EXPANSION_FACTOR = float(os.environ.get('DISK_EXPANSION_FACTOR', '3'))
+
+# Stream table rows to disk while a document is processed and write each table's
+# CSV once it has gone STREAM_IDLE_PAGES pages without a continuation
+STREAM_TABLES = os.environ.get('STREAM_TABLES', 'true').strip().lower() in ('1', 'true', 'yes')
+STREAM_IDLE_PAGES = int(os.environ.get('STREAM_IDLE_PAGES', '3'))
+
+# Compression of CSV artifacts at rest: "none", "gzip" or "zstd"
+OUTPUT_COMPRESSION = os.environ.get('OUTPUT_COMPRESSION', 'none').strip().lower()
+ZSTD_LEVEL = int(os.environ.get('ZSTD_LEVEL', '10'))
+
+# SQLite index of extracted line items, queried through /query
+TABLE_INDEX_PATH = os.environ.get('TABLE_INDEX_PATH', os.path.join('extracted_tables', 'table_index.sqlite'))
+
+# Check subtotal identities such as "Total Income (I+II)" in every table and
+# re-extract only the pages of failing rows, at REEXTRACT_ZOOM with REEXTRACT_MODEL
+# (defaults to the last model of the cascade)
+VALIDATE_TOTALS = os.environ.get('VALIDATE_TOTALS', 'true').strip().lower() in ('1', 'true', 'yes')
+REEXTRACT_FAILED_TABLES = os.environ.get('REEXTRACT_FAILED_TABLES', 'true').strip().lower() in ('1', 'true', 'yes')
+REEXTRACT_ZOOM = float(os.environ.get('REEXTRACT_ZOOM', '4.0'))
+REEXTRACT_MODEL = os.environ.get('REEXTRACT_MODEL', '').strip()
+
+# Page-level scheduler shared by all jobs: pages of active jobs are interleaved
+# round-robin per API key, documents of up to SMALL_DOC_PAGES pages go through a
+# fast lane, and one API key never has more than TENANT_MAX_PAGES_IN_FLIGHT pages
+# in flight
+PAGE_SCHEDULER = os.environ.get('PAGE_SCHEDULER', 'true').strip().lower() in ('1', 'true', 'yes')
+SCHEDULER_WORKERS = int(os.environ.get('SCHEDULER_WORKERS', '8'))
+TENANT_MAX_PAGES_IN_FLIGHT = int(os.environ.get('TENANT_MAX_PAGES_IN_FLIGHT', '4'))
+SMALL_DOC_PAGES = int(os.environ.get('SMALL_DOC_PAGES', '5'))
+FAST_LANE_BURST = int(os.environ.get('FAST_LANE_BURST', '3'))
+
+# Render pages in worker processes (shared-memory handoff) instead of the
+# request thread; RENDER_PROCESSES=0 uses one process per core
+RENDER_POOL = os.environ.get('RENDER_POOL', 'true').strip().lower() in ('1', 'true', 'yes')
+RENDER_PROCESSES = int(os.environ.get('RENDER_PROCESSES', '0'))
+
+# Token budgets (input + output tokens, 0 = unlimited) per document and per API
+# key over a sliding window. BUDGET_ACTION "stop" skips the remaining pages,
+# "degrade" extracts them with the first cascade model only
+JOB_TOKEN_BUDGET = int(os.environ.get('JOB_TOKEN_BUDGET', '0'))
+KEY_TOKEN_BUDGET = int(os.environ.get('KEY_TOKEN_BUDGET', '0'))
+KEY_BUDGET_WINDOW_SECONDS = float(os.environ.get('KEY_BUDGET_WINDOW_SECONDS', str(24 * 3600)))
+BUDGET_ACTION = os.environ.get('BUDGET_ACTION', 'stop').strip().lower()
+# Prices per million tokens for cost estimates, JSON: {"model": [input, output]}
+MODEL_PRICES = json.loads(os.environ.get('MODEL_PRICES', '{}'))
+
+# Journal every finished page (see checkpoint.py) so a job interrupted by a
+# crash or redeploy resumes at the first missing page when the PDF is resubmitted
+CHECKPOINT_PAGES = os.environ.get('CHECKPOINT_PAGES', 'true').strip().lower() in ('1', 'true', 'yes')
+CHECKPOINT_DIR = os.environ.get('CHECKPOINT_DIR', os.path.join('extracted_tables', '.checkpoints'))
+# Journals not written to for this long (jobs that were never resubmitted) are removed
+CHECKPOINT_TTL_SECONDS = float(os.environ.get('CHECKPOINT_TTL_SECONDS', str(24 * 3600)))
+
+# Learn per-issuer layout templates from validated single-page tables and ask
+# matching pages for the numeric grid only (see layout_templates.py). Opt-in:
+# template pages are answered with the stored row labels. One store per API key
+LAYOUT_TEMPLATES = os.environ.get('LAYOUT_TEMPLATES', 'false').strip().lower() in ('1', 'true', 'yes')
+LAYOUT_TEMPLATES_DIR = os.environ.get('LAYOUT_TEMPLATES_DIR', os.path.join('extracted_tables', 'layout_templates'))
+LAYOUT_TEMPLATES_MAX = int(os.environ.get('LAYOUT_TEMPLATES_MAX', '500'))
+TEMPLATE_MIN_COVERAGE = float(os.environ.get('TEMPLATE_MIN_COVERAGE', '0.9'))
+
+# /upload_bulk: documents per request, documents extracted at once (their pages
+# share the page scheduler) and the directory server-side paths must be under
+# (empty = only uploaded files)
+BULK_MAX_DOCUMENTS = int(os.environ.get('BULK_MAX_DOCUMENTS', '100'))
+BULK_DOCUMENT_WORKERS = int(os.environ.get('BULK_DOCUMENT_WORKERS', '4'))
+BULK_PATHS_ROOT = os.environ.get('BULK_PATHS_ROOT', '').strip()
+
+# Memory admission (see admission.py): pages are rendered at RENDER_ZOOM, lowered
+# in RENDER_ZOOM_STEP steps down to MIN_RENDER_ZOOM until a job's estimated peak
+# fits JOB_MEMORY_MAX_BYTES (0 = the node budget). Jobs reserve their estimate from
+# NODE_MEMORY_BUDGET_BYTES (0 = NODE_MEMORY_FRACTION of physical memory) and wait
+# up to ADMISSION_QUEUE_SECONDS for running jobs to free it
+MEMORY_ADMISSION = os.environ.get('MEMORY_ADMISSION', 'true').strip().lower() in ('1', 'true', 'yes')
+RENDER_ZOOM = float(os.environ.get('RENDER_ZOOM', '3.0'))
+RENDER_ZOOM_STEP = float(os.environ.get('RENDER_ZOOM_STEP', '0.5'))
+MIN_RENDER_ZOOM = float(os.environ.get('MIN_RENDER_ZOOM', '1.5'))
+JOB_MEMORY_MAX_BYTES = int(os.environ.get('JOB_MEMORY_MAX_BYTES', '0'))
+NODE_MEMORY_BUDGET_BYTES = int(os.environ.get('NODE_MEMORY_BUDGET_BYTES', '0'))
+NODE_MEMORY_FRACTION = float(os.environ.get('NODE_MEMORY_FRACTION', '0.6'))
+JOB_BASE_MEMORY_BYTES = int(os.environ.get('JOB_BASE_MEMORY_BYTES', str(64 * 1024 ** 2)))
+ADMISSION_QUEUE_SECONDS = float(os.environ.get('ADMISSION_QUEUE_SECONDS', '300'))
+
+# Local (model-free) extraction in /upload: pages are split into chunks of
+# LOCAL_CHUNK_PAGES extracted by LOCAL_EXTRACT_PROCESSES worker processes
+# (0 = one per core, 1 = in the request thread)
+LOCAL_CHUNK_PAGES = int(os.environ.get('LOCAL_CHUNK_PAGES', '8'))
+LOCAL_EXTRACT_PROCESSES = int(os.environ.get('LOCAL_EXTRACT_PROCESSES', '0'))
+
+# Async serving path (asgi_app.py): model requests in flight per event loop, in
+# total and per API key
+ASYNC_MAX_PAGES_IN_FLIGHT = int(os.environ.get('ASYNC_MAX_PAGES_IN_FLIGHT', '256'))
+ASYNC_TENANT_MAX_PAGES_IN_FLIGHT = int(os.environ.get('ASYNC_TENANT_MAX_PAGES_IN_FLIGHT', '64'))
@@ -0,0 +1,309 @@
+"""
+Watch-folder ingestion service.
+
+Polls a drop directory for PDFs and runs every new document through
+PDFTableExtractor without anybody using the web form:
+
+* a file is picked up once its size and modification time have been stable
+  for one poll, so half-copied files are left alone
+* files are identified by the SHA-256 of their contents: a document dropped
+  again, under any name, is recorded in the manifest but not extracted twice
+* at most --workers documents are extracted at a time; their pages share the
+  process-wide page scheduler like uploads do
+* each job writes into a staging directory that is renamed into the output
+  directory only when the job has finished, with its results.json, so the
+  output directory never shows partial results
+* the manifest (one entry per document hash) is rewritten atomically after
+  every state change
+
+After a crash or restart, documents the manifest shows as processing are
+queued again; their page checkpoints (see checkpoint.py) let them resume where
+they stopped. Failed documents are retried up to --max-attempts times, the
+n-th retry no earlier than --retry-delay * 2^(n-1) seconds after the failure;
+a failed document dropped again gets a fresh set of attempts.
+
+Example:
+    GOOGLE_API_KEY=... python ingest_daemon.py --watch /srv/filings/incoming \\
+        --output /srv/filings/extracted --workers 4
+"""
+import argparse
+import json
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+from artifacts import output_compression
+from checkpoint import file_sha256
+
+QUEUED = "queued"
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+
+# Error of documents none of whose files exist any more
+MISSING_FILE = "file no longer present"
+
+
+class IngestDaemon:
+    """Extracts every new PDF appearing in a watched directory"""
+
+    def __init__(self, watch_dir: str, output_dir: str, extractor, workers: int = 2,
+                 manifest_path: str = None, max_attempts: int = 3, index=None, retry_delay: float = 60.0):
+        """
+        Args:
+            watch_dir (str): Drop directory, scanned recursively
+            output_dir (str): Directory receiving one sub-directory per document
+            extractor: PDFTableExtractor used for all documents (it may be shared;
+                the daemon passes its staging directory with every job)
+            workers (int): Documents extracted concurrently
+            manifest_path (str): JSON manifest, defaults to output_dir/manifest.json
+            max_attempts (int): Extractions tried per document before giving up
+            index: Optional TableIndex the extracted tables are added to
+            retry_delay (float): Seconds before the first retry of a failed
+                document, doubled for every further attempt
+        """
+        self.watch_dir = Path(watch_dir)
+        self.output_dir = Path(output_dir)
+        self.staging_dir = self.output_dir / ".staging"
+        self.manifest_path = Path(manifest_path) if manifest_path else self.output_dir / "manifest.json"
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.index = index
+
+        self.extractor = extractor
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+        self._running = set()  # hashes being extracted
+        # path -> (size, mtime) of the previous scan, and hashes of unchanged files
+        self._last_seen = {}
+        self._hashes = {}
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest = self._load_manifest()
+        self._recover()
+
+    def _load_manifest(self) -> Dict[str, Dict]:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save_manifest(self):
+        """Write the manifest atomically (caller holds the lock)"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.manifest_path.parent, prefix=".manifest_")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _recover(self):
+        """Requeue documents interrupted by the previous run and drop its partial outputs"""
+        with self._lock:
+            interrupted = [digest for digest, entry in self.manifest.items() if entry["status"] == PROCESSING]
+            for digest in interrupted:
+                self.manifest[digest]["status"] = QUEUED
+            if interrupted:
+                print(f"♻️ Requeued {len(interrupted)} document(s) interrupted by the last run")
+                self._save_manifest()
+        if self.staging_dir.exists():
+            shutil.rmtree(self.staging_dir, ignore_errors=True)
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+
+    def scan(self) -> List[str]:
+        """
+        Record new stable PDFs in the manifest
+
+        Returns:
+            List[str]: Hashes of documents waiting to be extracted
+        """
+        current = {}
+        for path in self.watch_dir.rglob("*"):
+            if path.suffix.lower() != ".pdf" or not path.is_file():
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            current[str(path)] = (stat.st_size, stat.st_mtime)
+
+        stable = [path for path, signature in current.items() if self._last_seen.get(path) == signature]
+        self._hashes = {path: digest for path, digest in self._hashes.items() if path in current
+                        and self._last_seen.get(path) == current[path]}
+        self._last_seen = current
+
+        changed = False
+        for path in stable:
+            if path in self._hashes:
+                continue
+            try:
+                digest = file_sha256(path)
+            except OSError as e:
+                print(f"⚠️ Cannot read {path}: {e}")
+                continue
+            self._hashes[path] = digest
+
+            with self._lock:
+                entry = self.manifest.get(digest)
+                if entry is None:
+                    self.manifest[digest] = {"status": QUEUED, "files": [path], "attempts": 0,
+                                             "discovered": time.time()}
+                    print(f"📄 New document: {path}")
+                    changed = True
+                elif entry["status"] == FAILED and (path not in entry["files"] or entry.get("error") == MISSING_FILE):
+                    # The document was dropped again: give it a fresh set of attempts
+                    if path not in entry["files"]:
+                        entry["files"].append(path)
+                    entry.update(status=QUEUED, attempts=0, error=None)
+                    entry.pop("next_attempt", None)
+                    print(f"📄 Requeued failed document: {path}")
+                    changed = True
+                elif path not in entry["files"]:
+                    entry["files"].append(path)
+                    print(f"Skipping {path}: same contents as {entry['files'][0]}")
+                    changed = True
+
+        now = time.time()
+        with self._lock:
+            if changed:
+                self._save_manifest()
+            return [digest for digest, entry in self.manifest.items()
+                    if (entry["status"] == QUEUED or (entry["status"] == FAILED and entry["attempts"] < self.max_attempts
+                                                      and entry.get("next_attempt", 0) <= now))
+                    and digest not in self._running]
+
+    def dispatch(self, waiting: List[str]):
+        """Start extractions while workers are free"""
+        for digest in waiting:
+            with self._lock:
+                if len(self._running) >= self.workers:
+                    return
+                entry = self.manifest[digest]
+                path = next((p for p in entry["files"] if os.path.exists(p)), None)
+                if path is None:
+                    entry.update(status=FAILED, error=MISSING_FILE, attempts=self.max_attempts)
+                    self._save_manifest()
+                    continue
+                entry["status"] = PROCESSING
+                entry["attempts"] += 1
+                entry["started"] = time.time()
+                self._running.add(digest)
+                self._save_manifest()
+            self._executor.submit(self._process, digest, path)
+
+    def _process(self, digest: str, path: str):
+        """Extract one document and publish its outputs"""
+        update = {}
+        try:
+            results = self.extractor.process_pdf(path, output_root=self.staging_dir)
+            if results.get("error"):
+                raise RuntimeError(results["error"])
+            update = self._publish(digest, path, results)
+            update["status"] = DONE
+            print(f"✓ Ingested {path}: {results['total_tables_extracted']} table(s)")
+        except Exception as e:
+            update = {"status": FAILED, "error": str(e)}
+            print(f"❌ Ingestion failed for {path}: {e}")
+        finally:
+            with self._lock:
+                entry = self.manifest[digest]
+                finished = time.time()
+                if update.get("status") == FAILED:
+                    update["next_attempt"] = finished + self.retry_delay * 2 ** (entry["attempts"] - 1)
+                entry.update(update, finished=finished)
+                self._running.discard(digest)
+                self._save_manifest()
+
+    def _publish(self, digest: str, path: str, results: Dict) -> Dict:
+        """Move a finished job from staging into the output directory"""
+        staged = Path(results["output_directory"])
+        target = self.output_dir / f"{staged.name}_{digest[:8]}"
+        csv_files = [str(target / os.path.relpath(csv_file, staged)) for csv_file in results["csv_files"]]
+
+        summary = {key: value for key, value in results.items() if key != "page_results"}
+        summary.update(source=path, sha256=digest, output_directory=str(target), csv_files=csv_files)
+        with open(staged / "results.json", 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, default=str)
+
+        if target.exists():
+            shutil.rmtree(target)
+        os.replace(staged, target)
+
+        if self.index is not None:
+            try:
+                self.index.ingest(f"ingest-{digest[:16]}", results["pdf_name"], csv_files)
+            except Exception as e:
+                print(f"Index error: {e}")
+
+        return {"output_directory": str(target), "csv_files": csv_files,
+                "tables": results["total_tables_extracted"], "error": None}
+
+    def run(self, interval: float = 5.0, once: bool = False):
+        """
+        Poll until stopped
+
+        Args:
+            interval (float): Seconds between scans
+            once (bool): Process what is in the directory now, then return
+        """
+        print(f"👀 Watching {self.watch_dir} ({self.workers} worker(s))")
+        scans = 0
+        while not self._stop.is_set():
+            waiting = self.scan()
+            scans += 1
+            self.dispatch(waiting)
+            # Files only count as stable from their second scan on
+            if once and scans > 1 and not waiting and not self._running:
+                break
+            self._stop.wait(interval)
+        self._executor.shutdown(wait=True)
+
+    def stop(self, *_):
+        """Stop polling; running extractions are finished first"""
+        print("Stopping after the running extractions...")
+        self._stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract tables from PDFs dropped into a directory")
+    parser.add_argument('--watch', required=True, help='Drop directory to watch')
+    parser.add_argument('--output', required=True, help='Directory receiving the extraction outputs')
+    parser.add_argument('--api-key', default=os.environ.get('GOOGLE_API_KEY'), help='Google AI API key')
+    parser.add_argument('--workers', type=int, default=2, help='Documents extracted concurrently')
+    parser.add_argument('--interval', type=float, default=5.0, help='Seconds between scans')
+    parser.add_argument('--manifest', help='Manifest path (default: <output>/manifest.json)')
+    parser.add_argument('--max-attempts', type=int, default=3, help='Attempts per document')
+    parser.add_argument('--retry-delay', type=float, default=60.0,
+                        help='Seconds before retrying a failed document, doubled per attempt')
+    parser.add_argument('--no-index', action='store_true', help='Do not add tables to the line-item index')
+    parser.add_argument('--once', action='store_true', help='Process the current files and exit')
+    args = parser.parse_args()
+
+    if not args.api_key:
+        parser.error("an API key is required (--api-key or GOOGLE_API_KEY)")
+    try:
+        output_compression()
+    except (RuntimeError, ValueError) as e:
+        parser.error(str(e))
+
+    from pdf_extractor import PDFTableExtractor
+    from table_index import TableIndex
+
+    daemon = IngestDaemon(args.watch, args.output, PDFTableExtractor(args.api_key), workers=args.workers,
+                          manifest_path=args.manifest, max_attempts=args.max_attempts,
+                          index=None if args.no_index else TableIndex(), retry_delay=args.retry_delay)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    daemon.run(args.interval, once=args.once)
+
+
+if __name__ == '__main__':
+    main()
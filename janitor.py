@@ -0,0 +1,236 @@
+"""
+Bounded temp-space janitor for extraction artifacts.
+
+Every upload leaves a temporary directory (the PDF, CSVs, ZIP) and every model
+extraction leaves a timestamped folder under extracted_tables/. The janitor
+keeps them within a time-to-live and a total-size quota:
+
+* artifacts are registered once when a job finishes, with their size recorded
+  in a small JSON index, so the tree is never rescanned
+* downloads touch the artifact, making eviction least-recently-downloaded first
+* a background thread expires artifacts older than the TTL and then evicts in
+  LRU order until the total size fits the quota
+* registered directories (page checkpoints) have their files removed once
+  they have not been modified for the directory's own TTL
+
+The index is shared through a file, so run one janitor per node (the app runs a
+single process, see render.yaml).
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import config
+
+
+def directory_size(path: str) -> int:
+    """Total size in bytes of a file or directory tree"""
+    path = Path(path)
+    if path.is_file():
+        return path.stat().st_size
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class ArtifactJanitor:
+    """Tracks artifact directories and evicts them by TTL and size quota"""
+
+    def __init__(self, index_path: str = None, ttl_seconds: float = None, max_bytes: int = None,
+                 on_evict: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            index_path (str): JSON index of tracked artifacts
+            ttl_seconds (float): Artifacts not downloaded for this long are removed
+            max_bytes (int): Quota for the total size of tracked artifacts
+            on_evict: Called with the path of every evicted artifact
+        """
+        self.index_path = Path(index_path or config.ARTIFACT_INDEX_PATH)
+        self.ttl_seconds = config.ARTIFACT_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.max_bytes = config.ARTIFACT_MAX_BYTES if max_bytes is None else max_bytes
+        self.on_evict = on_evict
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._entries = self._load_index()
+        self._directories = {}  # directory -> TTL of its files
+
+    def _load_index(self) -> Dict[str, Dict]:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Artifact index unreadable, starting empty: {e}")
+            return {}
+
+    def _save_index(self):
+        """Write the index atomically (caller holds the lock)"""
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.index_path.parent, prefix=".artifact_index_")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.index_path)
+
+    def register(self, path: str, kind: str = "artifact"):
+        """
+        Track an artifact (or refresh its recorded size after it changed)
+
+        Args:
+            path (str): File or directory to track
+            kind (str): Label stored in the index, e.g. "upload" or "extraction"
+        """
+        path = os.path.abspath(path)
+        size = directory_size(path)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(path, {"created": now, "last_access": now, "kind": kind})
+            entry["size"] = size
+            self._entries[path] = entry
+            self._save_index()
+
+    def refresh(self, path: str):
+        """Re-record the size of a tracked artifact after it changed (untracked paths are ignored)"""
+        path = os.path.abspath(path)
+        with self._lock:
+            if path not in self._entries:
+                return
+        size = directory_size(path)
+        with self._lock:
+            if path in self._entries:
+                self._entries[path]["size"] = size
+                self._save_index()
+
+    def register_directory(self, path: str, ttl_seconds: float):
+        """
+        Expire the files of a directory by modification time
+
+        Unlike artifacts, the directory's files are not indexed or counted in
+        the size quota; each is removed once untouched for ttl_seconds.
+
+        Args:
+            path (str): Directory, e.g. config.CHECKPOINT_DIR
+            ttl_seconds (float): Age after the last modification at which a file is removed
+        """
+        with self._lock:
+            self._directories[os.path.abspath(path)] = ttl_seconds
+
+    def _expire_directory_files(self) -> int:
+        with self._lock:
+            directories = dict(self._directories)
+        now = time.time()
+        removed = 0
+        for directory, ttl_seconds in directories.items():
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_file() and now - entry.stat().st_mtime > ttl_seconds:
+                        os.remove(entry.path)
+                        removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def touch(self, path: str):
+        """Mark an artifact as just downloaded"""
+        path = os.path.abspath(path)
+        with self._lock:
+            if path in self._entries:
+                self._entries[path]["last_access"] = time.time()
+                self._save_index()
+
+    def total_bytes(self) -> int:
+        """Total recorded size of all tracked artifacts"""
+        with self._lock:
+            return sum(entry["size"] for entry in self._entries.values())
+
+    def sweep(self, free_bytes: int = 0) -> List[str]:
+        """
+        Remove expired artifacts, then evict LRU artifacts until within quota
+
+        Args:
+            free_bytes (int): Extra space to free beyond the quota, e.g. for an
+                upload that is waiting for disk space
+
+        Returns:
+            List[str]: Paths of the evicted artifacts
+        """
+        expired_files = self._expire_directory_files()
+        if expired_files:
+            print(f"🧹 Janitor removed {expired_files} expired file(s)")
+
+        now = time.time()
+        with self._lock:
+            victims = []
+            remaining = sorted(self._entries.items(), key=lambda item: item[1]["last_access"])
+
+            # Expired by TTL, or vanished from disk
+            for path, entry in list(remaining):
+                if now - entry["last_access"] > self.ttl_seconds or not os.path.exists(path):
+                    victims.append(path)
+                    remaining.remove((path, entry))
+
+            # Least recently downloaded first until within quota
+            total = sum(entry["size"] for _, entry in remaining)
+            while remaining and total > max(0, self.max_bytes - free_bytes):
+                path, entry = remaining.pop(0)
+                victims.append(path)
+                total -= entry["size"]
+
+            for path in victims:
+                del self._entries[path]
+            if victims:
+                self._save_index()
+
+        for path in victims:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            if self.on_evict:
+                self.on_evict(path)
+
+        if victims:
+            print(f"🧹 Janitor evicted {len(victims)} artifact(s)")
+        return victims
+
+    def start(self, interval_seconds: float = None):
+        """Run sweep() periodically in a daemon thread"""
+        if self._thread:
+            return
+        interval = config.JANITOR_INTERVAL_SECONDS if interval_seconds is None else interval_seconds
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print(f"Janitor sweep failed: {e}")
+
+        self._thread = threading.Thread(target=loop, name="artifact-janitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
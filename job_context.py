@@ -0,0 +1,167 @@
+"""
+Per-job state for PDFTableExtractor.
+
+The extractor itself only holds shared configuration (model transport, options),
+so a single instance can serve many documents concurrently from threads or
+asyncio tasks. Everything that belongs to one document -- output location,
+table groups, per-page layout analysis, results and trace -- lives in an
+ExtractionJob created for that document.
+"""
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import config
+from tracing import NULL_TRACE
+from usage import USAGE_FIELDS, empty_usage, estimate_cost, get_token_ledger, total_tokens
+
+
+class ExtractionJob:
+    """State of one PDF extraction"""
+
+    def __init__(self, pdf_path: str, output_dir: Path, trace=NULL_TRACE,
+                 on_table: Optional[Callable[[Dict, str], None]] = None, tenant: str = None):
+        """
+        Args:
+            pdf_path (str): Path to the PDF file
+            output_dir (Path): Directory receiving this job's outputs
+            trace: JobTrace for this job, NULL_TRACE when tracing is off
+            on_table: Called with (combined table, CSV path) as soon as each
+                table group is saved, before the job finishes
+            tenant (str): Scheduling key of the job's pages (see scheduler.py)
+        """
+        self.pdf_path = Path(pdf_path)
+        self.pdf_name = self.pdf_path.stem
+        self.output_dir = Path(output_dir)
+        self.trace = trace
+        self.tenant = tenant
+        # Render scale, lowered by memory admission for oversized documents
+        self.zoom = config.RENDER_ZOOM
+
+        # Tables grouped by normalized title, combined across continuation pages
+        self.tables_by_title = {}
+        # Every group key used so far, finalized groups included (variant keys are never reused)
+        self.group_keys = set()
+        # IncrementalTableWriter spooling group rows to disk, None keeps them in memory
+        self.table_writer = None
+        self.on_table = on_table
+
+        # Per-page layout analysis (see table_regions.py and tiling.py)
+        self.page_regions = []
+        self.token_profiles = []
+        # Text layer per page, read when layout templates may match (see layout_templates.py)
+        self.page_texts = []
+
+        # Pages may be extracted concurrently on the scheduler's workers
+        self._stats_lock = threading.Lock()
+
+        self.results = {
+            "pdf_name": self.pdf_name,
+            "output_directory": str(self.output_dir),
+            "total_pages": 0,
+            "pages_with_tables": 0,
+            "total_tables_extracted": 0,
+            "csv_files": [],
+            "page_results": [],
+            "extracted_titles": [],  # Track extracted titles
+            "validation": [],  # Total checks per saved table (see validation.py)
+            "table_pages": {},  # CSV path -> source pages and rows taken from each page
+            "model_stats": {},  # Pages, latency and escalations per cascade model
+            "usage": empty_usage(),  # Tokens, calls and image pixels of the whole job
+            "budget_exceeded": None  # Budget that stopped or degraded the job (see usage.py)
+        }
+
+    def regions_for_page(self, page_num: int) -> List:
+        """Detected table regions of a page (1-based), empty for the whole page"""
+        return self.page_regions[page_num - 1] if page_num <= len(self.page_regions) else []
+
+    def token_profile_for_page(self, page_num: int) -> Optional[List]:
+        """Text-layer token profile of a page (1-based), None if not analysed"""
+        return self.token_profiles[page_num - 1] if page_num <= len(self.token_profiles) else None
+
+    def text_for_page(self, page_num: int) -> str:
+        """Text layer of a page (1-based), empty if not read"""
+        return self.page_texts[page_num - 1] if page_num <= len(self.page_texts) else ""
+
+    def record_model_page(self, model_name: str, latency: float, escalation_reasons: List[str] = None):
+        """
+        Count one page answered by a cascade model
+
+        Args:
+            model_name (str): Model that extracted the page
+            latency (float): Seconds spent on the page with this model
+            escalation_reasons (List[str]): Failed checks that sent the page on
+                to the next model, empty if the answer was kept
+        """
+        with self._stats_lock:
+            stats = self.results["model_stats"].setdefault(model_name, {
+                "pages": 0, "latency": 0.0, "escalated": 0, "escalation_reasons": {}
+            })
+            stats["pages"] += 1
+            stats["latency"] += latency
+            if escalation_reasons:
+                stats["escalated"] += 1
+                for reason in escalation_reasons:
+                    stats["escalation_reasons"][reason] = stats["escalation_reasons"].get(reason, 0) + 1
+            stats["avg_latency"] = round(stats["latency"] / stats["pages"], 3)
+            stats["escalation_rate"] = round(stats["escalated"] / stats["pages"], 3)
+
+    def record_usage(self, model_name: str, usage: Dict):
+        """
+        Account the usage of model calls to the job, the model and the API key
+
+        Args:
+            model_name (str): Model the calls went to
+            usage (Dict): Summed usage (see usage.sum_usage)
+        """
+        with self._stats_lock:
+            for field in USAGE_FIELDS:
+                self.results["usage"][field] += usage.get(field, 0)
+
+            stats = self.results["model_stats"].setdefault(model_name, {
+                "pages": 0, "latency": 0.0, "escalated": 0, "escalation_reasons": {}
+            })
+            model_usage = stats.setdefault("usage", empty_usage())
+            for field in USAGE_FIELDS:
+                model_usage[field] += usage.get(field, 0)
+            cost = estimate_cost(model_name, model_usage)
+            if cost is not None:
+                stats["cost"] = cost
+                self.results["usage"]["cost"] = round(sum(
+                    s.get("cost", 0) for s in self.results["model_stats"].values()), 6)
+
+        if self.tenant:
+            get_token_ledger().record(self.tenant, total_tokens(usage))
+
+    def budget_action(self) -> Optional[str]:
+        """
+        What to do with the next page given the token budgets
+
+        Returns:
+            None within budget, otherwise config.BUDGET_ACTION ("stop" or "degrade")
+        """
+        exceeded = None
+        if config.JOB_TOKEN_BUDGET and total_tokens(self.results["usage"]) >= config.JOB_TOKEN_BUDGET:
+            exceeded = "job"
+        elif self.tenant and get_token_ledger().exhausted(self.tenant):
+            exceeded = "key"
+        if exceeded is None:
+            return None
+
+        with self._stats_lock:
+            if self.results["budget_exceeded"] is None:
+                self.results["budget_exceeded"] = exceeded
+                print(f"⚠️ {exceeded} token budget exhausted: {config.BUDGET_ACTION} remaining pages")
+        return config.BUDGET_ACTION
+
+    def failure_results(self, error: str) -> Dict:
+        """Results returned when the job cannot run at all"""
+        return {
+            "error": error,
+            "pdf_name": self.pdf_name,
+            "total_pages": 0,
+            "pages_with_tables": 0,
+            "total_tables_extracted": 0,
+            "csv_files": [],
+            "page_results": []
+        }
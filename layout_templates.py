@@ -0,0 +1,321 @@
+"""
+Per-issuer layout templates learned from earlier extractions.
+
+Most filings come from a fixed set of companies whose statements keep the same
+rows quarter after quarter, yet every page is sent with the full extraction
+prompt and the model writes out every row label again. A template records what
+stays the same -- issuer, statement type, title, label columns and row labels --
+for a table that was extracted on a single page and passed its total checks.
+
+Only tables whose issuer is named (in the title or on the page) are learned,
+and every tenant (API key) has its own store, so one tenant's layouts never
+shape another's output. Before a page goes to the model, its text layer is
+compared with the tenant's templates. A page matches when it names the
+template's issuer and contains nearly all of its row labels, and holds about
+as many numbers as the template's table, so the page carries no second table. Matching pages get a compact prompt that
+lists the known rows and asks only for the title, the value column headers and
+the numeric grid; the labels are filled back in from the template. Answers
+that do not fit the template (the model reports a mismatch, the grid has the
+wrong shape, or the totals fail) fall back to the regular extraction.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import config
+from table_index import detect_company, detect_statement, line_item_column
+
+_WORD = re.compile(r'[a-z0-9]+')
+_NUMBER = re.compile(r'^\(?-?[0-9][0-9,]*(\.[0-9]+)?\)?%?$')
+
+# Share of a label's words that must appear on the page for the label to match
+LABEL_WORD_COVERAGE = 0.8
+# Numbers on a matching page relative to the template's table (dates, notes, page numbers)
+NUMBER_SLACK = 1.15
+NUMBER_SLACK_ABSOLUTE = 6
+
+GRID_PROMPT = """
+        This page contains a financial table whose layout is already known.
+        Title when last seen: "{title}"
+
+        Its rows, top to bottom, are:
+{rows}
+
+        Its {columns} value columns were, left to right: {headers}
+
+        Read ONLY the values of these rows. Return ONLY JSON in this format:
+        {{
+            "title": "<complete table title as printed on this page, with currency/unit information>",
+            "headers": [<the {columns} value column headers as printed on this page>],
+            "grid": [[<{columns} values of row 1>], [<{columns} values of row 2>], ...]
+        }}
+
+        - "grid" must have exactly {count} rows, in the order listed above, each with exactly {columns} values
+        - Copy values EXACTLY as printed: keep commas and decimals, negative values in parentheses
+          such as (135.30), and "-" for nil values; use "" for empty cells
+        - If the table on this page does not have exactly these rows, answer {{"mismatch": true}}
+        """
+
+
+def words(text: str) -> List[str]:
+    """Lowercase word tokens used for matching"""
+    return _WORD.findall((text or "").lower())
+
+
+def count_numbers(tokens) -> int:
+    """Number of amount-like tokens"""
+    return sum(1 for token in tokens if _NUMBER.match(token))
+
+
+def contains_phrase(tokens: List[str], phrase: List[str]) -> bool:
+    """Whether the words of a phrase appear consecutively in a token list"""
+    size = len(phrase)
+    return size > 0 and any(tokens[i:i + size] == phrase for i in range(len(tokens) - size + 1))
+
+
+def page_text(pdf_path: str, page_num: int) -> str:
+    """Text layer of one page (1-based), empty for scanned pages"""
+    import fitz  # PyMuPDF
+
+    with fitz.open(pdf_path) as doc:
+        return doc.load_page(page_num - 1).get_text()
+
+
+def page_texts(pdf_path: str) -> List[str]:
+    """Text layer of every page, empty strings for scanned pages"""
+    import fitz  # PyMuPDF
+
+    with fitz.open(pdf_path) as doc:
+        return [page.get_text() for page in doc]
+
+
+def build_template(table: Dict, page_content: str = "") -> Optional[Dict]:
+    """
+    Template of a single-page table
+
+    Args:
+        table (Dict): Table with "title", "headers" and "data"
+        page_content (str): Text layer of the table's page, used to find the issuer
+
+    Returns:
+        Dict template, or None when the table has no issuer, line item column or values
+    """
+    headers = list(table.get("headers") or [])
+    rows = [[str(cell) if cell is not None else '' for cell in row] for row in table.get("data") or []]
+    if not rows or not headers:
+        return None
+    item_col = line_item_column(headers, rows)
+    if item_col is None or item_col + 1 >= len(headers):
+        return None
+
+    title = table.get("title") or ""
+    # Without an issuer a template could match any company's page with similar labels
+    company = detect_company(title) or detect_company(page_content)
+    if not company:
+        return None
+    labels = [(row[:item_col + 1] + [''] * (item_col + 1 - len(row)))[:item_col + 1] for row in rows]
+    statement = detect_statement(f"{title} {' '.join(headers)}")
+    signature = hashlib.sha1(json.dumps(labels).encode('utf-8')).hexdigest()[:12]
+
+    return {
+        "key": "|".join([company, statement["statement_type"] or "", statement["scope"] or "", signature]),
+        "company": company,
+        "statement_type": statement["statement_type"],
+        "scope": statement["scope"],
+        "title": title,
+        "label_headers": headers[:item_col + 1],
+        "value_headers": headers[item_col + 1:],
+        "labels": labels,
+        # Amount-like tokens of the whole table, as they appear in a text layer
+        "numbers": count_numbers(word for row in rows for cell in row for word in cell.split())
+                   + count_numbers(word for text in [title] + headers for word in text.split()),
+    }
+
+
+def grid_prompt(template: Dict) -> str:
+    """Compact prompt asking only for a template's values"""
+    rows = "\n".join(f"        {i}. {' | '.join(cell for cell in label if cell) or '(row without label)'}"
+                     for i, label in enumerate(template["labels"], 1))
+    return GRID_PROMPT.format(title=template["title"], rows=rows, columns=len(template["value_headers"]),
+                              headers=json.dumps(template["value_headers"]), count=len(template["labels"]))
+
+
+def parse_grid_response(response_text: str, template: Dict) -> Optional[Dict]:
+    """
+    Rebuild a full extraction result from a grid answer
+
+    Returns:
+        Extraction result with one table, or None when the answer does not fit
+        the template
+    """
+    text = (response_text or "").strip()
+    text = re.sub(r'^```(?:json)?\s*|\s*```$', '', text)
+    try:
+        answer = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(answer, dict) or answer.get("mismatch"):
+        return None
+
+    columns = len(template["value_headers"])
+    grid = answer.get("grid")
+    if (not isinstance(grid, list) or len(grid) != len(template["labels"])
+            or any(not isinstance(row, list) or len(row) != columns for row in grid)):
+        return None
+
+    headers = answer.get("headers")
+    if not isinstance(headers, list) or len(headers) != columns:
+        headers = template["value_headers"]
+    table = {
+        "title": answer.get("title") or template["title"],
+        "table_number": None,
+        "headers": template["label_headers"] + [str(header) for header in headers],
+        "data": [label + ['' if value is None else str(value) for value in row]
+                 for label, row in zip(template["labels"], grid)]
+    }
+    return {"has_tables": True, "tables": [table]}
+
+
+class TemplateStore:
+    """Layout templates persisted as one JSON file"""
+
+    def __init__(self, path: str, max_templates: int = None):
+        """
+        Args:
+            path (str): JSON file holding the templates (see template_store_path)
+            max_templates (int): Least recently used templates beyond this are dropped
+        """
+        self.path = Path(path)
+        self.max_templates = max_templates or config.LAYOUT_TEMPLATES_MAX
+        self._lock = threading.Lock()
+        self._templates = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Layout templates unreadable, starting empty: {e}")
+            return {}
+
+    def _save(self):
+        """Write the store atomically (caller holds the lock)"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix=".layout_templates_")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self._templates, f)
+        os.replace(tmp_path, self.path)
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def learn(self, table: Dict, page_content: str = "") -> Optional[str]:
+        """
+        Store (or refresh) the template of a validated single-page table
+
+        Args:
+            table (Dict): Table with "title", "headers" and "data"
+            page_content (str): Text layer of the table's page
+
+        Returns:
+            Key of the stored template, or None
+        """
+        template = build_template(table, page_content)
+        if template is None:
+            return None
+        now = time.time()
+        with self._lock:
+            previous = self._templates.get(template["key"], {})
+            template["learned"] = previous.get("learned", now)
+            template["used"] = now
+            template["hits"] = previous.get("hits", 0)
+            self._templates[template["key"]] = template
+            if len(self._templates) > self.max_templates:
+                for key in sorted(self._templates, key=lambda k: self._templates[k]["used"])[:-self.max_templates]:
+                    del self._templates[key]
+            self._save()
+        return template["key"]
+
+    def match(self, page_content: str, min_coverage: float = None) -> Optional[Dict]:
+        """
+        Template whose table the page holds
+
+        Args:
+            page_content (str): Text layer of the page
+            min_coverage (float): Share of the template's row labels that must
+                be found on the page, defaults to config.TEMPLATE_MIN_COVERAGE
+
+        Returns:
+            The best matching template, or None (always for pages naming no issuer)
+        """
+        min_coverage = config.TEMPLATE_MIN_COVERAGE if min_coverage is None else min_coverage
+        tokens = words(page_content)
+        if not tokens or not detect_company(page_content):
+            return None
+        vocabulary = set(tokens)
+        numbers = count_numbers(page_content.split())
+
+        best, best_coverage = None, 0.0
+        with self._lock:
+            templates = list(self._templates.values())
+        for template in templates:
+            # The page must name the template's issuer
+            if not template.get("company") or not contains_phrase(tokens, words(template["company"])):
+                continue
+            if not template["numbers"] * 0.7 <= numbers <= template["numbers"] * NUMBER_SLACK + NUMBER_SLACK_ABSOLUTE:
+                continue
+            labels = [words(label[-1]) for label in template["labels"]]
+            labels = [label for label in labels if label]
+            if not labels:
+                continue
+            found = sum(1 for label in labels
+                        if sum(1 for word in label if word in vocabulary) >= LABEL_WORD_COVERAGE * len(label))
+            coverage = found / len(labels)
+            if coverage >= min_coverage and coverage > best_coverage:
+                best, best_coverage = template, coverage
+
+        if best:
+            with self._lock:
+                best["used"] = time.time()
+                best["hits"] = best.get("hits", 0) + 1
+        return best
+
+
+# Stores of the most recently used tenants; the others are reloaded from disk when needed
+_stores = OrderedDict()
+_stores_lock = threading.Lock()
+_MAX_OPEN_STORES = 32
+
+
+def template_store_path(tenant: str) -> Path:
+    """File holding a tenant's templates (named by a hash, never the API key itself)"""
+    name = hashlib.sha256((tenant or "").encode('utf-8')).hexdigest()[:32]
+    return Path(config.LAYOUT_TEMPLATES_DIR) / f"{name}.json"
+
+
+def get_template_store(tenant: str) -> Optional[TemplateStore]:
+    """
+    Template store of a tenant, None when config.LAYOUT_TEMPLATES is off
+
+    Args:
+        tenant (str): Tenant the templates belong to (the API key)
+    """
+    if not config.LAYOUT_TEMPLATES:
+        return None
+    with _stores_lock:
+        if tenant in _stores:
+            _stores.move_to_end(tenant)
+        else:
+            _stores[tenant] = TemplateStore(str(template_store_path(tenant)))
+            while len(_stores) > _MAX_OPEN_STORES:
+                _stores.popitem(last=False)
+        return _stores[tenant]
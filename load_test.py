@@ -0,0 +1,168 @@
+"""
+Small load generator for the /upload endpoint.
+
+Drives a running server with a fixed number of concurrent clients and reports
+status counts and latency percentiles. Combined with MODEL_TRANSPORT=replay on
+the server it reproduces production-shaped load (slow tails, 429 bursts) fully
+offline, which is what we use when tuning worker counts.
+
+Example:
+    MODEL_TRANSPORT=replay python app.py &
+    python load_test.py --pdf filing.pdf --api-key dummy --mode model \\
+        --concurrency 16 --requests 200
+"""
+import argparse
+import json
+import mimetypes
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+
+def build_multipart(fields: Dict[str, str], file_field: str, file_path: str):
+    """
+    Encode form fields and one file as multipart/form-data
+
+    Args:
+        fields (Dict[str, str]): Plain form fields
+        file_field (str): Name of the file field
+        file_path (str): Path of the file to upload
+
+    Returns:
+        Tuple of (body bytes, content type header)
+    """
+    boundary = uuid.uuid4().hex
+    lines = []
+    for name, value in fields.items():
+        lines.append(f"--{boundary}\r\n".encode('utf-8'))
+        lines.append(f'Content-Disposition: form-data; name="{name}"\r\n\r\n'.encode('utf-8'))
+        lines.append(f"{value}\r\n".encode('utf-8'))
+
+    filename = os.path.basename(file_path)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    with open(file_path, 'rb') as f:
+        file_bytes = f.read()
+    lines.append(f"--{boundary}\r\n".encode('utf-8'))
+    lines.append(f'Content-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'.encode('utf-8'))
+    lines.append(f"Content-Type: {content_type}\r\n\r\n".encode('utf-8'))
+    lines.append(file_bytes)
+    lines.append(f"\r\n--{boundary}--\r\n".encode('utf-8'))
+
+    return b"".join(lines), f"multipart/form-data; boundary={boundary}"
+
+
+def send_upload(url: str, body: bytes, content_type: str, timeout: float) -> Dict:
+    """Send one upload request and time it"""
+    req = urllib.request.Request(url, data=body, method='POST')
+    req.add_header('Content-Type', content_type)
+
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception as e:
+        status = f"error: {type(e).__name__}"
+
+    return {"status": status, "latency": time.perf_counter() - start}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run_load(url: str, pdf_paths: List[str], api_key: str, mode: str,
+             concurrency: int, total_requests: int, timeout: float) -> Dict:
+    """
+    Drive /upload with a fixed number of concurrent clients
+
+    Args:
+        url (str): Base URL of the server
+        pdf_paths (List[str]): PDFs to upload, used round-robin
+        api_key (str): API key sent with every request
+        mode (str): Upload mode ("local" or "model")
+        concurrency (int): Number of concurrent clients
+        total_requests (int): Total number of uploads to send
+        timeout (float): Per-request timeout in seconds
+
+    Returns:
+        Dict: Summary of the run
+    """
+    upload_url = url.rstrip('/') + '/upload'
+    payloads = [
+        build_multipart({'api_key': api_key, 'mode': mode}, 'file', path)
+        for path in pdf_paths
+    ]
+
+    samples = []
+    lock = threading.Lock()
+
+    def worker(index: int):
+        body, content_type = payloads[index % len(payloads)]
+        sample = send_upload(upload_url, body, content_type, timeout)
+        with lock:
+            samples.append(sample)
+            done = len(samples)
+        if done % max(1, total_requests // 10) == 0:
+            print(f"  {done}/{total_requests} requests done")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(total_requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [s["latency"] for s in samples]
+    return {
+        "requests": len(samples),
+        "concurrency": concurrency,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(samples) / elapsed, 3) if elapsed > 0 else 0.0,
+        "status_counts": {str(k): v for k, v in Counter(s["status"] for s in samples).items()},
+        "latency_seconds": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p90": round(percentile(latencies, 90), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(max(latencies), 3) if latencies else 0.0
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for the /upload endpoint")
+    parser.add_argument('--url', default='http://localhost:5000', help='Base URL of the server')
+    parser.add_argument('--pdf', nargs='+', required=True, help='PDF file(s) to upload')
+    parser.add_argument('--api-key', default=os.environ.get('GOOGLE_API_KEY', 'replay'),
+                        help='API key sent with every request')
+    parser.add_argument('--mode', default='model', choices=['local', 'model'], help='Upload mode')
+    parser.add_argument('--concurrency', type=int, default=4, help='Concurrent clients')
+    parser.add_argument('--requests', type=int, default=20, help='Total number of uploads')
+    parser.add_argument('--timeout', type=float, default=600.0, help='Per-request timeout (s)')
+    parser.add_argument('--output', help='Write the summary as JSON to this file')
+    args = parser.parse_args()
+
+    print(f"🚀 {args.requests} uploads to {args.url} at concurrency {args.concurrency}")
+    summary = run_load(args.url, args.pdf, args.api_key, args.mode,
+                       args.concurrency, args.requests, args.timeout)
+
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""
+Model-free table extraction with PyMuPDF's find_tables.
+
+Used by /upload in local mode. The document is split into chunks of
+LOCAL_CHUNK_PAGES pages that worker processes extract in parallel (table
+detection is CPU-bound Python, so threads would serialise on the GIL). Each
+worker opens the PDF itself, runs find_tables once per page and sends back the
+cell text only; the parent writes the CSVs in page order.
+
+The results have the shape of PDFTableExtractor.process_pdf, so callers can
+switch between local and model extraction without special cases.
+"""
+import csv
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+import config
+from artifacts import artifact_path, open_artifact, output_compression
+
+
+def _clean(cell) -> str:
+    return '' if cell is None else str(cell)
+
+
+def column_names(names: List) -> List[str]:
+    """
+    CSV header of a table, normalised the way PyMuPDF's Table.to_pandas does
+
+    Empty names become "Col{i}"; if any name is then repeated, every name
+    except those placeholders is prefixed with its index ("{i}-{name}").
+    """
+    names = [f"Col{i}" if not name else str(name) for i, name in enumerate(names)]
+    if len(set(names)) != len(names):
+        names = [name if name == f"Col{i}" else f"{i}-{name}" for i, name in enumerate(names)]
+    return names
+
+
+def extract_page_range(pdf_path: str, first: int, last: int) -> List[Dict]:
+    """
+    Find the tables of pages first..last (0-based, inclusive) -- runs in a worker
+
+    Returns:
+        One {"page_number", "tables": [{"headers", "rows"}]} or
+        {"page_number", "error"} per page
+    """
+    import fitz  # PyMuPDF
+
+    pages = []
+    with fitz.open(pdf_path) as doc:
+        for page_index in range(first, last + 1):
+            try:
+                tables = []
+                for table in doc[page_index].find_tables():
+                    rows = [[_clean(cell) for cell in row] for row in table.extract()]
+                    # An internal header is the table's first row
+                    if rows and not table.header.external:
+                        rows = rows[1:]
+                    if rows:
+                        tables.append({"headers": column_names(table.header.names), "rows": rows})
+                pages.append({"page_number": page_index + 1, "tables": tables})
+            except Exception as e:
+                pages.append({"page_number": page_index + 1, "error": str(e)})
+    return pages
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_local_pool() -> ProcessPoolExecutor:
+    """Process-wide pool for local extraction"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Never forked from the serving process (see render_pool.py)
+            from render_pool import worker_context
+            _pool = ProcessPoolExecutor(max_workers=config.LOCAL_EXTRACT_PROCESSES or os.cpu_count() or 1,
+                                        mp_context=worker_context())
+        return _pool
+
+
+def extract_locally(pdf_path: str, output_dir: str, pdf_name: str = None) -> Dict:
+    """
+    Extract every table of a PDF without the model
+
+    Args:
+        pdf_path (str): Path to the PDF file
+        output_dir (str): Directory receiving the CSV files
+        pdf_name (str): Name reported in the results, defaults to the file name
+
+    Returns:
+        Dictionary with processing results, shaped like PDFTableExtractor.process_pdf
+    """
+    import fitz  # PyMuPDF
+
+    with fitz.open(pdf_path) as doc:
+        total_pages = doc.page_count
+
+    chunk = max(1, config.LOCAL_CHUNK_PAGES)
+    ranges = [(first, min(first + chunk, total_pages) - 1) for first in range(0, total_pages, chunk)]
+    if len(ranges) > 1 and config.LOCAL_EXTRACT_PROCESSES != 1:
+        pool = get_local_pool()
+        chunks = [pool.submit(extract_page_range, pdf_path, first, last) for first, last in ranges]
+        page_lists = (future.result() for future in chunks)
+    else:
+        page_lists = (extract_page_range(pdf_path, first, last) for first, last in ranges)
+
+    results = {
+        "pdf_name": pdf_name or Path(pdf_path).stem,
+        "output_directory": str(output_dir),
+        "total_pages": total_pages,
+        "pages_with_tables": 0,
+        "total_tables_extracted": 0,
+        "csv_files": [],
+        "table_pages": {},
+        "page_results": [],
+        "extracted_titles": []
+    }
+
+    for pages in page_lists:
+        for page in pages:
+            page_num = page["page_number"]
+            tables = page.get("tables", [])
+            page_result = {
+                "page_number": page_num,
+                "has_tables": bool(tables),
+                "tables_count": len(tables),
+                "tables": []
+            }
+            if page.get("error"):
+                print(f"  Error processing page {page_num}: {page['error']}")
+                page_result["error"] = page["error"]
+
+            for table_num, table in enumerate(tables, 1):
+                csv_filename = f"table_page{page_num}_{table_num}.csv"
+                csv_path = str(artifact_path(os.path.join(output_dir, csv_filename), output_compression()))
+                with open_artifact(csv_path, 'w') as csvfile:
+                    writer = csv.writer(csvfile)
+                    writer.writerow(table["headers"])
+                    writer.writerows(table["rows"])
+                results["csv_files"].append(csv_path)
+                results["table_pages"][csv_path] = {"pages": [page_num], "page_rows": [len(table["rows"])]}
+                results["total_tables_extracted"] += 1
+                page_result["tables"].append({
+                    "title": None,
+                    "table_number": table_num,
+                    "rows": len(table["rows"]),
+                    "columns": len(table["headers"])
+                })
+
+            if tables:
+                results["pages_with_tables"] += 1
+            results["page_results"].append(page_result)
+
+    print(f"✓ Local extraction: {results['total_tables_extracted']} tables on "
+          f"{results['pages_with_tables']}/{total_pages} pages")
+    return results
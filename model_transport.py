@@ -0,0 +1,641 @@
+"""
+Model transports used by PDFTableExtractor to talk to Gemini.
+
+A transport turns (prompt, image, generation config) into a response dictionary:
+
+    {"text": str, "finish_reason": str or None, "latency": float, "model": str,
+     "usage": {"input_tokens": int, "output_tokens": int} or None}
+
+GeminiTransport calls the real API. RecordingTransport wraps another transport and
+archives every request/response pair (including failures such as 429s) on disk,
+keyed by image hash and prompt hash. ReplayTransport answers from that archive
+without any network access, reproducing the recorded latencies (optionally scaled)
+so load tests can be run offline with production-shaped behaviour.
+
+HedgingTransport wraps another transport and sends a duplicate request when a
+call runs past the rolling p95 latency, returning whichever answer arrives
+first. StubTransport returns a fixed "no tables" answer after an injected
+latency, for exercising the hedging policy and the pipeline without a model.
+
+Every transport also has generate_async, the same call for event-loop callers
+(PDFTableExtractor.process_pdf_async): it awaits the network or the replayed
+latency instead of blocking a thread, and runs CPU-bound steps such as image
+hashing and encoding in the loop's default executor.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import config
+from usage import get_token_ledger, total_tokens
+
+
+class ModelTransportError(Exception):
+    """Raised when a model call fails or cannot be answered by a transport"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def hash_image(image) -> str:
+    """
+    Compute a stable hash of a PIL image's pixel content
+
+    Args:
+        image: PIL Image object or None
+
+    Returns:
+        str: Hex digest, "noimage" for text-only requests
+    """
+    if image is None:
+        return "noimage"
+    digest = hashlib.sha256()
+    digest.update(f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode('utf-8'))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def hash_prompt(prompt: str, model_name: str) -> str:
+    """
+    Compute a stable hash of a prompt for a given model
+
+    The model name is part of the hash so the same page sent to two different
+    models is archived as two separate entries.
+
+    Args:
+        prompt (str): Prompt text
+        model_name (str): Model the prompt is sent to
+
+    Returns:
+        str: Hex digest
+    """
+    return hashlib.sha256(f"{model_name}\n{prompt}".encode('utf-8')).hexdigest()
+
+
+def _image_blob(image):
+    """Encode a PIL image the way the SDK does for generate_content"""
+    from google.generativeai.types import content_types
+
+    return content_types.to_blob(image)
+
+
+def _status_code_from_exception(error: Exception) -> Optional[int]:
+    """Best-effort HTTP status code of an API exception (e.g. 429 for quota errors)"""
+    code = getattr(error, 'code', None)
+    try:
+        return int(code) if code is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class GeminiTransport:
+    """Live transport calling the Gemini API"""
+
+    def __init__(self, api_key: str, model_name: str = None):
+        """
+        Args:
+            api_key (str): Google AI API key
+            model_name (str): Default model for calls that do not name one
+        """
+        self.api_key = api_key
+        self.model_name = model_name or config.MODEL_NAME
+        self._models = {}
+        self._clients = None
+        self._lock = threading.Lock()
+
+    def _client_manager(self):
+        # Clients of this key only: genai.configure() is process-wide, so with
+        # several keys in one process a model could send another tenant's key
+        if self._clients is None:
+            from google.generativeai import client
+
+            self._clients = client._ClientManager()
+            self._clients.configure(api_key=self.api_key)
+        return self._clients
+
+    def _get_model(self, model_name: str):
+        # google.generativeai is slow to import, so it is loaded on the first call
+        with self._lock:
+            if model_name not in self._models:
+                import google.generativeai as genai
+
+                model = genai.GenerativeModel(model_name)
+                model._client = self._client_manager().get_default_client("generative")
+                self._models[model_name] = model
+            return self._models[model_name]
+
+    def _get_async_model(self, model_name: str):
+        model = self._get_model(model_name)
+        # The async client binds to the running event loop, so it is created there
+        with self._lock:
+            if model._async_client is None:
+                model._async_client = self._client_manager().get_default_client("generative_async")
+        return model
+
+    def generate(self, prompt: str, image=None, generation_config: Dict = None,
+                 model_name: str = None) -> Dict:
+        """
+        Send a prompt (and optional image) to Gemini
+
+        Args:
+            prompt (str): Prompt text
+            image: Optional PIL Image object
+            generation_config (Dict): Generation parameters
+            model_name (str): Model to use, defaults to the transport's model
+
+        Returns:
+            Dict: Response dictionary (text, finish_reason, latency, model)
+        """
+        model_name = model_name or self.model_name
+        model = self._get_model(model_name)
+        contents = [prompt, image] if image is not None else prompt
+
+        start = time.perf_counter()
+        try:
+            response = model.generate_content(contents, generation_config=generation_config)
+            text = response.text
+        except Exception as e:
+            raise ModelTransportError(str(e), _status_code_from_exception(e)) from e
+        return self._response(response, text, time.perf_counter() - start, model_name)
+
+    async def generate_async(self, prompt: str, image=None, generation_config: Dict = None,
+                             model_name: str = None) -> Dict:
+        """Non-blocking variant of generate, using the SDK's async client"""
+        model_name = model_name or self.model_name
+        loop = asyncio.get_running_loop()
+        # Importing the SDK and encoding the page image are CPU-bound
+        await loop.run_in_executor(None, self._get_model, model_name)
+        model = self._get_async_model(model_name)
+        contents = [prompt, await loop.run_in_executor(None, _image_blob, image)] if image is not None else prompt
+
+        start = time.perf_counter()
+        try:
+            response = await model.generate_content_async(contents, generation_config=generation_config)
+            text = response.text
+        except Exception as e:
+            raise ModelTransportError(str(e), _status_code_from_exception(e)) from e
+        return self._response(response, text, time.perf_counter() - start, model_name)
+
+    @staticmethod
+    def _response(response, text: str, latency: float, model_name: str) -> Dict:
+        """Response dictionary of a Gemini answer"""
+        finish_reason = None
+        try:
+            finish_reason = response.candidates[0].finish_reason.name
+        except Exception:
+            pass
+
+        usage = None
+        metadata = getattr(response, "usage_metadata", None)
+        if metadata is not None:
+            usage = {
+                "input_tokens": getattr(metadata, "prompt_token_count", 0) or 0,
+                "output_tokens": getattr(metadata, "candidates_token_count", 0) or 0
+            }
+
+        return {
+            "text": text,
+            "finish_reason": finish_reason,
+            "latency": latency,
+            "model": model_name,
+            "usage": usage
+        }
+
+
+class RecordingTransport:
+    """Transport wrapper that archives every request/response pair"""
+
+    def __init__(self, inner, archive_dir: str = None):
+        """
+        Args:
+            inner: Transport that performs the real call
+            archive_dir (str): Directory of the request/response archive
+        """
+        self.inner = inner
+        self.model_name = inner.model_name
+        self.archive_dir = Path(archive_dir or config.MODEL_ARCHIVE_DIR)
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _new_entry(self, prompt: str, image, model_name: str) -> Dict:
+        return {
+            "image_hash": hash_image(image),
+            "prompt_hash": hash_prompt(prompt, model_name),
+            "model": model_name,
+            "image_size": list(image.size) if image is not None else None,
+            "recorded_at": datetime.now().isoformat()
+        }
+
+    def _record_error(self, entry: Dict, error: ModelTransportError, start: float):
+        entry.update({
+            "latency": time.perf_counter() - start,
+            "error": str(error),
+            "status_code": error.status_code
+        })
+        self._append(entry)
+
+    def _record_response(self, entry: Dict, response: Dict):
+        entry.update({
+            "latency": response["latency"],
+            "text": response["text"],
+            "finish_reason": response.get("finish_reason"),
+            "usage": response.get("usage")
+        })
+        self._append(entry)
+
+    def generate(self, prompt: str, image=None, generation_config: Dict = None,
+                 model_name: str = None) -> Dict:
+        model_name = model_name or self.model_name
+        entry = self._new_entry(prompt, image, model_name)
+
+        start = time.perf_counter()
+        try:
+            response = self.inner.generate(prompt, image, generation_config, model_name)
+        except ModelTransportError as e:
+            self._record_error(entry, e, start)
+            raise
+
+        self._record_response(entry, response)
+        return response
+
+    async def generate_async(self, prompt: str, image=None, generation_config: Dict = None,
+                             model_name: str = None) -> Dict:
+        model_name = model_name or self.model_name
+        entry = await asyncio.get_running_loop().run_in_executor(None, self._new_entry, prompt, image, model_name)
+
+        start = time.perf_counter()
+        try:
+            response = await self.inner.generate_async(prompt, image, generation_config, model_name)
+        except ModelTransportError as e:
+            self._record_error(entry, e, start)
+            raise
+
+        self._record_response(entry, response)
+        return response
+
+    def _append(self, entry: Dict):
+        path = archive_entry_path(self.archive_dir, entry["image_hash"], entry["prompt_hash"])
+        with self._lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + "\n")
+
+
+def archive_entry_path(archive_dir: Path, image_hash: str, prompt_hash: str) -> Path:
+    """Location of the JSONL file holding all recordings for one request key"""
+    return Path(archive_dir) / image_hash[:2] / f"{image_hash}_{prompt_hash}.jsonl"
+
+
+class ReplayTransport:
+    """Offline transport answering from a recorded archive"""
+
+    def __init__(self, archive_dir: str = None, latency_mode: str = None,
+                 latency_scale: float = None, model_name: str = None):
+        """
+        Args:
+            archive_dir (str): Directory of the request/response archive
+            latency_mode (str): "recorded", "sampled" or "none"
+            latency_scale (float): Multiplier applied to every replayed latency
+            model_name (str): Default model name used to compute prompt hashes
+        """
+        self.archive_dir = Path(archive_dir or config.MODEL_ARCHIVE_DIR)
+        self.latency_mode = latency_mode or config.REPLAY_LATENCY_MODE
+        self.latency_scale = config.REPLAY_LATENCY_SCALE if latency_scale is None else latency_scale
+        self.model_name = model_name or config.MODEL_NAME
+
+        if self.latency_mode not in ("recorded", "sampled", "none"):
+            raise ValueError(f"Unknown replay latency mode: {self.latency_mode}")
+        if not self.archive_dir.exists():
+            raise ModelTransportError(f"Replay archive not found: {self.archive_dir}")
+
+        self._entries = {}  # (image_hash, prompt_hash) -> list of recordings
+        self._cursors = {}  # (image_hash, prompt_hash) -> next recording index
+        self._lock = threading.Lock()
+        self._latencies = self._load_latency_distribution() if self.latency_mode == "sampled" else []
+
+    def _load_latency_distribution(self) -> List[float]:
+        latencies = []
+        for path in self.archive_dir.glob("*/*.jsonl"):
+            for entry in self._read_entries(path):
+                if entry.get("latency") is not None:
+                    latencies.append(entry["latency"])
+        return latencies
+
+    @staticmethod
+    def _read_entries(path: Path) -> List[Dict]:
+        entries = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    entries.append(json.loads(line))
+        return entries
+
+    def _next_entry(self, image_hash: str, prompt_hash: str) -> Optional[Dict]:
+        key = (image_hash, prompt_hash)
+        with self._lock:
+            if key not in self._entries:
+                path = archive_entry_path(self.archive_dir, image_hash, prompt_hash)
+                self._entries[key] = self._read_entries(path) if path.exists() else []
+                self._cursors[key] = 0
+            entries = self._entries[key]
+            if not entries:
+                return None
+            # Cycle through the recordings so repeated requests reproduce the
+            # recorded sequence (e.g. a 429 followed by a success)
+            entry = entries[self._cursors[key] % len(entries)]
+            self._cursors[key] += 1
+            return entry
+
+    def _replay_latency(self, entry: Dict) -> float:
+        if self.latency_mode == "none":
+            return 0.0
+        if self.latency_mode == "sampled" and self._latencies:
+            return random.choice(self._latencies) * self.latency_scale
+        return (entry.get("latency") or 0.0) * self.latency_scale
+
+    def _lookup(self, prompt: str, image, model_name: str) -> Dict:
+        image_hash = hash_image(image)
+        prompt_hash = hash_prompt(prompt, model_name)
+
+        entry = self._next_entry(image_hash, prompt_hash)
+        if entry is None:
+            raise ModelTransportError(
+                f"No recorded response for image {image_hash[:12]} / prompt {prompt_hash[:12]}")
+        return entry
+
+    def generate(self, prompt: str, image=None, generation_config: Dict = None,
+                 model_name: str = None) -> Dict:
+        model_name = model_name or self.model_name
+        entry = self._lookup(prompt, image, model_name)
+
+        latency = self._replay_latency(entry)
+        if latency > 0:
+            time.sleep(latency)
+        return self._answer(entry, latency, model_name)
+
+    async def generate_async(self, prompt: str, image=None, generation_config: Dict = None,
+                             model_name: str = None) -> Dict:
+        model_name = model_name or self.model_name
+        entry = await asyncio.get_running_loop().run_in_executor(None, self._lookup, prompt, image, model_name)
+
+        latency = self._replay_latency(entry)
+        if latency > 0:
+            await asyncio.sleep(latency)
+        return self._answer(entry, latency, model_name)
+
+    @staticmethod
+    def _answer(entry: Dict, latency: float, model_name: str) -> Dict:
+        """Response dictionary of a recording, raising recorded failures"""
+        if entry.get("error") is not None:
+            raise ModelTransportError(entry["error"], entry.get("status_code"))
+
+        return {
+            "text": entry["text"],
+            "finish_reason": entry.get("finish_reason"),
+            "latency": latency,
+            "model": model_name,
+            "usage": entry.get("usage")
+        }
+
+
+class StubTransport:
+    """Local transport returning a fixed answer after an injected latency"""
+
+    def __init__(self, latency: float = None, slow_fraction: float = None, slow_latency: float = None,
+                 text: str = '{"has_tables": false, "tables": []}', seed: int = None,
+                 model_name: str = None):
+        """
+        Args:
+            latency (float): Seconds every call takes
+            slow_fraction (float): Share of calls that take slow_latency instead
+            slow_latency (float): Seconds a slow call takes
+            text (str): Response text
+            seed (int): Seed for choosing the slow calls
+            model_name (str): Model name reported in responses
+        """
+        self.latency = config.STUB_LATENCY if latency is None else latency
+        self.slow_fraction = config.STUB_SLOW_FRACTION if slow_fraction is None else slow_fraction
+        self.slow_latency = config.STUB_SLOW_LATENCY if slow_latency is None else slow_latency
+        self.text = text
+        self.model_name = model_name or config.MODEL_NAME
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _next_latency(self) -> float:
+        with self._lock:
+            self.calls += 1
+            slow = self._random.random() < self.slow_fraction
+        return self.slow_latency if slow else self.latency
+
+    def generate(self, prompt: str, image=None, generation_config: Dict = None,
+                 model_name: str = None) -> Dict:
+        latency = self._next_latency()
+        time.sleep(latency)
+        return self._answer(prompt, image, latency, model_name)
+
+    async def generate_async(self, prompt: str, image=None, generation_config: Dict = None,
+                             model_name: str = None) -> Dict:
+        latency = self._next_latency()
+        await asyncio.sleep(latency)
+        return self._answer(prompt, image, latency, model_name)
+
+    def _answer(self, prompt: str, image, latency: float, model_name: str) -> Dict:
+        # Rough Gemini-like counts: ~4 characters per token, 258 tokens per image
+        usage = {"input_tokens": len(prompt) // 4 + (258 if image is not None else 0),
+                 "output_tokens": len(self.text) // 4}
+        return {"text": self.text, "finish_reason": "STOP", "latency": latency,
+                "model": model_name or self.model_name, "usage": usage}
+
+
+class HedgingTransport:
+    """
+    Sends a duplicate request when a call is slower than the rolling p95
+
+    The first answer wins; the other request is left to finish in the
+    background and its answer is discarded, but the tokens it used are still
+    charged to the token ledger. Hedges are capped at max_hedge_rate of all
+    calls so a general slowdown does not double the load on the API.
+    """
+
+    def __init__(self, inner, quantile: float = None, max_hedge_rate: float = None,
+                 min_samples: int = None, window: int = 500, max_workers: int = 64,
+                 ledger_key: str = None):
+        """
+        Args:
+            inner: Transport performing the requests
+            quantile (float): Latency quantile after which a call is hedged
+            max_hedge_rate (float): Maximum share of calls that may be hedged
+            min_samples (int): Calls to observe (per model) before hedging starts
+            window (int): Number of recent latencies the quantile is taken over
+            max_workers (int): Threads running requests
+            ledger_key (str): Token ledger key the discarded requests are charged
+                to (the API key), None to only count them in stats
+        """
+        self.inner = inner
+        self.ledger_key = ledger_key
+        self.model_name = getattr(inner, "model_name", config.MODEL_NAME)
+        self.quantile = config.HEDGE_QUANTILE if quantile is None else quantile
+        self.max_hedge_rate = config.HEDGE_MAX_RATE if max_hedge_rate is None else max_hedge_rate
+        self.min_samples = config.HEDGE_MIN_SAMPLES if min_samples is None else min_samples
+        self.window = window
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        self._latencies = {}  # model -> deque of recent latencies
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "discarded_tokens": 0}
+
+    def hedge_delay(self, model_name: str) -> Optional[float]:
+        """Seconds after which a call to this model is hedged, None before enough samples"""
+        with self._lock:
+            samples = sorted(self._latencies.get(model_name, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(self.quantile * len(samples)))]
+
+    def _record(self, model_name: str, latency: float):
+        with self._lock:
+            self._latencies.setdefault(model_name, deque(maxlen=self.window)).append(latency)
+
+    def _call(self, prompt, image, generation_config, model_name) -> Dict:
+        start = time.perf_counter()
+        response = self.inner.generate(prompt, image, generation_config, model_name)
+        self._record(model_name, time.perf_counter() - start)
+        return response
+
+    async def _call_async(self, prompt, image, generation_config, model_name) -> Dict:
+        start = time.perf_counter()
+        response = await self.inner.generate_async(prompt, image, generation_config, model_name)
+        self._record(model_name, time.perf_counter() - start)
+        return response
+
+    def _discard(self, future):
+        """Done callback of the losing request: retrieve its outcome and charge its tokens"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        tokens = total_tokens(future.result().get("usage") or {})
+        if not tokens:
+            return
+        with self._lock:
+            self.stats["discarded_tokens"] += tokens
+        if self.ledger_key:
+            get_token_ledger().record(self.ledger_key, tokens)
+
+    def _may_hedge(self) -> bool:
+        with self._lock:
+            if self.stats["hedged"] + 1 > self.max_hedge_rate * self.stats["calls"]:
+                return False
+            self.stats["hedged"] += 1
+            return True
+
+    def generate(self, prompt: str, image=None, generation_config: Dict = None,
+                 model_name: str = None) -> Dict:
+        model_name = model_name or self.model_name
+        with self._lock:
+            self.stats["calls"] += 1
+
+        primary = self._executor.submit(self._call, prompt, image, generation_config, model_name)
+        delay = self.hedge_delay(model_name)
+        if delay is None:
+            return primary.result()
+
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._may_hedge():
+            return primary.result()
+
+        hedge = self._executor.submit(self._call, prompt, image, generation_config, model_name)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self._lock:
+                            self.stats["hedge_wins"] += 1
+                    (hedge if future is primary else primary).add_done_callback(self._discard)
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def generate_async(self, prompt: str, image=None, generation_config: Dict = None,
+                             model_name: str = None) -> Dict:
+        model_name = model_name or self.model_name
+        with self._lock:
+            self.stats["calls"] += 1
+
+        primary = asyncio.ensure_future(self._call_async(prompt, image, generation_config, model_name))
+        delay = self.hedge_delay(model_name)
+        if delay is None:
+            return await primary
+
+        done, _ = await asyncio.wait([primary], timeout=delay)
+        if done or not self._may_hedge():
+            return await primary
+
+        hedge = asyncio.ensure_future(self._call_async(prompt, image, generation_config, model_name))
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        with self._lock:
+                            self.stats["hedge_wins"] += 1
+                    (hedge if task is primary else primary).add_done_callback(self._discard)
+                    return task.result()
+                error = task.exception()
+        raise error
+
+
+_replay_transports = {}
+_replay_lock = threading.Lock()
+
+
+def create_transport(api_key: str, mode: str = None, archive_dir: str = None,
+                     model_name: str = None):
+    """
+    Build the transport selected by configuration
+
+    Replay transports are shared per archive directory so that concurrent jobs
+    advance the same recorded sequences. With config.MODEL_HEDGING the
+    transport is wrapped in a HedgingTransport.
+
+    Args:
+        api_key (str): Google AI API key (unused in replay mode)
+        mode (str): "live", "record", "replay" or "stub", defaults to config.MODEL_TRANSPORT
+        archive_dir (str): Archive directory for record/replay modes
+        model_name (str): Default model name
+
+    Returns:
+        Transport instance
+    """
+    mode = (mode or config.MODEL_TRANSPORT).lower()
+    archive_dir = archive_dir or config.MODEL_ARCHIVE_DIR
+
+    if mode == "live":
+        transport = GeminiTransport(api_key, model_name)
+    elif mode == "record":
+        transport = RecordingTransport(GeminiTransport(api_key, model_name), archive_dir)
+    elif mode == "replay":
+        with _replay_lock:
+            if archive_dir not in _replay_transports:
+                _replay_transports[archive_dir] = ReplayTransport(archive_dir, model_name=model_name)
+            transport = _replay_transports[archive_dir]
+    elif mode == "stub":
+        transport = StubTransport(model_name=model_name)
+    else:
+        raise ValueError(f"Unknown model transport: {mode}")
+
+    return HedgingTransport(transport, ledger_key=api_key) if config.MODEL_HEDGING else transport
@@ -1,49 +1,82 @@
 import os
 import base64
-import pandas as pd
-import google.generativeai as genai
 from pathlib import Path
 import json
 import re
 from typing import List, Dict, Optional
 import io
-import fitz  # PyMuPDF
-import platform
+import functools
+import hashlib
+import importlib.util
+import shutil
 import subprocess
 import sys
+import time
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
 
-# Optional imports for different PDF processing methods
-try:
-    from pdf2image import convert_from_path
-    PDF2IMAGE_AVAILABLE = True
-except ImportError:
-    PDF2IMAGE_AVAILABLE = False
-    print("pdf2image not available. Using PyMuPDF instead.")
+import config
+from model_transport import create_transport
+from tracing import JobTrace, NULL_TRACE
+from job_context import ExtractionJob
+from scheduler import get_async_page_slots, get_scheduler
+from render_pool import get_render_pool
+from checkpoint import open_journal
+from admission import get_memory_budget, plan_render
+from layout_templates import get_template_store, grid_prompt, page_text, page_texts, parse_grid_response
+from usage import sum_usage
+from table_writer import IncrementalTableWriter
+from artifacts import artifact_path, open_artifact, output_compression
+from table_regions import detect_regions_for_pdf, crop_region
+from validation import validate_table
+from tiling import (FULL_PAGE, BAND_PROMPT_NOTE, page_token_profiles, estimate_output_tokens,
+                    plan_bands, is_truncated, stitch_band_tables)
 
-try:
-    import PyPDF2
-    PYPDF2_AVAILABLE = True
-except ImportError:
-    PYPDF2_AVAILABLE = False
+# Heavy dependencies (pandas, PyMuPDF, pdf2image, google.generativeai) are
+# imported on first use so that importing this module stays cheap on cold start.
+
+@functools.lru_cache(maxsize=None)
+def probe_dependencies() -> Dict[str, bool]:
+    """
+    Detect the available PDF processing methods once per process
+    
+    Uses import specs and PATH lookups only, so nothing is imported and no
+    subprocess is spawned. Call probe_dependencies.cache_clear() after
+    installing a package.
+    
+    Returns:
+        Dict[str, bool]: Availability of "pymupdf", "pdf2image" and "poppler"
+    """
+    return {
+        "pymupdf": importlib.util.find_spec("fitz") is not None,
+        "pdf2image": importlib.util.find_spec("pdf2image") is not None,
+        "poppler": shutil.which("pdftoppm") is not None
+    }
 
 class PDFTableExtractor:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, transport=None, crop_regions: bool = None, model_cascade: List[str] = None):
         """
         Initialize the PDF Table Extractor with Gemini 2.0 Flash
         
         Args:
             api_key (str): Your Google AI API key
+            transport: Optional model transport (see model_transport.py).
+                Defaults to the transport selected by config.MODEL_TRANSPORT.
+            crop_regions (bool): Send only detected table regions to the model.
+                Defaults to config.CROP_TABLE_REGIONS.
+            model_cascade (List[str]): Models to try per page, cheapest first.
+                Defaults to config.MODEL_CASCADE.
         """
         self.api_key = api_key
-        genai.configure(api_key=api_key)
+        self.crop_regions = config.CROP_TABLE_REGIONS if crop_regions is None else crop_regions
+        self.model_cascade = list(model_cascade or config.MODEL_CASCADE) or [config.MODEL_NAME]
         
-        # Initialize Gemini 2.0 Flash model
-        self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
+        # Model calls go through a transport so they can be recorded and replayed
+        self.transport = transport or create_transport(api_key)
         
-        # Base output directory - will be set per PDF
+        # Base output directory - each job gets its own sub-directory
         self.base_output_dir = Path("extracted_tables")
         self.base_output_dir.mkdir(exist_ok=True)
-        self.output_dir = None  # Will be set when processing PDF
         
         # Check available PDF processing methods
         self.check_dependencies()
@@ -59,6 +92,8 @@ class PDFTableExtractor:
             str: Extracted title or fallback name
         """
         try:
+            import fitz  # PyMuPDF
+            
             doc = fitz.open(pdf_path)
             
             # First try to get title from metadata
@@ -153,12 +188,16 @@ class PDFTableExtractor:
         
         return sanitized
     
-    def setup_output_directory(self, pdf_path: str):
+    def setup_output_directory(self, pdf_path: str, output_root=None) -> Path:
         """
         Setup output directory based on PDF title
         
         Args:
             pdf_path (str): Path to the PDF file
+            output_root: Directory to create it in, defaults to base_output_dir
+            
+        Returns:
+            Path: The newly created directory
         """
         # Extract title from PDF
         pdf_title = self.extract_pdf_title(pdf_path)
@@ -168,30 +207,40 @@ class PDFTableExtractor:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         dir_name = f"{pdf_title}_{timestamp}"
         
-        # Create the output directory
-        self.output_dir = self.base_output_dir / dir_name
-        self.output_dir.mkdir(exist_ok=True)
+        # Create the output directory; concurrent jobs for the same PDF in the
+        # same second get a numeric suffix instead of sharing a directory
+        output_root = Path(output_root) if output_root else self.base_output_dir
+        output_dir = output_root / dir_name
+        suffix = 1
+        while True:
+            try:
+                output_dir.mkdir()
+                break
+            except FileExistsError:
+                suffix += 1
+                output_dir = output_root / f"{dir_name}_{suffix}"
         
-        print(f"📁 Created output directory: {self.output_dir}")
+        print(f"📁 Created output directory: {output_dir}")
         print(f"📄 PDF Title detected: {pdf_title}")
+        return output_dir
     
     def check_dependencies(self):
         """Check and report available PDF processing methods"""
         print("Checking PDF processing dependencies...")
         
+        available = probe_dependencies()
         methods = []
-        if PDF2IMAGE_AVAILABLE:
+        if available["pdf2image"]:
             if self.check_poppler():
                 methods.append("pdf2image + poppler")
                 print("✓ pdf2image with poppler available")
             else:
                 print("✗ pdf2image available but poppler not found")
         
-        try:
-            import fitz
+        if available["pymupdf"]:
             methods.append("PyMuPDF")
             print("✓ PyMuPDF available")
-        except ImportError:
+        else:
             print("✗ PyMuPDF not available")
         
         if not methods:
@@ -202,52 +251,52 @@ class PDFTableExtractor:
     
     def check_poppler(self) -> bool:
         """Check if poppler is installed and accessible"""
-        try:
-            if platform.system() == "Windows":
-                subprocess.run(["pdftoppm", "-h"], capture_output=True, check=True)
-            else:
-                subprocess.run(["which", "pdftoppm"], capture_output=True, check=True)
-            return True
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            return False
+        return probe_dependencies()["poppler"]
     
     def install_pymupdf(self):
         """Install PyMuPDF if not available"""
         try:
             subprocess.check_call([sys.executable, "-m", "pip", "install", "PyMuPDF"])
             print("✓ PyMuPDF installed successfully")
-            global fitz
+            importlib.invalidate_caches()
+            probe_dependencies.cache_clear()
             import fitz
         except Exception as e:
             print(f"Failed to install PyMuPDF: {e}")
             raise Exception("No PDF processing library available. Please install either PyMuPDF or pdf2image with poppler.")
     
-    def pdf_to_images_pymupdf(self, pdf_path: str) -> List[any]:
+    def pdf_to_images_pymupdf(self, pdf_path: str, trace=NULL_TRACE, zoom: float = 3.0) -> List[any]:
         """
         Convert PDF pages to images using PyMuPDF with enhanced quality
         
         Args:
             pdf_path (str): Path to the PDF file
+            trace: Optional JobTrace recording per-page render/encode spans
+            zoom (float): Scale factor, 3.0 = 216 DPI
             
         Returns:
             List of PIL Image objects
         """
         try:
+            import fitz  # PyMuPDF
             from PIL import Image
             doc = fitz.open(pdf_path)
             images = []
             
             for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                # Convert to image with higher DPI for better text recognition
-                mat = fitz.Matrix(3.0, 3.0)  # 3x zoom = 216 DPI for better accuracy
-                pix = page.get_pixmap(matrix=mat, alpha=False)  # No alpha for cleaner text
-                img_data = pix.tobytes("png")
-                img = Image.open(io.BytesIO(img_data))
+                with trace.span("render", page=page_num + 1):
+                    page = doc.load_page(page_num)
+                    # Convert to image with higher DPI for better text recognition
+                    mat = fitz.Matrix(zoom, zoom)  # 3x zoom = 216 DPI for better accuracy
+                    pix = page.get_pixmap(matrix=mat, alpha=False)  # No alpha for cleaner text
                 
-                # Convert to RGB if needed for better processing
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
+                with trace.span("encode", page=page_num + 1):
+                    img_data = pix.tobytes("png")
+                    img = Image.open(io.BytesIO(img_data))
+                    
+                    # Convert to RGB if needed for better processing
+                    if img.mode != 'RGB':
+                        img = img.convert('RGB')
                 
                 images.append(img)
             
@@ -258,49 +307,70 @@ class PDFTableExtractor:
             print(f"Error converting PDF to images with PyMuPDF: {e}")
             return []
     
-    def pdf_to_images_pdf2image(self, pdf_path: str) -> List[any]:
+    def render_page(self, pdf_path: str, page_num: int, zoom: float = 3.0):
+        """
+        Render a single page with PyMuPDF
+        
+        Args:
+            pdf_path (str): Path to the PDF file
+            page_num (int): Page number (1-based)
+            zoom (float): Scale factor, 3.0 = 216 DPI
+            
+        Returns:
+            PIL Image object
+        """
+        import fitz  # PyMuPDF
+        from PIL import Image
+        
+        with fitz.open(pdf_path) as doc:
+            pix = doc.load_page(page_num - 1).get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    
+    def pdf_to_images_pdf2image(self, pdf_path: str, dpi: int = 200) -> List[any]:
         """
         Convert PDF pages to images using pdf2image
         
         Args:
             pdf_path (str): Path to the PDF file
+            dpi (int): Render resolution
             
         Returns:
             List of PIL Image objects
         """
         try:
-            if not PDF2IMAGE_AVAILABLE:
+            if not probe_dependencies()["pdf2image"]:
                 raise Exception("pdf2image not available")
             
-            images = convert_from_path(pdf_path, dpi=200)
+            from pdf2image import convert_from_path
+            images = convert_from_path(pdf_path, dpi=dpi)
             return images
         except Exception as e:
             print(f"Error converting PDF to images with pdf2image: {e}")
             return []
     
-    def pdf_to_images(self, pdf_path: str) -> List[any]:
+    def pdf_to_images(self, pdf_path: str, trace=NULL_TRACE, zoom: float = 3.0) -> List[any]:
         """
         Convert PDF pages to images using available method
         
         Args:
             pdf_path (str): Path to the PDF file
+            trace: Optional JobTrace recording per-page render/encode spans
+            zoom (float): Scale factor, 3.0 = 216 DPI
             
         Returns:
             List of PIL Image objects
         """
         # Try PyMuPDF first (more reliable)
-        try:
-            import fitz
-            images = self.pdf_to_images_pymupdf(pdf_path)
+        if probe_dependencies()["pymupdf"]:
+            images = self.pdf_to_images_pymupdf(pdf_path, trace, zoom)
             if images:
                 print(f"✓ Converted {len(images)} pages using PyMuPDF")
                 return images
-        except ImportError:
-            pass
         
         # Fallback to pdf2image if available and poppler is installed
-        if PDF2IMAGE_AVAILABLE and self.check_poppler():
-            images = self.pdf_to_images_pdf2image(pdf_path)
+        if probe_dependencies()["pdf2image"] and self.check_poppler():
+            with trace.span("render", method="pdf2image"):
+                images = self.pdf_to_images_pdf2image(pdf_path, dpi=min(200, round(72 * zoom)))
             if images:
                 print(f"✓ Converted {len(images)} pages using pdf2image")
                 return images
@@ -308,6 +378,41 @@ class PDFTableExtractor:
         print("❌ Failed to convert PDF to images. Please install PyMuPDF or pdf2image with poppler.")
         return []
     
+    def render_pages(self, pdf_path: str, trace=NULL_TRACE, skip=(), zoom: float = 3.0) -> List[Future]:
+        """
+        Start rendering every page of a PDF
+        
+        Pages are rendered in the process pool of render_pool.py when it is
+        enabled, otherwise in this thread with pdf_to_images.
+        
+        Args:
+            pdf_path (str): Path to the PDF file
+            trace: Optional JobTrace recording in-process render/encode spans
+            skip: Page numbers (1-based) that need no image, e.g. checkpointed pages
+            zoom (float): Scale factor, 3.0 = 216 DPI
+            
+        Returns:
+            List[Future]: One future per page resolving to a PIL Image (None for
+            skipped pages), empty on failure
+        """
+        pool = get_render_pool() if probe_dependencies()["pymupdf"] else None
+        if pool:
+            try:
+                import fitz  # PyMuPDF
+                with fitz.open(pdf_path) as doc:
+                    page_count = doc.page_count
+                print(f"✓ Rendering {page_count} pages in {pool.processes} processes")
+                return pool.render_document(pdf_path, page_count, zoom, skip=skip)
+            except Exception as e:
+                print(f"Render pool unavailable, rendering in-process: {e}")
+        
+        futures = []
+        for page_num, image in enumerate(self.pdf_to_images(pdf_path, trace, zoom), 1):
+            future = Future()
+            future.set_result(None if page_num in skip else image)
+            futures.append(future)
+        return futures
+    
     def encode_image(self, image) -> str:
         """
         Encode PIL image to base64 string
@@ -486,34 +591,530 @@ class PDFTableExtractor:
         """
         return prompt
     
-    def extract_tables_from_image(self, image) -> Dict:
+    def generation_config(self) -> Dict:
+        """Generation parameters of every extraction request"""
+        return {
+            'temperature': 0.1,  # Lower temperature for more consistent output
+            'top_p': 0.8,
+            'top_k': 40,
+            'max_output_tokens': config.MAX_OUTPUT_TOKENS,  # Dense pages are split into bands
+        }
+    
+    def extract_tables_from_image(self, image, trace=NULL_TRACE, page_num: int = None,
+                                  band: bool = False, model_name: str = None) -> Dict:
         """
         Extract tables from a single image using Gemini with enhanced error handling
         
         Args:
             image: PIL Image object
+            trace: Optional JobTrace recording model call and parse spans
+            page_num (int): Page number, used to label trace spans
+            band (bool): The image is a horizontal slice of a larger page
+            model_name (str): Model to use, defaults to the transport's model
             
         Returns:
-            Dictionary containing extraction results
+            Dictionary containing extraction results. "truncated" is set when the
+            answer hit the output token limit.
         """
         try:
-            prompt = self.create_table_extraction_prompt()
-            
             # Generate content using Gemini 2.0 Flash with enhanced parameters
-            generation_config = {
-                'temperature': 0.1,  # Lower temperature for more consistent output
-                'top_p': 0.8,
-                'top_k': 40,
-                'max_output_tokens': 8192,  # Increased for larger tables
-            }
-            
-            response = self.model.generate_content(
-                [prompt, image],
-                generation_config=generation_config
-            )
+            with trace.span("model_call", page=page_num):
+                response = self.transport.generate(self.image_prompt(band), image,
+                                                   generation_config=self.generation_config(),
+                                                   model_name=model_name)
+            return self.image_result(response, image, trace, page_num)
+                
+        except Exception as e:
+            return self.image_error(e, image)
+    
+    async def extract_tables_from_image_async(self, image, trace=NULL_TRACE, page_num: int = None,
+                                              band: bool = False, model_name: str = None) -> Dict:
+        """Non-blocking variant of extract_tables_from_image"""
+        try:
+            with trace.span("model_call", page=page_num):
+                response = await self.transport.generate_async(self.image_prompt(band), image,
+                                                               generation_config=self.generation_config(),
+                                                               model_name=model_name)
+            return self.image_result(response, image, trace, page_num)
+        
+        except Exception as e:
+            return self.image_error(e, image)
+    
+    def image_prompt(self, band: bool = False) -> str:
+        """Extraction prompt for a page or region image, or for a band of one"""
+        prompt = self.create_table_extraction_prompt()
+        return prompt + BAND_PROMPT_NOTE if band else prompt
+    
+    def image_result(self, response: Dict, image, trace=NULL_TRACE, page_num: int = None) -> Dict:
+        """Extraction result of a model answer for an image"""
+        with trace.span("parse", page=page_num):
+            result = self.parse_extraction_response(response["text"])
+        
+        if response.get("finish_reason") == "MAX_TOKENS":
+            result["truncated"] = True
+        
+        result["usage"] = dict(response.get("usage") or {}, calls=1,
+                               image_pixels=image.size[0] * image.size[1])
+        return result
+    
+    def image_error(self, error: Exception, image) -> Dict:
+        """Extraction result of a failed model call for an image"""
+        print(f"Error extracting tables from image: {error}")
+        import traceback
+        print(f"Full traceback: {traceback.format_exc()}")
+        return {"has_tables": False, "tables": [], "error": str(error),
+                "usage": {"calls": 1, "image_pixels": image.size[0] * image.size[1]}}
+    
+    def extract_page(self, image, page_num: int, regions: List = None, trace=NULL_TRACE,
+                     token_profile: List = None, model_name: str = None) -> Dict:
+        """
+        Extract tables from one page, splitting it into region crops and bands as needed
+        
+        Every detected table region (or the whole page) is checked against the
+        output token budget using the text-layer estimate; dense areas are split
+        into overlapping horizontal bands up front so that all requests for the
+        page run in one parallel round. Areas whose answer still comes back
+        truncated are retried once as bands.
+        
+        Args:
+            image: PIL Image of the full page
+            page_num (int): Page number
+            regions (List): Table regions as page fractions (see table_regions.py);
+                empty or None sends the whole page
+            trace: Optional JobTrace
+            token_profile (List): Word token costs of the page (see tiling.py);
+                None disables up-front tiling
+            model_name (str): Model to use, defaults to the transport's model
+            
+        Returns:
+            Dictionary containing extraction results for the whole page
+        """
+        areas, plans = self.plan_page_areas(regions, token_profile)
+        area_results = self._extract_area_plans(image, plans, page_num, trace, model_name)
+        
+        # Retry areas whose single answer was cut off by the output limit as bands
+        retry, retry_plans = self.truncated_areas(areas, plans, area_results, token_profile, page_num)
+        replaced = [area_results[i] for i in retry]
+        if retry:
+            for i, result in zip(retry, self._extract_area_plans(image, retry_plans, page_num, trace, model_name)):
+                area_results[i] = result
+        
+        return self.merge_page_areas(area_results, replaced)
+    
+    async def extract_page_async(self, image, page_num: int, regions: List = None, trace=NULL_TRACE,
+                                 token_profile: List = None, model_name: str = None) -> Dict:
+        """Non-blocking variant of extract_page"""
+        areas, plans = self.plan_page_areas(regions, token_profile)
+        area_results = await self._extract_area_plans_async(image, plans, page_num, trace, model_name)
+        
+        retry, retry_plans = self.truncated_areas(areas, plans, area_results, token_profile, page_num)
+        replaced = [area_results[i] for i in retry]
+        if retry:
+            retried = await self._extract_area_plans_async(image, retry_plans, page_num, trace, model_name)
+            for i, result in zip(retry, retried):
+                area_results[i] = result
+        
+        return self.merge_page_areas(area_results, replaced)
+    
+    def plan_page_areas(self, regions: List = None, token_profile: List = None):
+        """
+        Areas of a page to send and the bands each is split into
+        
+        Returns:
+            Tuple of (areas, one list of bands per area)
+        """
+        areas = regions or [FULL_PAGE]
+        if regions:
+            print(f"  Sending {len(regions)} table region(s) instead of the full page")
+        
+        plans = []
+        for area in areas:
+            plan = plan_bands(token_profile or [], area, config.MAX_OUTPUT_TOKENS)
+            if len(plan) > 1:
+                print(f"  Dense area (~{estimate_output_tokens(token_profile, area)} output tokens): "
+                      f"splitting into {len(plan)} bands")
+            plans.append(plan)
+        return areas, plans
+        
+    def truncated_areas(self, areas: List, plans: List[List], area_results: List[Dict],
+                        token_profile: List = None, page_num: int = None):
+        """
+        Areas sent whole whose answer was cut off by the output limit
+        
+        Returns:
+            Tuple of (area indexes, band plans to retry them with)
+        """
+        retry = [i for i, result in enumerate(area_results) if len(plans[i]) == 1 and is_truncated(result)]
+        if not retry:
+            return [], []
+        print(f"  Truncated response on page {page_num}: retrying {len(retry)} area(s) as bands")
+        return retry, [plan_bands(token_profile or [], areas[i], config.MAX_OUTPUT_TOKENS, count=2) for i in retry]
+        
+    def merge_page_areas(self, area_results: List[Dict], replaced: List[Dict]) -> Dict:
+        """Page result of its area results (replaced: superseded results, counted for usage)"""
+        # Areas are ordered top to bottom, so tables keep their reading order
+        tables = []
+        for area_result in area_results:
+            if area_result.get("has_tables"):
+                tables.extend(area_result.get("tables", []))
+        
+        page_result = {"has_tables": bool(tables), "tables": tables,
+                       "usage": sum_usage(area_results + replaced)}
+        if not tables and any(r.get("error") for r in area_results):
+            page_result["error"] = next(r["error"] for r in area_results if r.get("error"))
+        return page_result
+    
+    def extract_rendered_page(self, job: ExtractionJob, page_image: Future, page_num: int) -> Dict:
+        """
+        Wait for a page to be rendered, then extract it
+        
+        Args:
+            job (ExtractionJob): Job owning the page
+            page_image (Future): Future resolving to the page's PIL Image (see render_pages)
+            page_num (int): Page number
+            
+        Returns:
+            Dictionary containing extraction results for the whole page
+        """
+        with job.trace.span("render_wait", page=page_num):
+            image = page_image.result()
+        return self.extract_page_with_cascade(job, image, page_num)
+    
+    async def extract_rendered_page_async(self, job: ExtractionJob, page_image: Future, page_num: int,
+                                          slots=None) -> Dict:
+        """
+        Await a page's rendering, then extract it in one of the event loop's page slots
+        
+        Args:
+            job (ExtractionJob): Job owning the page
+            page_image (Future): Future resolving to the page's PIL Image (see render_pages)
+            page_num (int): Page number
+            slots: AsyncPageSlots bounding the pages in flight (see scheduler.py)
+        
+        Returns:
+            Dictionary containing extraction results for the whole page
+        """
+        with job.trace.span("render_wait", page=page_num):
+            image = await asyncio.wrap_future(page_image)
+        async with (slots or get_async_page_slots()).slot(job.tenant):
+            return await self.extract_page_with_cascade_async(job, image, page_num)
+    
+    def match_template(self, job: ExtractionJob, page_num: int) -> Optional[Dict]:
+        """Learned layout template of a page, if any (see layout_templates.py)"""
+        store = get_template_store(job.tenant)
+        return store.match(job.text_for_page(page_num)) if store is not None and job.page_texts else None
+    
+    def extract_page_with_cascade(self, job: ExtractionJob, image, page_num: int) -> Dict:
+        """
+        Extract a page with the cheapest model whose answer passes the structural checks
+        
+        Args:
+            job (ExtractionJob): Job owning the page (per-model stats are recorded in it)
+            image: PIL Image of the full page
+            page_num (int): Page number
             
+        Returns:
+            Dictionary containing extraction results for the whole page, with
+            the usage of every model it went to
+        """
+        cascade = self.page_cascade(job)
+        if not cascade:
+            return self.budget_skipped_page()
+        
+        spent = []
+        # Known layout: ask the cheapest model for the values only
+        template = self.match_template(job, page_num)
+        if template:
+            result, problems = self.extract_page_with_template(job, image, page_num, template, cascade[0])
+            accepted = self.accept_template_result(job, image, page_num, template, cascade[0], result, problems, spent)
+            if accepted:
+                return accepted
+        
+        for level, model_name in enumerate(cascade):
+            start = time.perf_counter()
+            with job.trace.span("cascade", page=page_num, model=model_name):
+                result = self.extract_page(image, page_num, job.regions_for_page(page_num), job.trace,
+                                           job.token_profile_for_page(page_num), model_name=model_name)
+            accepted = self.accept_cascade_result(job, image, page_num, cascade, level, result,
+                                                  time.perf_counter() - start, spent)
+            if accepted:
+                return accepted
+    
+    async def extract_page_with_cascade_async(self, job: ExtractionJob, image, page_num: int) -> Dict:
+        """Non-blocking variant of extract_page_with_cascade"""
+        cascade = self.page_cascade(job)
+        if not cascade:
+            return self.budget_skipped_page()
+        
+        spent = []
+        template = self.match_template(job, page_num)
+        if template:
+            result, problems = await self.extract_page_with_template_async(job, image, page_num, template,
+                                                                           cascade[0])
+            accepted = self.accept_template_result(job, image, page_num, template, cascade[0], result, problems, spent)
+            if accepted:
+                return accepted
+        
+        for level, model_name in enumerate(cascade):
+            start = time.perf_counter()
+            with job.trace.span("cascade", page=page_num, model=model_name):
+                result = await self.extract_page_async(image, page_num, job.regions_for_page(page_num), job.trace,
+                                                       job.token_profile_for_page(page_num), model_name=model_name)
+            accepted = self.accept_cascade_result(job, image, page_num, cascade, level, result,
+                                                  time.perf_counter() - start, spent)
+            if accepted:
+                return accepted
+    
+    def page_cascade(self, job: ExtractionJob) -> List[str]:
+        """
+        Models a page may go to, cheapest first
+        
+        Over budget the page is extracted with the cheapest model only, or
+        skipped (empty list) once the budget says stop.
+        """
+        action = job.budget_action()
+        if action == "stop":
+            return []
+        return self.model_cascade[:1] if action == "degrade" else self.model_cascade
+    
+    def budget_skipped_page(self) -> Dict:
+        """Page result of a page skipped because the job's token budget is spent"""
+        return {"has_tables": False, "tables": [], "error": "token budget exceeded", "skipped": True}
+    
+    def accept_template_result(self, job: ExtractionJob, image, page_num: int, template: Dict, model_name: str,
+                               result: Dict, problems: List[str], spent: List[Dict]) -> Optional[Dict]:
+        """
+        Page result of a template extraction, or None to fall back to the full prompt
+        
+        Args:
+            spent (List[Dict]): Results the page went through so far, for its usage
+        """
+        spent.append(result)
+        if problems:
+            print(f"  Layout template did not fit page {page_num} ({', '.join(problems)}), using the full prompt")
+            return None
+        result["model"] = model_name
+        result["template"] = template["key"]
+        result["image_size"] = list(image.size)
+        return result
+    
+    def accept_cascade_result(self, job: ExtractionJob, image, page_num: int, cascade: List[str], level: int,
+                              result: Dict, latency: float, spent: List[Dict]) -> Optional[Dict]:
+        """
+        Record one cascade level's answer; return the page result, or None to escalate
+        
+        The last level's answer is accepted whatever its checks.
+        
+        Args:
+            cascade (List[str]): Models of the page (see page_cascade)
+            level (int): Index of the model that produced result
+            latency (float): Seconds the level took
+            spent (List[Dict]): Results the page went through so far, for its usage
+        """
+        model_name = cascade[level]
+        job.record_usage(model_name, result["usage"])
+        spent.append(result)
+        
+        last = level == len(cascade) - 1
+        problems = [] if last else self.structural_problems(result)
+        job.record_model_page(model_name, latency, problems)
+        if problems:
+            print(f"  Escalating page {page_num} from {model_name} to {cascade[level + 1]}: "
+                  f"{', '.join(problems)}")
+            return None
+        result["model"] = model_name
+        result["usage"] = sum_usage(spent)
+        result["image_size"] = list(image.size)
+        return result
+    
+    def extract_page_with_template(self, job: ExtractionJob, image, page_num: int, template: Dict,
+                                   model_name: str):
+        """
+        Extract a page holding a known layout, asking the model for the numeric grid only
+        
+        Args:
+            job (ExtractionJob): Job owning the page
+            image: PIL Image of the full page
+            page_num (int): Page number
+            template (Dict): Matching layout template (see layout_templates.py)
+            model_name (str): Model to use
+            
+        Returns:
+            Tuple of (extraction result with "usage", failed checks). Checks are
+            "template_mismatch" when the answer does not fit the template, or
+            those of structural_problems.
+        """
+        start = time.perf_counter()
+        try:
+            with job.trace.span("model_call", page=page_num, template=template["key"]):
+                response = self.transport.generate(grid_prompt(template), image,
+                                                   generation_config=self.generation_config(), model_name=model_name)
+        except Exception as e:
+            response = e
+        
+        return self.template_outcome(job, image, page_num, template, model_name, response,
+                                     time.perf_counter() - start)
+    
+    async def extract_page_with_template_async(self, job: ExtractionJob, image, page_num: int, template: Dict,
+                                               model_name: str):
+        """Non-blocking variant of extract_page_with_template"""
+        start = time.perf_counter()
+        try:
+            with job.trace.span("model_call", page=page_num, template=template["key"]):
+                response = await self.transport.generate_async(grid_prompt(template), image,
+                                                               generation_config=self.generation_config(),
+                                                               model_name=model_name)
+        except Exception as e:
+            response = e
+        
+        return self.template_outcome(job, image, page_num, template, model_name, response,
+                                     time.perf_counter() - start)
+    
+    def template_outcome(self, job: ExtractionJob, image, page_num: int, template: Dict, model_name: str,
+                         response, latency: float):
+        """
+        Parse and record a template extraction
+        
+        Args:
+            response: Transport answer, or the exception the call raised
+            latency (float): Seconds the call took
+        
+        Returns:
+            Tuple of (extraction result with "usage", failed checks), as
+            extract_page_with_template
+        """
+        usage = {"calls": 1, "image_pixels": image.size[0] * image.size[1]}
+        result = None
+        try:
+            if isinstance(response, Exception):
+                raise response
+            usage.update(response.get("usage") or {})
+            result = parse_grid_response(response["text"], template)
+        except Exception as e:
+            print(f"Error extracting page {page_num} with its layout template: {e}")
+        
+        problems = ["template_mismatch"] if result is None else self.structural_problems(result)
+        job.record_usage(model_name, usage)
+        job.record_model_page(model_name, latency, problems)
+        
+        result = result or {"has_tables": False, "tables": []}
+        result["usage"] = usage
+        return result, problems
+    
+    def structural_problems(self, result: Dict) -> List[str]:
+        """
+        Checks an extraction must pass to be accepted without escalation
+        
+        Args:
+            result (Dict): Page extraction result
+            
+        Returns:
+            List[str]: Failed checks: "parse_error", "error", "column_mismatch", "totals"
+        """
+        problems = []
+        if result.get("error"):
+            problems.append("parse_error" if result["error"] == "parse_error" else "error")
+        
+        tables = result.get("tables", [])
+        # Rows that save_table_to_csv would have to pad or truncate
+        if any(table.get("headers") and any(len(row) != len(table["headers"]) for row in table.get("data", []))
+               for table in tables):
+            problems.append("column_mismatch")
+        
+        try:
+            if any(not validate_table(table)["valid"] for table in tables):
+                problems.append("totals")
+        except Exception as e:
+            print(f"  Total checks skipped: {e}")
+        
+        return problems
+    
+    def _extract_area_plans(self, image, plans: List[List], page_num: int, trace=NULL_TRACE,
+                            model_name: str = None) -> List[Dict]:
+        """
+        Run the model requests for a list of area plans in parallel
+        
+        Args:
+            image: PIL Image of the full page
+            plans (List[List]): One list of bands per area
+            page_num (int): Page number
+            trace: Optional JobTrace
+            model_name (str): Model to use, defaults to the transport's model
+            
+        Returns:
+            List[Dict]: One extraction result per area, bands stitched together
+        """
+        requests = self.area_requests(plans)
+        
+        def run(request):
+            band, is_band = request
+            crop = self.crop_band(image, band, trace, page_num)
+            return self.extract_tables_from_image(crop, trace, page_num, band=is_band, model_name=model_name)
+        
+        if len(requests) == 1:
+            outputs = [run(requests[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(len(requests), config.REGION_WORKERS)) as executor:
+                outputs = list(executor.map(run, requests))
+        return self.stitch_area_results(plans, outputs)
+        
+    async def _extract_area_plans_async(self, image, plans: List[List], page_num: int, trace=NULL_TRACE,
+                                        model_name: str = None) -> List[Dict]:
+        """Non-blocking variant of _extract_area_plans, also at most REGION_WORKERS requests at a time"""
+        loop = asyncio.get_running_loop()
+        limit = asyncio.Semaphore(max(1, config.REGION_WORKERS))
+        
+        async def run(band, is_band):
+            async with limit:
+                crop = image if band == FULL_PAGE else \
+                    await loop.run_in_executor(None, self.crop_band, image, band, trace, page_num)
+                return await self.extract_tables_from_image_async(crop, trace, page_num, band=is_band,
+                                                                  model_name=model_name)
+        
+        outputs = await asyncio.gather(*(run(band, is_band) for band, is_band in self.area_requests(plans)))
+        return self.stitch_area_results(plans, list(outputs))
+    
+    def area_requests(self, plans: List[List]) -> List[tuple]:
+        """One (band, is_band) request per band of every area plan, in plan order"""
+        return [(band, len(plan) > 1) for plan in plans for band in plan]
+    
+    def crop_band(self, image, band, trace=NULL_TRACE, page_num: int = None):
+        """Image to send for a band of a page (the page itself for FULL_PAGE)"""
+        if band == FULL_PAGE:
+            return image
+        with trace.span("crop", page=page_num):
+            return crop_region(image, band)
+    
+    def stitch_area_results(self, plans: List[List], outputs: List[Dict]) -> List[Dict]:
+        """Group request results by area, stitching the bands of split areas"""
+        area_results = []
+        position = 0
+        for plan in plans:
+            band_results = outputs[position:position + len(plan)]
+            position += len(plan)
+            if len(band_results) == 1:
+                area_results.append(band_results[0])
+            else:
+                tables = stitch_band_tables(band_results)
+                area_result = {"has_tables": bool(tables), "tables": tables, "usage": sum_usage(band_results)}
+                if any(is_truncated(r) for r in band_results):
+                    area_result["truncated"] = True
+                area_results.append(area_result)
+        return area_results
+    
+    def parse_extraction_response(self, response_text: str) -> Dict:
+        """
+        Parse and validate the model's JSON answer
+        
+        Args:
+            response_text (str): Raw response text
+            
+        Returns:
+            Dictionary containing extraction results
+        """
+        try:
             # Parse the JSON response with better error handling
-            response_text = response.text.strip()
+            response_text = response_text.strip()
             
             # Multiple cleaning attempts for robust parsing
             if response_text.startswith('```json'):
@@ -580,15 +1181,14 @@ class PDFTableExtractor:
                     return result
                 except:
                     print(f"Failed to recover from JSON error")
-                    return {"has_tables": False, "tables": []}
+                    return {"has_tables": False, "tables": [], "error": "parse_error"}
                 
         except Exception as e:
-            print(f"Error extracting tables from image: {e}")
-            import traceback
-            print(f"Full traceback: {traceback.format_exc()}")
+            print(f"Error parsing model response: {e}")
             return {"has_tables": False, "tables": []}
     
-    def save_table_to_csv(self, table_data: Dict, page_num: int, table_num: int, pdf_name: str) -> str:
+    def save_table_to_csv(self, table_data: Dict, page_num: int, table_num: int, pdf_name: str,
+                          output_dir: Path) -> str:
         """
         Save extracted table data to CSV file with title
         
@@ -597,11 +1197,14 @@ class PDFTableExtractor:
             page_num (int): Page number
             table_num (int): Table number on the page
             pdf_name (str): Original PDF filename
+            output_dir (Path): Job output directory
             
         Returns:
             Path to saved CSV file
         """
         try:
+            import pandas as pd
+            
             # Create filename based on the actual extracted title
             title = table_data.get('title', '')
             if title:
@@ -616,7 +1219,7 @@ class PDFTableExtractor:
                 # Fallback filename
                 filename = f"{pdf_name}_page{page_num}_table{table_num}_Table.csv"
             
-            filepath = self.output_dir / filename
+            filepath = artifact_path(Path(output_dir) / filename, output_compression())
             
             # Get headers and data
             headers = table_data.get('headers', [])
@@ -696,7 +1299,7 @@ class PDFTableExtractor:
                 return None
             
             # Save to CSV with title at the top
-            with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
+            with open_artifact(filepath, 'w') as csvfile:
                 # Add title as first row if available
                 title = table_data.get('title')
                 if title:
@@ -721,158 +1324,726 @@ class PDFTableExtractor:
                 print(f"  Max columns in data: {max(len(row) for row in table_data.get('data', []))}")
             return None
     
-    def process_pdf(self, pdf_path: str) -> Dict:
+    def process_pdf(self, pdf_path: str, trace: bool = False, profile: bool = False,
+                    on_table=None, tenant: str = None, output_root=None) -> Dict:
         """
         Process entire PDF and extract all tables
         
+        Safe to call concurrently on one extractor: all per-document state lives
+        in the ExtractionJob created for the call.
+        
         Args:
             pdf_path (str): Path to PDF file
+            trace (bool): Record a Chrome trace-event JSON of the job's pipeline
+                stages, written next to the summary report
+            profile (bool): Also dump a cProfile of the job thread and sampled
+                stacks of all threads (implies trace); needs TRACE_PROFILING
+            on_table: Optional callback receiving (combined table, CSV path) as
+                soon as each table is saved
+            tenant (str): Who the pages are scheduled for, defaults to the API key
+            output_root: Directory the job's output directory is created in,
+                defaults to base_output_dir
             
         Returns:
             Dictionary with processing results
         """
+        job = self.create_job(pdf_path, trace=trace, profile=profile, on_table=on_table, tenant=tenant,
+                              output_root=output_root)
+        return self.run_job(job)
+    
+    async def process_pdf_async(self, pdf_path: str, trace: bool = False, on_table=None,
+                                tenant: str = None, output_root=None) -> Dict:
+        """
+        Process entire PDF on the running event loop, without blocking it
+        
+        Every page is a coroutine awaiting the transport's generate_async, so
+        one process keeps hundreds of model requests in flight; they share the
+        loop's AsyncPageSlots (see scheduler.py) instead of the thread-based page
+        scheduler. Rendering, admission, grouping and saving run in the loop's
+        default executor.
+        
+        Args:
+            pdf_path (str): Path to PDF file
+            trace (bool): Record a Chrome trace-event JSON of the job
+            on_table: Optional callback receiving (combined table, CSV path); it is
+                called from an executor thread
+            tenant (str): Whose page slots the pages use, defaults to the API key
+            output_root: Directory the job's output directory is created in
+        
+        Returns:
+            Dictionary with processing results, as process_pdf
+        """
+        loop = asyncio.get_running_loop()
+        job = await loop.run_in_executor(None, functools.partial(self.create_job, pdf_path, trace=trace,
+                                                                 on_table=on_table, tenant=tenant,
+                                                                 output_root=output_root))
+        return await self.run_job_async(job)
+    
+    def create_job(self, pdf_path: str, trace: bool = False, profile: bool = False,
+                   on_table=None, tenant: str = None, output_root=None) -> ExtractionJob:
+        """
+        Create the per-document context for an extraction
+        
+        Args:
+            pdf_path (str): Path to PDF file
+            trace (bool): Record a Chrome trace of the job
+            profile (bool): Also profile the job (implies trace)
+            on_table: Optional callback receiving (combined table, CSV path)
+            tenant (str): Who the pages are scheduled for, defaults to the API key
+            output_root: Directory the job's output directory is created in
+            
+        Returns:
+            ExtractionJob: New job with its own output directory
+        """
         pdf_path = Path(pdf_path)
         if not pdf_path.exists():
             raise FileNotFoundError(f"PDF file not found: {pdf_path}")
         
         # Setup output directory based on PDF title
-        self.setup_output_directory(str(pdf_path))
-        
-        pdf_name = pdf_path.stem
-        print(f"Processing PDF: {pdf_name}")
-        
-        # Convert PDF to images
-        images = self.pdf_to_images(str(pdf_path))
-        if not images:
-            return {
-                "error": "Failed to convert PDF to images",
-                "pdf_name": pdf_name,
-                "total_pages": 0,
-                "pages_with_tables": 0,
-                "total_tables_extracted": 0,
-                "csv_files": [],
-                "page_results": []
-            }
-        
-        results = {
-            "pdf_name": pdf_name,
-            "output_directory": str(self.output_dir),
-            "total_pages": len(images),
-            "pages_with_tables": 0,
-            "total_tables_extracted": 0,
-            "csv_files": [],
-            "page_results": [],
-            "extracted_titles": []  # Track extracted titles
+        output_dir = self.setup_output_directory(str(pdf_path), output_root)
+        
+        if profile and not config.TRACE_PROFILING:
+            print("Profiling disabled (TRACE_PROFILING), tracing only")
+            profile = False
+        job_trace = JobTrace(pdf_path.stem, profile=profile, sample_interval=0.005 if profile else None) \
+            if (trace or profile) else NULL_TRACE
+        
+        job = ExtractionJob(pdf_path, output_dir, job_trace, on_table, tenant or self.api_key)
+        if config.STREAM_TABLES:
+            job.table_writer = IncrementalTableWriter(output_dir / ".spool", config.STREAM_IDLE_PAGES)
+        return job
+    
+    def plan_job_memory(self, job: ExtractionJob, pages_in_flight: int = None):
+        """
+        Estimate a job's peak memory, lowering its render zoom to fit the per-job limit
+        
+        Args:
+            job (ExtractionJob): Job created by create_job
+            pages_in_flight (int): Pages of the job sent at once, defaults to the
+                page scheduler's per-tenant limit
+            
+        Returns:
+            Tuple of (bytes to reserve from the node budget, 0 = none; failure
+            results when the document cannot be rendered within the limit, else None)
+        """
+        if not config.MEMORY_ADMISSION or not probe_dependencies()["pymupdf"]:
+            return 0, None
+        
+        try:
+            plan = plan_render(str(job.pdf_path), pages_in_flight)
+        except Exception as e:
+            print(f"Memory estimate failed, rendering at {job.zoom}x: {e}")
+            return 0, None
+        if plan["zoom"] is None:
+            print(f"❌ {plan['error']}")
+            return 0, job.failure_results(plan["error"])
+        
+        job.zoom = plan["zoom"]
+        job.results["render_zoom"] = job.zoom
+        job.results["memory_estimate"] = plan["peak_bytes"]
+        if job.zoom < config.RENDER_ZOOM:
+            print(f"🧠 Rendering at {job.zoom}x to stay within memory (~{plan['peak_bytes'] // (1024 ** 2)} MB)")
+        return plan["peak_bytes"], None
+    
+    def run_job(self, job: ExtractionJob) -> Dict:
+        """
+        Admit a job against the node's memory budget, then extract it
+        
+        The job's peak memory is estimated from its page sizes (see
+        admission.py). Documents over the per-job limit are rendered at a lower
+        zoom; the job then waits until its estimate fits the node budget.
+        
+        Args:
+            job (ExtractionJob): Job created by create_job
+        
+        Returns:
+            Dictionary with processing results
+        """
+        reserved, failure = self.plan_job_memory(job)
+        if failure:
+            return failure
+        if reserved and not get_memory_budget().reserve(reserved):
+            return job.failure_results("Server memory is busy, try again later")
+        try:
+            return self.extract_job(job)
+        finally:
+            if reserved:
+                get_memory_budget().release(reserved)
+    
+    async def run_job_async(self, job: ExtractionJob) -> Dict:
+        """
+        Non-blocking variant of run_job: waiting for memory does not hold a thread
+        
+        The estimate counts the pages the loop's page slots let one tenant send
+        at once, not the thread scheduler's limit.
+        """
+        loop = asyncio.get_running_loop()
+        reserved, failure = await loop.run_in_executor(None, self.plan_job_memory, job,
+                                                       config.ASYNC_TENANT_MAX_PAGES_IN_FLIGHT)
+        if failure:
+            return failure
+        if reserved and not await get_memory_budget().reserve_async(reserved):
+            return job.failure_results("Server memory is busy, try again later")
+        try:
+            return await self.extract_job_async(job)
+        finally:
+            if reserved:
+                get_memory_budget().release(reserved)
+    
+    def extract_job(self, job: ExtractionJob) -> Dict:
+        """
+        Extract, group and save all tables of a job's PDF
+        
+        Args:
+            job (ExtractionJob): Job created by create_job
+            
+        Returns:
+            Dictionary with processing results
+        """
+        journal, journaled, page_images = self.prepare_job(job)
+        if not page_images:
+            return job.failure_results("Failed to convert PDF to images")
+        
+        pending = {}
+        try:
+            # Queue every page on the shared scheduler; pages are still grouped in order
+            scheduler = get_scheduler()
+            if scheduler:
+                pending = {page_num: scheduler.submit(job.tenant, len(page_images), self.extract_rendered_page,
+                                                      job, page_image, page_num)
+                           for page_num, page_image in enumerate(page_images, 1) if page_num not in journaled}
+            
+            # Process each page
+            for page_num in range(1, len(page_images) + 1):
+                print(f"\nProcessing page {page_num}/{len(page_images)}...")
+                
+                resumed = page_num in journaled
+                try:
+                    # Extract tables from current page, escalating along the model cascade
+                    if resumed:
+                        extraction_result = journaled.pop(page_num)
+                    elif scheduler:
+                        extraction_result = pending.pop(page_num).result()
+                    else:
+                        extraction_result = self.extract_rendered_page(job, page_images[page_num - 1], page_num)
+                except Exception as e:
+                    extraction_result = e
+                self.complete_page(job, page_num, extraction_result, resumed, journal, page_images)
+            
+            return self.finish_job(job, journal)
+        finally:
+            # Also runs when a page or the save fails, so the journal's lock and the
+            # profiler are not held by a job that is gone
+            self.release_job(job, journal, pending.values())
+    
+    async def extract_job_async(self, job: ExtractionJob) -> Dict:
+        """
+        Non-blocking variant of extract_job
+        
+        All pages are started at once and wait for their render and for a page
+        slot; results are still grouped in page order.
+        """
+        loop = asyncio.get_running_loop()
+        journal, journaled, page_images = await loop.run_in_executor(None, self.prepare_job, job)
+        if not page_images:
+            return job.failure_results("Failed to convert PDF to images")
+        
+        pending = {}
+        try:
+            slots = get_async_page_slots()
+            pending = {page_num: asyncio.ensure_future(self.extract_rendered_page_async(job, page_image, page_num,
+                                                                                        slots))
+                       for page_num, page_image in enumerate(page_images, 1) if page_num not in journaled}
+            for page_num in range(1, len(page_images) + 1):
+                print(f"\nProcessing page {page_num}/{len(page_images)}...")
+                
+                resumed = page_num in journaled
+                try:
+                    extraction_result = journaled.pop(page_num) if resumed else await pending.pop(page_num)
+                except Exception as e:
+                    extraction_result = e
+                # Grouping and saving may write files and re-extract pages
+                await loop.run_in_executor(None, self.complete_page, job, page_num, extraction_result, resumed,
+                                           journal, page_images)
+            
+            return await loop.run_in_executor(None, self.finish_job, job, journal)
+        finally:
+            # The client went away or a page failed: stop the remaining pages, keep the checkpoint
+            self.release_job(job, journal, pending.values())
+    
+    def release_job(self, job: ExtractionJob, journal, pending):
+        """
+        Let go of what an unfinished job holds; a no-op once finish_job has run
+        
+        Args:
+            job (ExtractionJob): Job that stopped
+            journal: The job's PageJournal, or None; it is kept for a later resume
+            pending: Page futures or tasks that have not been consumed yet
+        """
+        for future in pending:
+            future.cancel()
+        if journal:
+            journal.close()
+        job.trace.stop()
+    
+    def checkpoint_scope(self, job: ExtractionJob) -> Dict:
+        """
+        What a job's page results depend on besides the PDF
+        
+        Jobs only resume from a checkpoint journal written with the same scope,
+        so tenants never share page results and changed settings re-extract.
+        """
+        return {
+            "tenant": job.tenant,
+            "models": self.model_cascade,
+            "prompt": hashlib.sha256(self.create_table_extraction_prompt().encode('utf-8')).hexdigest(),
+            "generation": self.generation_config(),
+            "crop_regions": self.crop_regions,
+            "adaptive_tiling": config.ADAPTIVE_TILING,
+            "layout_templates": config.LAYOUT_TEMPLATES
         }
+    
+    def prepare_job(self, job: ExtractionJob):
+        """
+        Open the job's checkpoint journal, start rendering and read the page hints
+        
+        Args:
+            job (ExtractionJob): Job created by create_job
+        
+        Returns:
+            Tuple of (journal or None, journaled page results, page image futures);
+            the futures are empty when the PDF cannot be rendered
+        """
+        pdf_path = str(job.pdf_path)
+        print(f"Processing PDF: {job.pdf_name}")
         
-        # Dictionary to store tables by title for combining
-        tables_by_title = {}
+        job.trace.start()
         
-        # Process each page
-        for page_num, image in enumerate(images, 1):
-            print(f"\nProcessing page {page_num}/{len(images)}...")
+        journal, page_images = None, []
+        try:
+            # Pages finished by an interrupted run of the same PDF are replayed, not re-extracted
+            journal = open_journal(pdf_path, scope=self.checkpoint_scope(job)) if config.CHECKPOINT_PAGES else None
+            journaled = journal.pages if journal else {}
+            if journaled:
+                print(f"♻️ Resuming: {len(journaled)} page(s) restored from checkpoint")
             
-            try:
-                # Extract tables from current page
-                extraction_result = self.extract_tables_from_image(image)
+            # Start rendering; pages come back as futures so extraction can begin early
+            page_images = self.render_pages(pdf_path, job.trace, skip=journaled, zoom=job.zoom)
+            if not page_images:
+                self.release_job(job, journal, [])
+                return None, {}, []
+            
+            results = job.results
+            results["total_pages"] = len(page_images)
+            results["resumed_pages"] = len(journaled)
+            
+            # Locate table regions so only those crops are sent to the model
+            if self.crop_regions:
+                with job.trace.span("detect_regions"):
+                    try:
+                        job.page_regions = detect_regions_for_pdf(pdf_path)
+                    except Exception as e:
+                        print(f"Table region detection failed, sending whole pages: {e}")
+            
+            # Text-layer density per page, used to split dense pages into bands up front
+            if config.ADAPTIVE_TILING:
+                with job.trace.span("estimate_density"):
+                    try:
+                        job.token_profiles = page_token_profiles(pdf_path)
+                    except Exception as e:
+                        print(f"Text density estimation failed, tiling only on truncation: {e}")
+            
+            # Text layer per page, matched against the tenant's learned layout templates
+            store = get_template_store(job.tenant)
+            if store is not None and len(store) and probe_dependencies()["pymupdf"]:
+                with job.trace.span("read_text"):
+                    try:
+                        job.page_texts = page_texts(pdf_path)
+                    except Exception as e:
+                        print(f"Text layer unavailable, not using layout templates: {e}")
+            
+            return journal, journaled, page_images
+        except BaseException:
+            self.release_job(job, journal, page_images)
+            raise
+        
+    def record_page(self, job: ExtractionJob, page_num: int, extraction_result: Dict, resumed: bool = False,
+                    journal=None):
+        """
+        Add a page's extraction to the job's results and table groups
+            
+        Args:
+            job (ExtractionJob): Job owning the page
+            page_num (int): Page number; pages are recorded in order
+            extraction_result (Dict): The page's extraction result
+            resumed (bool): The result was replayed from the checkpoint journal
+            journal: PageJournal new results are recorded in, or None
+        """
+        results = job.results
+        page_result = {
+            "page_number": page_num,
+            "has_tables": extraction_result.get("has_tables", False),
+            "tables_count": len(extraction_result.get("tables", [])),
+            "tables": [],
+            "model": extraction_result.get("model"),
+            "usage": extraction_result.get("usage"),
+            "image_size": extraction_result.get("image_size")
+        }
+        if extraction_result.get("skipped"):
+            page_result["error"] = extraction_result["error"]
+        if extraction_result.get("template"):
+            page_result["template"] = extraction_result["template"]
+        if resumed:
+            page_result["resumed"] = True
+        elif journal:
+            journal.record(page_num, extraction_result)
                 
-                page_result = {
-                    "page_number": page_num,
-                    "has_tables": extraction_result.get("has_tables", False),
-                    "tables_count": len(extraction_result.get("tables", [])),
-                    "tables": []
-                }
+        if extraction_result.get("has_tables", False):
+            results["pages_with_tables"] += 1
+            tables = extraction_result.get("tables", [])
                 
-                if extraction_result.get("has_tables", False):
-                    results["pages_with_tables"] += 1
-                    tables = extraction_result.get("tables", [])
+            for table_data in tables:
+                # Track extracted titles
+                if table_data.get('title'):
+                    results["extracted_titles"].append(table_data.get('title'))
                     
-                    for table_num, table_data in enumerate(tables, 1):
-                        title = table_data.get('title', 'Untitled Table')
-                        print(f"  Found table: {title}")
-                        
-                        # Track extracted titles
-                        if table_data.get('title'):
-                            results["extracted_titles"].append(table_data.get('title'))
-                        
-                        # Enhanced title normalization for better continuation detection
-                        normalized_title = self.normalize_title_for_grouping(title, page_num)
-                        
-                        # Group tables by normalized title
-                        if normalized_title not in tables_by_title:
-                            tables_by_title[normalized_title] = {
-                                "title": title,
-                                "headers": table_data.get('headers', []),
-                                "data": table_data.get('data', []),
-                                "pages": [page_num],
-                                "table_numbers": [table_num],
-                                "original_titles": [title]
-                            }
-                            print(f"    Created new table group: {normalized_title}")
-                        else:
-                            # Combine data from continuation pages
-                            existing_table = tables_by_title[normalized_title]
-                            
-                            # Check if headers are similar (for continuation detection)
-                            if self.are_headers_compatible(existing_table["headers"], table_data.get('headers', [])):
-                                existing_table["data"].extend(table_data.get('data', []))
-                                existing_table["pages"].append(page_num)
-                                existing_table["table_numbers"].append(table_num)
-                                existing_table["original_titles"].append(title)
-                                print(f"    Added continuation data to existing table: {normalized_title}")
-                                print(f"    Combined data from pages: {existing_table['pages']}")
-                            else:
-                                # Different table structure, create new entry
-                                alt_normalized_title = f"{normalized_title}_v{len([k for k in tables_by_title.keys() if k.startswith(normalized_title)])+1}"
-                                tables_by_title[alt_normalized_title] = {
-                                    "title": title,
-                                    "headers": table_data.get('headers', []),
-                                    "data": table_data.get('data', []),
-                                    "pages": [page_num],
-                                    "table_numbers": [table_num],
-                                    "original_titles": [title]
-                                }
-                                print(f"    Created variant table group: {alt_normalized_title}")
-                        
-                        page_result["tables"].append({
-                            "title": table_data.get("title"),
-                            "table_number": table_data.get("table_number"),
-                            "normalized_title": normalized_title,
-                            "rows": len(table_data.get("data", [])),
-                            "columns": len(table_data.get("headers", []))
-                        })
-                else:
-                    print(f"  No tables found on page {page_num}")
+            with job.trace.span("group", page=page_num):
+                page_result["tables"] = self.group_page_tables(job.tables_by_title, tables, page_num,
+                                                               job.group_keys)
+        else:
+            print(f"  No tables found on page {page_num}")
+                    
+        results["page_results"].append(page_result)
                 
-                results["page_results"].append(page_result)
+    def complete_page(self, job: ExtractionJob, page_num: int, extraction_result, resumed: bool, journal,
+                      page_images: List):
+        """
+        Record a page's result in page order, then release its image and spool its tables
+        
+        Args:
+            job (ExtractionJob): Job owning the page
+            page_num (int): Page number
+            extraction_result: Page extraction result, or the exception extracting it raised
+            resumed (bool): The result was read back from the job's checkpoint
+            journal: Checkpoint journal of the job, or None
+            page_images (List): The job's page image futures
+        """
+        try:
+            if isinstance(extraction_result, Exception):
+                raise extraction_result
+            self.record_page(job, page_num, extraction_result, resumed, journal)
+        except Exception as e:
+            self.record_page_error(job, page_num, e)
+        
+        # The page image is no longer needed
+        page_images[page_num - 1] = None
+        self.spool_tables(job, page_num)
                 
-            except Exception as e:
-                print(f"  Error processing page {page_num}: {e}")
-                page_result = {
-                    "page_number": page_num,
-                    "has_tables": False,
-                    "tables_count": 0,
-                    "tables": [],
-                    "error": str(e)
-                }
-                results["page_results"].append(page_result)
+    def record_page_error(self, job: ExtractionJob, page_num: int, error: Exception):
+        """Add a page that could not be extracted to the job's results"""
+        print(f"  Error processing page {page_num}: {error}")
+        job.results["page_results"].append({
+            "page_number": page_num,
+            "has_tables": False,
+            "tables_count": 0,
+            "tables": [],
+            "error": str(error)
+        })
+                
+    def spool_tables(self, job: ExtractionJob, page_num: int):
+        """Spool the rows grouped so far and write the tables that can no longer continue"""
+        if job.table_writer:
+            job.table_writer.append(job.tables_by_title)
+            for normalized_title in job.table_writer.idle_groups(job.tables_by_title, page_num):
+                self.finalize_table_group(job, normalized_title)
+            
+    def finish_job(self, job: ExtractionJob, journal=None) -> Dict:
+        """
+        Save the remaining table groups and close the job
+            
+        Args:
+            job (ExtractionJob): Job whose pages have all been recorded
+            journal: The job's PageJournal, deleted once the tables are saved
+        
+        Returns:
+            Dictionary with processing results
+        """
+        results = job.results
         
-        # Now save the combined tables
+        # Now save the remaining combined tables
         print(f"\nCombining and saving tables...")
-        for normalized_title, combined_table in tables_by_title.items():
-            print(f"\nSaving combined table: {normalized_title}")
-            print(f"  Pages: {combined_table['pages']}")
-            print(f"  Total rows: {len(combined_table['data'])}")
-            print(f"  Original titles: {combined_table['original_titles']}")
+        for normalized_title in list(job.tables_by_title):
+            self.finalize_table_group(job, normalized_title)
+        if job.table_writer:
+            job.table_writer.close()
+        if journal:
+            journal.complete()
+        
+        for model_name, stats in results["model_stats"].items():
+            print(f"  {model_name}: {stats['pages']} page(s), {stats.get('avg_latency', 0)}s/page, "
+                  f"escalated {stats['escalated']}")
+        print(f"  Tokens: {results['usage']['input_tokens']} in / {results['usage']['output_tokens']} out "
+              f"over {results['usage']['calls']} call(s)")
+        template_pages = sum(1 for page in results["page_results"] if page.get("template"))
+        if template_pages:
+            print(f"  Layout templates used on {template_pages} page(s)")
+        
+        job.trace.stop()
+        if job.trace.enabled:
+            results["trace_files"] = job.trace.write(job.output_dir, job.pdf_name)
+            print(f"🧭 Trace written: {results['trace_files']['trace']}")
+        
+        return results
+    
+    def finalize_table_group(self, job: ExtractionJob, normalized_title: str) -> Optional[str]:
+        """
+        Save a table group's combined CSV and remove it from the open groups
+        
+        Args:
+            job (ExtractionJob): Job owning the group
+            normalized_title (str): Group key in job.tables_by_title
             
-            # Save the combined table
-            csv_path = self.save_combined_table_to_csv(combined_table, pdf_name)
+        Returns:
+            Path to the saved CSV file, or None
+        """
+        group = job.tables_by_title.pop(normalized_title)
+        combined_table = job.table_writer.load(normalized_title, group) if job.table_writer else group
+        
+        print(f"\nSaving combined table: {normalized_title}")
+        print(f"  Pages: {combined_table['pages']}")
+        print(f"  Total rows: {len(combined_table['data'])}")
+        print(f"  Original titles: {combined_table['original_titles']}")
+        
+        # Check the table's totals, re-extracting the pages of failing rows
+        if config.VALIDATE_TOTALS:
+            combined_table = self.validate_table_group(job, normalized_title, combined_table)
+        
+        # A validated single-page table teaches its issuer's layout
+        validation = combined_table.get("validation") or {}
+        store = get_template_store(job.tenant)
+        if store is not None and validation.get("valid") and validation.get("checked") \
+                and len(set(combined_table["pages"])) == 1:
+            try:
+                page_num = combined_table["pages"][0]
+                content = job.text_for_page(page_num) or \
+                    (page_text(str(job.pdf_path), page_num) if probe_dependencies()["pymupdf"] else "")
+                store.learn(combined_table, content)
+            except Exception as e:
+                print(f"  Layout template not learned: {e}")
+        
+        # Save the combined table
+        with job.trace.span("save", table=normalized_title):
+            csv_path = self.save_combined_table_to_csv(combined_table, job.pdf_name, job.output_dir)
+        
+        if job.table_writer:
+            job.table_writer.discard(normalized_title)
+        
+        if csv_path:
+            job.results["csv_files"].append(csv_path)
+            job.results["total_tables_extracted"] += 1
+            job.results["table_pages"][csv_path] = {"pages": combined_table["pages"],
+                                                    "page_rows": combined_table.get("page_rows")}
+            if combined_table.get("validation"):
+                job.results["validation"].append(dict(combined_table["validation"], csv_file=csv_path))
+            if job.on_table:
+                job.on_table(combined_table, csv_path)
+        
+        return csv_path
+    
+    def validate_table_group(self, job: ExtractionJob, normalized_title: str, combined_table: Dict) -> Dict:
+        """
+        Check a combined table's subtotal identities and retry the pages holding failing rows
+        
+        Only the pages whose rows fail are re-extracted, rendered at
+        config.REEXTRACT_ZOOM and sent to config.REEXTRACT_MODEL. The retried
+        rows are kept if they fail fewer checks.
+        
+        Args:
+            job (ExtractionJob): Job owning the group
+            normalized_title (str): Group key
+            combined_table (Dict): Group with all of its rows loaded
             
-            if csv_path:
-                results["csv_files"].append(csv_path)
-                results["total_tables_extracted"] += 1
+        Returns:
+            Dict: The combined table to save, with a "validation" report
+        """
+        try:
+            with job.trace.span("validate", table=normalized_title):
+                report = validate_table(combined_table)
+        except Exception as e:
+            print(f"  Total checks skipped: {e}")
+            return combined_table
         
-        return results
+        if not report["valid"]:
+            print(f"  ⚠️ {len(report['failures'])} total(s) do not add up: "
+                  f"{', '.join(sorted({f['formula'] for f in report['failures']}))}")
+            if config.REEXTRACT_FAILED_TABLES and probe_dependencies()["pymupdf"] and not job.budget_action():
+                with job.trace.span("reextract", table=normalized_title):
+                    retried = self.reextract_failing_pages(job, normalized_title, combined_table, report)
+                if retried is not None:
+                    retried_report = validate_table(retried)
+                    if len(retried_report["failures"]) < len(report["failures"]):
+                        print(f"  ✓ Re-extraction fixed {len(report['failures']) - len(retried_report['failures'])} total(s)")
+                        combined_table, report = retried, retried_report
+                    report["reextracted_pages"] = retried["reextracted_pages"]
+        
+        combined_table = dict(combined_table)
+        combined_table["validation"] = dict(report, title=combined_table.get("title"))
+        return combined_table
+    
+    def reextract_failing_pages(self, job: ExtractionJob, normalized_title: str, combined_table: Dict,
+                                report: Dict) -> Optional[Dict]:
+        """
+        Re-extract the pages holding a table's failing rows
+        
+        Args:
+            job (ExtractionJob): Job owning the group
+            normalized_title (str): Group key
+            combined_table (Dict): Group with all of its rows loaded
+            report (Dict): validate_table report of the group
+            
+        Returns:
+            Dict: Copy of the table with the retried pages' rows replaced, or None
+        """
+        pages = combined_table["pages"]
+        page_rows = combined_table.get("page_rows") or []
+        if len(page_rows) != len(pages) or len(set(pages)) != len(pages):
+            return None
+        
+        # Row range of every page in the combined data
+        offsets = [sum(page_rows[:i]) for i in range(len(pages) + 1)]
+        failing_rows = {failure["row"] for failure in report["failures"]}
+        retry = [i for i in range(len(pages)) if any(offsets[i] <= row < offsets[i + 1] for row in failing_rows)]
+        
+        data = list(combined_table["data"])
+        new_page_rows = list(page_rows)
+        retried_pages = []
+        # Replace from the last page so earlier offsets stay valid
+        for i in reversed(retry):
+            page_num = pages[i]
+            print(f"  Re-extracting page {page_num} of {normalized_title}")
+            image = self.render_page(str(job.pdf_path), page_num, config.REEXTRACT_ZOOM)
+            model_name = config.REEXTRACT_MODEL or self.model_cascade[-1]
+            result = self.extract_page(image, page_num, job.regions_for_page(page_num), job.trace,
+                                       job.token_profile_for_page(page_num), model_name=model_name)
+            job.record_usage(model_name, result["usage"])
+            table = self.match_group_table(normalized_title, combined_table, result.get("tables", []), page_num)
+            if table is None or not table.get("data"):
+                continue
+            data[offsets[i]:offsets[i + 1]] = table["data"]
+            new_page_rows[i] = len(table["data"])
+            retried_pages.append(page_num)
+        
+        if not retried_pages:
+            return None
+        retried = dict(combined_table, data=data, page_rows=new_page_rows)
+        retried["reextracted_pages"] = sorted(retried_pages)
+        return retried
+    
+    def match_group_table(self, normalized_title: str, group: Dict, tables: List[Dict],
+                          page_num: int) -> Optional[Dict]:
+        """
+        Find the table continuing a group among a re-extracted page's tables
+        
+        Args:
+            normalized_title (str): Group key (variant groups end in "_vN")
+            group (Dict): The table group
+            tables (List[Dict]): Tables extracted from the page
+            page_num (int): Page number
+            
+        Returns:
+            Dict: Matching table, or None
+        """
+        base_title = re.sub(r'_v\d+$', '', normalized_title)
+        compatible = [table for table in tables
+                      if self.are_headers_compatible(group["headers"], table.get("headers", []))]
+        for table in compatible:
+            if self.normalize_title_for_grouping(table.get("title", ''), page_num) == base_title:
+                return table
+        if len(tables) == 1 and compatible:
+            return tables[0]
+        return max(compatible, key=lambda table: len(table.get("data", [])), default=None)
+    
+    def group_page_tables(self, tables_by_title: Dict, tables: List[Dict], page_num: int,
+                          group_keys: set = None) -> List[Dict]:
+        """
+        Merge one page's tables into the running title groups
+        
+        Args:
+            tables_by_title (Dict): Table groups keyed by normalized title (updated in place)
+            tables (List[Dict]): Tables extracted from the page
+            page_num (int): Page number
+            group_keys (set): Keys of the job's groups so far, including finalized
+                ones (updated in place); variant keys avoid all of them
+            
+        Returns:
+            List[Dict]: Per-table summaries for the page result
+        """
+        page_tables = []
+        if group_keys is None:
+            group_keys = set(tables_by_title)
+        
+        for table_num, table_data in enumerate(tables, 1):
+            title = table_data.get('title', 'Untitled Table')
+            print(f"  Found table: {title}")
+            
+            # Enhanced title normalization for better continuation detection
+            normalized_title = self.normalize_title_for_grouping(title, page_num)
+            
+            # Group tables by normalized title
+            if normalized_title not in tables_by_title:
+                tables_by_title[normalized_title] = {
+                    "title": title,
+                    "headers": table_data.get('headers', []),
+                    "data": table_data.get('data', []),
+                    "pages": [page_num],
+                    "page_rows": [len(table_data.get('data', []))],
+                    "table_numbers": [table_num],
+                    "original_titles": [title]
+                }
+                group_keys.add(normalized_title)
+                print(f"    Created new table group: {normalized_title}")
+            else:
+                # Combine data from continuation pages
+                existing_table = tables_by_title[normalized_title]
+                
+                # Check if headers are similar (for continuation detection)
+                if self.are_headers_compatible(existing_table["headers"], table_data.get('headers', [])):
+                    existing_table["data"].extend(table_data.get('data', []))
+                    existing_table["pages"].append(page_num)
+                    existing_table["page_rows"].append(len(table_data.get('data', [])))
+                    existing_table["table_numbers"].append(table_num)
+                    existing_table["original_titles"].append(title)
+                    print(f"    Added continuation data to existing table: {normalized_title}")
+                    print(f"    Combined data from pages: {existing_table['pages']}")
+                else:
+                    # Different table structure, create new entry
+                    # Finalized variants leave tables_by_title, so count up past every key used
+                    variant = 2
+                    while f"{normalized_title}_v{variant}" in tables_by_title or \
+                            f"{normalized_title}_v{variant}" in group_keys:
+                        variant += 1
+                    alt_normalized_title = f"{normalized_title}_v{variant}"
+                    group_keys.add(alt_normalized_title)
+                    tables_by_title[alt_normalized_title] = {
+                        "title": title,
+                        "headers": table_data.get('headers', []),
+                        "data": table_data.get('data', []),
+                        "pages": [page_num],
+                        "page_rows": [len(table_data.get('data', []))],
+                        "table_numbers": [table_num],
+                        "original_titles": [title]
+                    }
+                    print(f"    Created variant table group: {alt_normalized_title}")
+            
+            page_tables.append({
+                "title": table_data.get("title"),
+                "table_number": table_data.get("table_number"),
+                "normalized_title": normalized_title,
+                "rows": len(table_data.get("data", [])),
+                "columns": len(table_data.get("headers", []))
+            })
+        
+        return page_tables
     
     def normalize_title_for_grouping(self, title: str, page_num: int) -> str:
         """
@@ -981,18 +2152,21 @@ class PDFTableExtractor:
         
         return False
     
-    def save_combined_table_to_csv(self, combined_table: Dict, pdf_name: str) -> str:
+    def save_combined_table_to_csv(self, combined_table: Dict, pdf_name: str, output_dir: Path) -> str:
         """
         Save combined table data to CSV file
         
         Args:
             combined_table (Dict): Combined table data dictionary
             pdf_name (str): Original PDF filename
+            output_dir (Path): Job output directory
             
         Returns:
             Path to saved CSV file
         """
         try:
+            import pandas as pd
+            
             # Create filename based on the actual extracted title
             title = combined_table.get('title', '')
             if title:
@@ -1007,7 +2181,15 @@ class PDFTableExtractor:
                 # Fallback filename
                 filename = f"{pdf_name}_Combined_Table.csv"
             
-            filepath = self.output_dir / filename
+            # Tables sharing a title (variants, or a title that reappears after its
+            # group was closed) get a numeric suffix instead of overwriting
+            compression = output_compression()
+            filepath = artifact_path(Path(output_dir) / filename, compression)
+            suffix = 1
+            while filepath.exists():
+                suffix += 1
+                filepath = artifact_path(Path(output_dir) / f"{Path(filename).stem}_{suffix}.csv", compression)
+
             
             # Get headers and data
             headers = combined_table.get('headers', [])
@@ -1086,8 +2268,8 @@ class PDFTableExtractor:
                 print(f"No valid data found in combined table: {title}")
                 return None
             
-            # Save to CSV with title at the top
-            with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
+            # Save to CSV with title at the top (compressed if configured)
+            with open_artifact(filepath, 'w') as csvfile:
                 # Add title as first row if available
                 title = combined_table.get('title')
                 if title:
@@ -1125,7 +2307,7 @@ class PDFTableExtractor:
         Returns:
             Path to summary report file
         """
-        report_path = self.output_dir / f"{results['pdf_name']}_extraction_summary.txt"
+        report_path = Path(results['output_directory']) / f"{results['pdf_name']}_extraction_summary.txt"
         
         with open(report_path, 'w', encoding='utf-8') as f:
             f.write(f"PDF Table Extraction Summary\n")
@@ -1134,7 +2316,11 @@ class PDFTableExtractor:
             f.write(f"Output Directory: {results['output_directory']}\n")
             f.write(f"Total Pages: {results['total_pages']}\n")
             f.write(f"Pages with Tables: {results['pages_with_tables']}\n")
-            f.write(f"Total Tables Extracted: {results['total_tables_extracted']}\n\n")
+            f.write(f"Total Tables Extracted: {results['total_tables_extracted']}\n")
+            if results.get('usage'):
+                f.write(f"Tokens Used: {results['usage']['input_tokens']} input / "
+                        f"{results['usage']['output_tokens']} output ({results['usage']['calls']} model calls)\n")
+            f.write("\n")
             
             # Show extracted titles
             if results.get('extracted_titles'):
@@ -1144,6 +2330,37 @@ class PDFTableExtractor:
                     f.write(f"{i}. {title}\n")
                 f.write("\n")
             
+            if results.get('model_stats'):
+                f.write("Model Cascade:\n")
+                f.write("-" * 30 + "\n")
+                for model_name, stats in results['model_stats'].items():
+                    usage = stats.get('usage', {})
+                    f.write(f"• {model_name}: {stats['pages']} page(s), {stats.get('avg_latency', 0)}s/page, "
+                            f"escalation rate {stats.get('escalation_rate', 0):.0%}, "
+                            f"{usage.get('input_tokens', 0)} input / {usage.get('output_tokens', 0)} output tokens\n")
+                f.write("\n")
+            
+            if results.get('budget_exceeded'):
+                f.write(f"Token budget exceeded ({results['budget_exceeded']}), remaining pages: {config.BUDGET_ACTION}\n\n")
+            
+            failing = [report for report in results.get('validation', []) if not report['valid']]
+            if failing:
+                f.write("Tables Failing Total Checks:\n")
+                f.write("-" * 30 + "\n")
+                for report in failing:
+                    f.write(f"• {report['title']}: {len(report['failures'])} of {report['checked']} checks failed\n")
+                    for failure in report['failures']:
+                        f.write(f"  - row {failure['row'] + 1}, {failure['header']}: ({failure['formula']}) "
+                                f"expected {failure['expected']}, found {failure['actual']}\n")
+                f.write("\n")
+            
+            if results.get('trace_files'):
+                f.write("Trace Files:\n")
+                f.write("-" * 30 + "\n")
+                for kind, path in results['trace_files'].items():
+                    f.write(f"• {kind}: {path}\n")
+                f.write("\n")
+            
             f.write("Extracted CSV Files:\n")
             f.write("-" * 30 + "\n")
             for csv_file in results['csv_files']:
@@ -0,0 +1,174 @@
+"""
+Multiprocess page rendering with shared-memory image handoff.
+
+Rendering pages at 3x zoom is CPU-bound and, done in the request thread, holds
+the GIL while model calls wait. RenderPool renders pages in worker processes
+instead, so render throughput scales with the number of cores:
+
+* each worker opens the PDF itself (keeping a few documents open, keyed by
+  path, modification time and size so a replaced file is reopened) and
+  renders one page per task
+* the raw RGB pixmap is copied into a SharedMemory block and only its name and
+  geometry travel back through the pool, no pickled PNG
+* the parent turns the block into a PIL image and unlinks it as soon as the
+  task completes, whether or not anybody is waiting for the page yet
+
+Pages are returned as futures in page order, so extraction of page 1 starts
+while later pages are still rendering.
+
+Workers are started by a fork server (spawn where there is none), never forked
+from the serving process: its janitor, scheduler and hedging threads may hold
+locks at the moment of a fork, which then stay locked forever in the child.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from typing import Iterable, List, Optional
+
+import config
+
+# Modules imported once by the fork server instead of by every worker
+WORKER_PRELOAD = ["fitz", "render_pool", "local_extraction"]
+
+# Worker-local cache of open documents: path -> (identity, document), most recently used last
+_documents = {}
+_MAX_OPEN_DOCUMENTS = 4
+
+
+def worker_context():
+    """Multiprocessing context for worker pools: forkserver where available, else spawn"""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(WORKER_PRELOAD)
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def _open_document(pdf_path: str):
+    """Open a PDF in a worker, reusing it for the document's other pages"""
+    import fitz  # PyMuPDF
+
+    # Paths are reused (watch folders, bulk paths): a changed file is a new document
+    stat = os.stat(pdf_path)
+    identity = (stat.st_mtime_ns, stat.st_size)
+    cached = _documents.pop(pdf_path, None)
+    if cached is not None and cached[0] != identity:
+        cached[1].close()
+        cached = None
+    if cached is None:
+        cached = (identity, fitz.open(pdf_path))
+        while len(_documents) >= _MAX_OPEN_DOCUMENTS:
+            _documents.pop(next(iter(_documents)))[1].close()
+    _documents[pdf_path] = cached
+    return cached[1]
+
+
+def _render_to_shared_memory(pdf_path: str, page_index: int, zoom: float):
+    """
+    Render one page into a new shared memory block (runs in a worker process)
+
+    Returns:
+        Tuple of (block name, width, height, byte size)
+    """
+    import fitz  # PyMuPDF
+
+    page = _open_document(pdf_path).load_page(page_index)
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    samples = getattr(pix, "samples_mv", None) or pix.samples
+    size = len(samples)
+
+    block = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        block.buf[:size] = samples
+    finally:
+        block.close()
+    return block.name, pix.width, pix.height, size
+
+
+def _image_from_shared_memory(name: str, width: int, height: int, size: int):
+    """Copy a rendered page out of shared memory into a PIL image and free the block"""
+    from PIL import Image
+
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        return Image.frombytes("RGB", (width, height), bytes(block.buf[:size]))
+    finally:
+        block.close()
+        block.unlink()
+
+
+class RenderPool:
+    """Process pool rendering PDF pages to PIL images"""
+
+    def __init__(self, processes: int = None):
+        """
+        Args:
+            processes (int): Worker processes, defaults to config.RENDER_PROCESSES
+                or the number of cores
+        """
+        self.processes = processes or config.RENDER_PROCESSES or os.cpu_count() or 1
+        # Workers must share the parent's resource tracker: blocks are created in
+        # a worker and unlinked by the parent
+        resource_tracker.ensure_running()
+        self._executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=worker_context())
+
+    def render_document(self, pdf_path: str, page_count: int, zoom: float = 3.0,
+                        skip: Iterable[int] = ()) -> List[Future]:
+        """
+        Queue every page of a document for rendering
+
+        Args:
+            pdf_path (str): Path to the PDF file
+            page_count (int): Number of pages
+            zoom (float): Scale factor, 3.0 = 216 DPI
+            skip: Page numbers (1-based) not to render, e.g. already checkpointed
+
+        Returns:
+            List[Future]: One future per page, resolving to a PIL Image (None for skipped pages)
+        """
+        pdf_path = os.path.abspath(pdf_path)
+        skip = set(skip)
+        pages = []
+        for page_index in range(page_count):
+            if page_index + 1 in skip:
+                page = Future()
+                page.set_result(None)
+                pages.append(page)
+            else:
+                pages.append(self._submit(pdf_path, page_index, zoom))
+        return pages
+
+    def _submit(self, pdf_path: str, page_index: int, zoom: float) -> Future:
+        page = Future()
+        task = self._executor.submit(_render_to_shared_memory, pdf_path, page_index, zoom)
+
+        def handoff(task):
+            # Runs as soon as the worker finishes, so the block never outlives the task
+            try:
+                page.set_result(_image_from_shared_memory(*task.result()))
+            except BaseException as e:
+                page.set_exception(e)
+
+        task.add_done_callback(handoff)
+        return page
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_render_pool() -> Optional[RenderPool]:
+    """Process-wide render pool, None when config.RENDER_POOL is off"""
+    global _pool
+    if not config.RENDER_POOL:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = RenderPool()
+        return _pool
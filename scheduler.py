@@ -0,0 +1,196 @@
+"""
+Page-level fair scheduler shared by all extraction jobs of the process.
+
+Without it every upload extracts its pages in its own request thread, so one
+500-page document keeps the model busy while one-page uploads wait behind it.
+Jobs instead submit each page as a task and the scheduler's workers pick tasks:
+
+* round-robin across tenants (API keys), so every active tenant gets a turn
+* from a fast lane first for documents of at most SMALL_DOC_PAGES pages; the
+  normal lane still gets every FAST_LANE_BURST + 1-th turn, so large
+  documents keep moving under a steady stream of small ones
+* never more than TENANT_MAX_PAGES_IN_FLIGHT pages of one tenant at a time
+
+Tasks return concurrent.futures.Future objects, so a job can consume its
+pages in order while later pages are already being extracted.
+
+The async serving path (PDFTableExtractor.process_pdf_async) needs no worker
+threads: its pages are coroutines waiting on the network. AsyncPageSlots only
+bounds how many of them are in flight on the event loop, in total and per
+tenant.
+"""
+import asyncio
+import contextlib
+import threading
+import weakref
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+
+import config
+
+FAST = "fast"
+NORMAL = "normal"
+
+
+class PageScheduler:
+    """Runs page tasks on a fixed set of workers, fairly across tenants"""
+
+    def __init__(self, workers: int = None, tenant_limit: int = None, small_doc_pages: int = None,
+                 fast_lane_burst: int = None):
+        """
+        Args:
+            workers (int): Pages extracted concurrently in total
+            tenant_limit (int): Pages of one tenant extracted concurrently
+            small_doc_pages (int): Documents up to this size use the fast lane
+            fast_lane_burst (int): Fast lane turns before the normal lane gets one
+        """
+        self.workers = workers or config.SCHEDULER_WORKERS
+        self.tenant_limit = tenant_limit or config.TENANT_MAX_PAGES_IN_FLIGHT
+        self.small_doc_pages = config.SMALL_DOC_PAGES if small_doc_pages is None else small_doc_pages
+        self.fast_lane_burst = config.FAST_LANE_BURST if fast_lane_burst is None else fast_lane_burst
+
+        # lane -> tenant -> deque of (future, fn, args, kwargs); tenant order is the round-robin order
+        self._queues = {FAST: OrderedDict(), NORMAL: OrderedDict()}
+        self._running = {}  # tenant -> pages in flight
+        self._fast_streak = 0
+        self._condition = threading.Condition()
+        self._threads = []
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"page-scheduler-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def lane_for(self, document_pages: int) -> str:
+        """Lane used by a document of the given size"""
+        return FAST if document_pages <= self.small_doc_pages else NORMAL
+
+    def submit(self, tenant: str, document_pages: int, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Queue one page task
+
+        Args:
+            tenant (str): Tenant the work is accounted to (the API key)
+            document_pages (int): Page count of the task's document, selects the lane
+            fn: Callable run by a worker with *args and **kwargs
+
+        Returns:
+            Future: Resolves to fn's return value or exception
+        """
+        future = Future()
+        with self._condition:
+            tenants = self._queues[self.lane_for(document_pages)]
+            tenants.setdefault(tenant, deque()).append((future, fn, args, kwargs))
+            self._condition.notify()
+        return future
+
+    def _take(self, lane: str):
+        """Next task of a lane from the first tenant under its limit (caller holds the lock)"""
+        tenants = self._queues[lane]
+        for tenant in list(tenants):
+            if self._running.get(tenant, 0) >= self.tenant_limit:
+                continue
+            tasks = tenants.pop(tenant)
+            task = tasks.popleft()
+            if tasks:
+                tenants[tenant] = tasks  # re-inserted last: round-robin
+            return tenant, task
+        return None
+
+    def _next_task(self):
+        """Pick a task honouring lane priority and tenant limits (caller holds the lock)"""
+        lanes = [FAST, NORMAL] if self._fast_streak < self.fast_lane_burst else [NORMAL, FAST]
+        for lane in lanes:
+            picked = self._take(lane)
+            if picked:
+                self._fast_streak = self._fast_streak + 1 if lane == FAST else 0
+                return picked
+        return None
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                picked = self._next_task()
+                while picked is None:
+                    self._condition.wait()
+                    picked = self._next_task()
+                tenant, (future, fn, args, kwargs) = picked
+                self._running[tenant] = self._running.get(tenant, 0) + 1
+
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fn(*args, **kwargs))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                with self._condition:
+                    self._running[tenant] -= 1
+                    if not self._running[tenant]:
+                        del self._running[tenant]
+                    # A tenant slot was freed: its queued pages may run now
+                    self._condition.notify_all()
+
+    def snapshot(self) -> Dict:
+        """Queued and running pages, for monitoring"""
+        with self._condition:
+            return {
+                "queued": {lane: sum(len(tasks) for tasks in tenants.values())
+                           for lane, tenants in self._queues.items()},
+                "tenants_running": len(self._running),
+                "pages_running": sum(self._running.values())
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> Optional[PageScheduler]:
+    """Process-wide scheduler, None when config.PAGE_SCHEDULER is off"""
+    global _scheduler
+    if not config.PAGE_SCHEDULER:
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = PageScheduler()
+        return _scheduler
+
+
+class AsyncPageSlots:
+    """Limits the pages extracted concurrently on one event loop"""
+
+    def __init__(self, limit: int = None, tenant_limit: int = None):
+        """
+        Args:
+            limit (int): Pages in flight in total
+            tenant_limit (int): Pages of one tenant in flight
+        """
+        self.limit = limit or config.ASYNC_MAX_PAGES_IN_FLIGHT
+        self.tenant_limit = tenant_limit or config.ASYNC_TENANT_MAX_PAGES_IN_FLIGHT
+        self._slots = asyncio.Semaphore(self.limit)
+        self._tenants = {}  # tenant -> Semaphore
+        self.in_flight = 0
+
+    @contextlib.asynccontextmanager
+    async def slot(self, tenant: str):
+        """Hold one page slot of a tenant (waiters are served in arrival order)"""
+        tenant_slots = self._tenants.setdefault(tenant, asyncio.Semaphore(self.tenant_limit))
+        async with tenant_slots, self._slots:
+            self.in_flight += 1
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+
+
+# Semaphores belong to one event loop
+_async_slots = weakref.WeakKeyDictionary()
+
+
+def get_async_page_slots() -> AsyncPageSlots:
+    """Page slots of the running event loop"""
+    loop = asyncio.get_running_loop()
+    if loop not in _async_slots:
+        _async_slots[loop] = AsyncPageSlots()
+    return _async_slots[loop]
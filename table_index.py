@@ -0,0 +1,342 @@
+"""
+Cross-filing index of extracted line items.
+
+Every extraction leaves its tables as CSV files named after their titles, which
+makes questions like "Revenue from operations for one company over the last 12
+quarters" a scan over hundreds of files. TableIndex ingests each extraction's
+tables into SQLite once, one row ("fact") per line item and period column:
+
+* company      -- given at upload, else found in a table title ("... LIMITED"),
+                  else the PDF name
+* statement    -- results, segment, balance_sheet or cash_flow, from the title
+* scope        -- consolidated or standalone, from the title
+* period       -- type (quarter, half_year, nine_months, year) and end date,
+                  parsed from the column header
+* line item    -- the "Particulars" column, searchable through an FTS5 table
+
+The index outlives the artifact janitor: facts stay queryable after the CSVs
+they came from are evicted.
+"""
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import config
+from amounts import parse_amount
+from artifacts import logical_name, read_table_csv
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS extractions (
+    id TEXT PRIMARY KEY,
+    pdf_name TEXT,
+    company TEXT,
+    indexed_at REAL
+);
+CREATE TABLE IF NOT EXISTS tables (
+    id INTEGER PRIMARY KEY,
+    extraction_id TEXT NOT NULL,
+    title TEXT,
+    statement_type TEXT,
+    scope TEXT,
+    pages TEXT,
+    csv_file TEXT
+);
+CREATE TABLE IF NOT EXISTS facts (
+    id INTEGER PRIMARY KEY,
+    table_id INTEGER NOT NULL,
+    extraction_id TEXT NOT NULL,
+    company TEXT,
+    statement_type TEXT,
+    scope TEXT,
+    line_item TEXT,
+    period_type TEXT,
+    period_end TEXT,
+    column_header TEXT,
+    value_text TEXT,
+    value REAL
+);
+CREATE INDEX IF NOT EXISTS facts_company_period ON facts (company, period_end);
+CREATE INDEX IF NOT EXISTS facts_extraction ON facts (extraction_id);
+CREATE INDEX IF NOT EXISTS tables_extraction ON tables (extraction_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS facts_fts USING fts5 (line_item);
+"""
+
+MONTHS = {
+    name: number for number, names in enumerate([
+        ("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"),
+        ("may",), ("jun", "june"), ("jul", "july"), ("aug", "august"),
+        ("sep", "sept", "september"), ("oct", "october"), ("nov", "november"), ("dec", "december"),
+    ], start=1) for name in names
+}
+
+_COMPANY = re.compile(
+    r"((?:[A-Z][\w&.'-]*\s+){1,6}(?:LIMITED|Limited|LTD\.?|Ltd\.?|INC\.?|Inc\.?|CORPORATION|Corporation))"
+)
+_DATE_WORDS = re.compile(r"(\d{1,2})(?:st|nd|rd|th)?[\s-]+([A-Za-z]{3,9})[\s,.-]+(\d{4})")
+_DATE_MONTH_FIRST = re.compile(r"([A-Za-z]{3,9})\.?\s+(\d{1,2})(?:st|nd|rd|th)?,?\s+(\d{4})")
+_DATE_NUMERIC = re.compile(r"(\d{1,2})[./-](\d{1,2})[./-](\d{2,4})")
+
+PERIOD_TYPES = [
+    ("nine_months", re.compile(r"nine\s+months|9\s*months", re.I)),
+    ("half_year", re.compile(r"half[\s-]+year|six\s+months|6\s*months", re.I)),
+    ("quarter", re.compile(r"quarter|three\s+months|3\s*months", re.I)),
+    ("year", re.compile(r"year", re.I)),
+]
+
+
+def detect_company(title: Optional[str]) -> Optional[str]:
+    """Company name ending in Limited/Ltd/Inc/Corporation found in a title"""
+    match = _COMPANY.search(title or "")
+    return " ".join(match.group(1).split()) if match else None
+
+
+def detect_statement(text: str) -> Dict[str, Optional[str]]:
+    """
+    Classify a table from its title (and headers)
+
+    Returns:
+        Dict with "statement_type" and "scope", None where undetermined
+    """
+    text = (text or "").lower()
+    if "segment" in text:
+        statement_type = "segment"
+    elif "cash flow" in text:
+        statement_type = "cash_flow"
+    elif "balance sheet" in text or "assets and liabilities" in text or "financial position" in text:
+        statement_type = "balance_sheet"
+    elif "result" in text or "profit and loss" in text or "income" in text:
+        statement_type = "results"
+    else:
+        statement_type = None
+
+    if "consolidated" in text:
+        scope = "consolidated"
+    elif re.search(r"stand[\s-]?alone", text):
+        scope = "standalone"
+    else:
+        scope = None
+
+    return {"statement_type": statement_type, "scope": scope}
+
+
+def parse_period(header: str) -> Dict[str, Optional[str]]:
+    """
+    Period described by a column header, e.g. "Quarter Ended December 31, 2024"
+
+    Returns:
+        Dict with "period_type" and "period_end" (ISO date), None where not found
+    """
+    period_type = next((name for name, pattern in PERIOD_TYPES if pattern.search(header)), None)
+
+    period_end = None
+    for pattern, order in ((_DATE_WORDS, "dmy"), (_DATE_MONTH_FIRST, "mdy"), (_DATE_NUMERIC, "dmy")):
+        match = pattern.search(header)
+        if not match:
+            continue
+        parts = dict(zip(order, match.groups()))
+        month = MONTHS.get(parts["m"].lower()) if not parts["m"].isdigit() else int(parts["m"])
+        year = int(parts["y"]) + (2000 if len(parts["y"]) == 2 else 0)
+        try:
+            period_end = date(year, month, int(parts["d"])).isoformat()
+            break
+        except (TypeError, ValueError):
+            continue
+
+    return {"period_type": period_type, "period_end": period_end}
+
+
+def line_item_column(headers: List[str], rows: List[List[str]]) -> Optional[int]:
+    """Index of the column holding line item names"""
+    for i, header in enumerate(headers):
+        if re.search(r"particular|description|line\s*item", header, re.I):
+            return i
+
+    # Otherwise the first column that is mostly text
+    for i in range(len(headers)):
+        cells = [row[i] for row in rows if i < len(row) and row[i].strip()]
+        if cells and sum(parse_amount(cell) is None for cell in cells) > len(cells) / 2:
+            if len(cells) > 1 and all(len(cell) <= 5 for cell in cells):
+                continue  # serial numbers such as "1", "(a)", "II"
+            return i
+    return None
+
+
+def fts_query(text: str) -> str:
+    """Quote every word so user input cannot use FTS5 query syntax"""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+def like_pattern(text: str) -> str:
+    """LIKE pattern matching text as a substring, wildcards escaped with a backslash"""
+    return "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+class TableIndex:
+    """SQLite index of line items across all extractions"""
+
+    def __init__(self, db_path: str = None):
+        """
+        Args:
+            db_path (str): SQLite database file
+        """
+        self.db_path = Path(db_path or config.TABLE_INDEX_PATH)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._write_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Connection committed on success and always closed"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def ingest(self, extraction_id: str, pdf_name: str, csv_files: List[str],
+               company: Optional[str] = None) -> int:
+        """
+        Index the tables of one extraction, replacing any earlier ingest of it
+
+        Args:
+            extraction_id (str): Extraction the CSVs belong to
+            pdf_name (str): Uploaded file name
+            csv_files (List[str]): CSV artifacts of the extraction
+            company (str): Company name; detected from the tables when omitted
+
+        Returns:
+            int: Number of facts indexed
+        """
+        tables = []
+        for csv_path in csv_files:
+            try:
+                tables.append((csv_path, read_table_csv(csv_path)))
+            except (OSError, UnicodeDecodeError, ValueError) as e:
+                print(f"Index: could not read {csv_path}: {e}")
+
+        if not company:
+            company = next((detect_company(t["title"]) for _, t in tables if detect_company(t["title"])), None)
+        if not company:
+            company = Path(pdf_name).stem
+
+        facts = 0
+        with self._write_lock, self._connect() as conn:
+            self._delete(conn, extraction_id)
+            conn.execute(
+                "INSERT INTO extractions (id, pdf_name, company, indexed_at) VALUES (?, ?, ?, ?)",
+                (extraction_id, pdf_name, company, time.time())
+            )
+            for csv_path, table in tables:
+                facts += self._ingest_table(conn, extraction_id, company, csv_path, table)
+
+        print(f"✓ Indexed {facts} facts from {len(tables)} tables ({company})")
+        return facts
+
+    def _ingest_table(self, conn, extraction_id, company, csv_path, table) -> int:
+        headers, rows = table["headers"], table["rows"]
+        item_col = line_item_column(headers, rows)
+        if item_col is None:
+            return 0
+
+        statement = detect_statement(table["title"] or " ".join(headers))
+        cursor = conn.execute(
+            "INSERT INTO tables (extraction_id, title, statement_type, scope, pages, csv_file) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (extraction_id, table["title"], statement["statement_type"], statement["scope"],
+             ",".join(map(str, table["pages"])), logical_name(csv_path))
+        )
+        table_id = cursor.lastrowid
+        periods = [parse_period(header) for header in headers]
+
+        facts = 0
+        for row in rows:
+            line_item = " ".join(row[item_col].split()) if item_col < len(row) else ""
+            if not line_item:
+                continue
+            # Period columns follow the line item; columns before it are serial numbers
+            for col in range(item_col + 1, min(len(row), len(headers))):
+                cell = row[col]
+                value = parse_amount(cell)
+                if value is None:
+                    continue
+                cursor = conn.execute(
+                    "INSERT INTO facts (table_id, extraction_id, company, statement_type, scope, line_item, "
+                    "period_type, period_end, column_header, value_text, value) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (table_id, extraction_id, company, statement["statement_type"], statement["scope"],
+                     line_item, periods[col]["period_type"], periods[col]["period_end"],
+                     headers[col], cell, value)
+                )
+                conn.execute("INSERT INTO facts_fts (rowid, line_item) VALUES (?, ?)",
+                             (cursor.lastrowid, line_item))
+                facts += 1
+        return facts
+
+    def _delete(self, conn, extraction_id: str):
+        conn.execute("DELETE FROM facts_fts WHERE rowid IN (SELECT id FROM facts WHERE extraction_id = ?)",
+                     (extraction_id,))
+        conn.execute("DELETE FROM facts WHERE extraction_id = ?", (extraction_id,))
+        conn.execute("DELETE FROM tables WHERE extraction_id = ?", (extraction_id,))
+        conn.execute("DELETE FROM extractions WHERE id = ?", (extraction_id,))
+
+    def remove(self, extraction_id: str):
+        """Drop an extraction from the index"""
+        with self._write_lock, self._connect() as conn:
+            self._delete(conn, extraction_id)
+
+    def query(self, line_item: str = None, company: str = None, statement_type: str = None,
+              scope: str = None, period_type: str = None, period_from: str = None,
+              period_to: str = None, limit: int = 500) -> List[Dict]:
+        """
+        Look up indexed facts
+
+        Args:
+            line_item (str): Words that must all appear in the line item (full-text)
+            company (str): Case-insensitive substring of the company name
+            statement_type (str): results, segment, balance_sheet or cash_flow
+            scope (str): consolidated or standalone
+            period_type (str): quarter, half_year, nine_months or year
+            period_from (str): Earliest period end, ISO date
+            period_to (str): Latest period end, ISO date
+            limit (int): Maximum number of facts returned, at least 1
+
+        Returns:
+            List[Dict]: Facts ordered by company and period end
+        """
+        sql = ("SELECT f.company, f.statement_type, f.scope, f.line_item, f.period_type, f.period_end, "
+               "f.column_header, f.value_text, f.value, f.extraction_id, t.title, t.pages, t.csv_file "
+               "FROM facts f JOIN tables t ON t.id = f.table_id")
+        where, params = [], []
+        if line_item and line_item.strip():
+            where.append("f.id IN (SELECT rowid FROM facts_fts WHERE facts_fts MATCH ?)")
+            params.append(fts_query(line_item))
+        if company:
+            where.append("f.company LIKE ? ESCAPE '\\'")
+            params.append(like_pattern(company))
+        for column, value in (("statement_type", statement_type), ("scope", scope), ("period_type", period_type)):
+            if value:
+                where.append(f"f.{column} = ?")
+                params.append(value)
+        if period_from:
+            where.append("f.period_end >= ?")
+            params.append(period_from)
+        if period_to:
+            where.append("f.period_end <= ?")
+            params.append(period_to)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY f.company, f.period_end, f.line_item LIMIT ?"
+        # SQLite reads a negative LIMIT as no limit
+        params.append(max(1, int(limit)))
+
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
@@ -0,0 +1,214 @@
+"""
+Local table-region detection with PyMuPDF.
+
+Instead of sending the whole page bitmap to the model (letterheads, signatures,
+notes and all), we locate the table regions on each page from three cheap
+signals and crop only those:
+
+* bounding boxes from PyMuPDF's find_tables()
+* ruling lines from page.get_drawings(), clustered into grids
+* word boxes from the text layer, clustered into runs of numeric rows
+
+Regions are returned as fractions of the page size (x0, y0, x1, y1 in 0..1) so
+they can be applied to a page image rendered at any resolution.
+"""
+from typing import List, Tuple
+
+Region = Tuple[float, float, float, float]
+
+# Margin around each region, in PDF points
+REGION_MARGIN = 12.0
+# How far above a region we look for its title lines, in PDF points
+TITLE_LOOKUP = 90.0
+# Vertical gap that separates two word-row clusters, in PDF points
+ROW_GAP = 18.0
+# A region this large is not worth cropping; the whole page is sent instead
+MAX_REGION_FRACTION = 0.85
+
+
+def _union(a: Region, b: Region) -> Region:
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def _overlaps(a: Region, b: Region, pad: float = 0.0) -> bool:
+    return not (a[2] + pad < b[0] or b[2] + pad < a[0] or a[3] + pad < b[1] or b[3] + pad < a[1])
+
+
+def _merge_regions(regions: List[Region], pad: float) -> List[Region]:
+    """Union regions that overlap (or nearly touch) until none do"""
+    merged = list(regions)
+    changed = True
+    while changed:
+        changed = False
+        result = []
+        for region in merged:
+            for i, existing in enumerate(result):
+                if _overlaps(region, existing, pad):
+                    result[i] = _union(region, existing)
+                    changed = True
+                    break
+            else:
+                result.append(region)
+        merged = result
+    return merged
+
+
+def _find_tables_regions(page) -> List[Region]:
+    if not hasattr(page, 'find_tables'):
+        return []
+    try:
+        return [tuple(table.bbox) for table in page.find_tables().tables]
+    except Exception as e:
+        print(f"find_tables failed on page {page.number + 1}: {e}")
+        return []
+
+
+def _ruling_line_regions(page) -> List[Region]:
+    """Cluster thin horizontal/vertical drawings into grid regions"""
+    lines = []
+    for drawing in page.get_drawings():
+        rect = drawing.get('rect')
+        if rect is None:
+            continue
+        thin = rect.height <= 2 or rect.width <= 2
+        long_enough = max(rect.width, rect.height) >= 40
+        if thin and long_enough:
+            lines.append((rect.x0, rect.y0, rect.x1, rect.y1))
+
+    regions = []
+    for cluster in _merge_regions(lines, pad=ROW_GAP):
+        members = [line for line in lines if _overlaps(line, cluster)]
+        horizontal = [line for line in members if line[3] - line[1] <= 2]
+        # Three or more horizontal rules (header, body, total) look like a table
+        if len(horizontal) >= 3:
+            regions.append(cluster)
+    return regions
+
+
+def _is_numeric_token(text: str) -> bool:
+    stripped = text.strip('()-,.%₹')
+    return bool(stripped) and stripped.replace(',', '').replace('.', '').isdigit()
+
+
+def _word_cluster_regions(page) -> List[Region]:
+    """Find vertical runs of text lines carrying two or more numbers"""
+    rows = {}
+    for x0, y0, x1, y1, text, block, line, _ in page.get_text("words"):
+        key = (block, line)
+        row = rows.setdefault(key, {"bbox": (x0, y0, x1, y1), "numbers": 0})
+        row["bbox"] = _union(row["bbox"], (x0, y0, x1, y1))
+        if _is_numeric_token(text):
+            row["numbers"] += 1
+
+    numeric_rows = sorted((r["bbox"] for r in rows.values() if r["numbers"] >= 2), key=lambda b: b[1])
+
+    regions = []
+    current, count = None, 0
+    for bbox in numeric_rows:
+        if current is not None and bbox[1] - current[3] <= ROW_GAP:
+            current = _union(current, bbox)
+            count += 1
+        else:
+            if current is not None and count >= 3:
+                regions.append(current)
+            current, count = bbox, 1
+    if current is not None and count >= 3:
+        regions.append(current)
+
+    # Numeric runs exclude the row labels on the left; widen to the text lines
+    # they share a baseline band with
+    widened = []
+    for region in regions:
+        for bbox in (r["bbox"] for r in rows.values()):
+            if bbox[1] >= region[1] - 2 and bbox[3] <= region[3] + 2:
+                region = _union(region, bbox)
+        widened.append(region)
+    return widened
+
+
+def _extend_to_title(page, region: Region) -> Region:
+    """Grow a region upwards to include the heading lines right above it"""
+    top = region[1]
+    for x0, y0, x1, y1, *_ in sorted(page.get_text("blocks"), key=lambda b: -b[3]):
+        if y1 <= top and top - y1 <= TITLE_LOOKUP and x1 > region[0] and x0 < region[2]:
+            region = _union(region, (x0, y0, x1, y1))
+            top = y0
+    return region
+
+
+def detect_table_regions(page) -> List[Region]:
+    """
+    Detect table regions on a PyMuPDF page
+
+    Args:
+        page: fitz.Page object
+
+    Returns:
+        List of regions as page fractions (x0, y0, x1, y1), top to bottom.
+        An empty list means the whole page should be sent.
+    """
+    width, height = page.rect.width, page.rect.height
+    if width <= 0 or height <= 0:
+        return []
+
+    candidates = _find_tables_regions(page) + _ruling_line_regions(page) + _word_cluster_regions(page)
+    if not candidates:
+        return []
+
+    regions = []
+    for region in _merge_regions(candidates, pad=REGION_MARGIN):
+        region = _extend_to_title(page, region)
+        regions.append((
+            max(0.0, region[0] - REGION_MARGIN),
+            max(0.0, region[1] - REGION_MARGIN),
+            min(width, region[2] + REGION_MARGIN),
+            min(height, region[3] + REGION_MARGIN)
+        ))
+    regions = _merge_regions(regions, pad=0.0)
+
+    covered = sum((r[2] - r[0]) * (r[3] - r[1]) for r in regions)
+    if covered >= MAX_REGION_FRACTION * width * height:
+        return []
+
+    regions.sort(key=lambda r: (r[1], r[0]))
+    return [(r[0] / width, r[1] / height, r[2] / width, r[3] / height) for r in regions]
+
+
+def detect_regions_for_pdf(pdf_path: str) -> List[List[Region]]:
+    """
+    Detect table regions for every page of a PDF
+
+    Args:
+        pdf_path (str): Path to the PDF file
+
+    Returns:
+        One list of regions per page (empty list = send the whole page)
+    """
+    import fitz
+
+    doc = fitz.open(pdf_path)
+    try:
+        return [detect_table_regions(page) for page in doc]
+    finally:
+        doc.close()
+
+
+def crop_region(image, region: Region):
+    """
+    Crop a page image to a region given as page fractions
+
+    Args:
+        image: PIL Image of the full page
+        region (Region): (x0, y0, x1, y1) as fractions of the page size
+
+    Returns:
+        Cropped PIL Image at the page image's full resolution
+    """
+    width, height = image.size
+    box = (
+        int(region[0] * width),
+        int(region[1] * height),
+        int(round(region[2] * width)),
+        int(round(region[3] * height))
+    )
+    return image.crop(box)
@@ -0,0 +1,104 @@
+"""
+Incremental output of table groups while a document is being processed.
+
+group_page_tables accumulates each page's rows in the group's "data" list. With
+an IncrementalTableWriter, those rows are moved to a per-group spool file on
+disk after every page, so only the group metadata (title, headers, pages) stays
+in memory. A group that has not received a continuation for `idle_pages` pages
+is considered closed: its rows are read back and its CSV is written right
+away, instead of after the last page of the document.
+"""
+import json
+from pathlib import Path
+from typing import Dict, List
+
+
+class IncrementalTableWriter:
+    """Spools table group rows to disk and reports groups ready to finalize"""
+
+    def __init__(self, spool_dir: Path, idle_pages: int = 3):
+        """
+        Args:
+            spool_dir (Path): Directory for the per-group spool files
+            idle_pages (int): Pages without a continuation after which a group is closed
+        """
+        self.spool_dir = Path(spool_dir)
+        self.idle_pages = idle_pages
+        self._spools = {}  # normalized title -> spool file
+        self._created = 0
+
+    def append(self, tables_by_title: Dict):
+        """
+        Move the rows accumulated in memory by each group to its spool file
+
+        Args:
+            tables_by_title (Dict): Table groups keyed by normalized title (updated in place)
+        """
+        for normalized_title, group in tables_by_title.items():
+            rows = group.get("data")
+            if not rows:
+                continue
+
+            if normalized_title not in self._spools:
+                self.spool_dir.mkdir(parents=True, exist_ok=True)
+                self._created += 1
+                self._spools[normalized_title] = self.spool_dir / f"group_{self._created}.jsonl"
+
+            with open(self._spools[normalized_title], 'a', encoding='utf-8') as f:
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+            group["spooled_rows"] = group.get("spooled_rows", 0) + len(rows)
+            group["data"] = []
+
+    def idle_groups(self, tables_by_title: Dict, page_num: int) -> List[str]:
+        """
+        Groups that can no longer receive continuations
+
+        Args:
+            tables_by_title (Dict): Table groups keyed by normalized title
+            page_num (int): Last page processed
+
+        Returns:
+            List[str]: Normalized titles of the groups to finalize
+        """
+        return [
+            normalized_title for normalized_title, group in tables_by_title.items()
+            if page_num - group["pages"][-1] >= self.idle_pages
+        ]
+
+    def load(self, normalized_title: str, group: Dict) -> Dict:
+        """
+        Return a copy of a group with all of its spooled rows in "data"
+
+        Args:
+            normalized_title (str): Group key
+            group (Dict): Group metadata from tables_by_title
+
+        Returns:
+            Dict: Group ready to be saved
+        """
+        rows = []
+        spool = self._spools.get(normalized_title)
+        if spool and spool.exists():
+            with open(spool, 'r', encoding='utf-8') as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+
+        combined = dict(group)
+        combined["data"] = rows + list(group.get("data", []))
+        return combined
+
+    def discard(self, normalized_title: str):
+        """Delete a finalized group's spool file"""
+        spool = self._spools.pop(normalized_title, None)
+        if spool and spool.exists():
+            spool.unlink()
+
+    def close(self):
+        """Remove the spool directory once every group is finalized"""
+        for normalized_title in list(self._spools):
+            self.discard(normalized_title)
+        try:
+            self.spool_dir.rmdir()
+        except OSError:
+            pass
@@ -0,0 +1,175 @@
+import importlib
+import io
+import os
+import threading
+import time
+import zipfile
+
+import pytest
+
+from janitor import ArtifactJanitor
+
+
+@pytest.fixture(scope="module")
+def app_module(tmp_path_factory):
+    # Importing the app creates its index and output folders under the cwd
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("app"))
+    try:
+        module = importlib.import_module("app")
+        module.janitor.stop()
+        yield module
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def app_env(app_module, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "janitor", ArtifactJanitor(index_path=str(tmp_path / "index.json")))
+    monkeypatch.setattr(app_module, "results_store", {})
+    monkeypatch.setattr(app_module, "batches", {})
+    return app_module
+
+
+class FakeExtractor:
+    """Writes one CSV per document, named like the real pipeline's"""
+
+    def __init__(self, root):
+        self.root = root
+        self.transport = self
+
+    def generate(self, prompt, image=None, **kwargs):
+        return {"text": "ok"}
+
+    def process_pdf(self, pdf_path, **kwargs):
+        name = os.path.splitext(os.path.basename(pdf_path))[0]
+        output_dir = self.root / name
+        output_dir.mkdir()
+        csv_path = output_dir / "page_1_table_1.csv"
+        csv_path.write_text(f"Item,Value\n{name},1\n")
+        return {"total_pages": 1, "pages_with_tables": 1, "total_tables_extracted": 1,
+                "csv_files": [str(csv_path)], "output_directory": str(output_dir)}
+
+
+def make_batch(app, tmp_path, names):
+    temp_dir = tmp_path / "batch"
+    temp_dir.mkdir()
+    documents = [{"extraction_id": f"id-{name}", "pdf_name": f"{name}.pdf", "status": "queued", "company": None}
+                 for name in names]
+    for name in names:
+        (temp_dir / f"{name}.pdf").write_bytes(b"%PDF-1.4")
+    batch = {"temp_dir": str(temp_dir), "created": "now", "documents": documents}
+    app.batches["b1"] = batch
+    return batch
+
+
+def zip_members(response):
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        return {name: archive.read(name).decode() for name in archive.namelist()}
+
+
+def test_batch_documents_get_their_own_archives(app_env, tmp_path, monkeypatch):
+    app = app_env
+    monkeypatch.setattr(app, "get_extractor", lambda api_key: FakeExtractor(tmp_path))
+    batch = make_batch(app, tmp_path, ["alpha", "beta"])
+    for document in batch["documents"]:
+        name = os.path.splitext(document["pdf_name"])[0]
+        app.run_bulk_document("key", batch, document, os.path.join(batch["temp_dir"], f"{name}.pdf"))
+
+    client = app.app.test_client()
+    alpha = client.get("/download/id-alpha")
+    beta = client.get("/download/id-beta")
+    assert alpha.status_code == beta.status_code == 200
+    assert "alpha,1" in zip_members(alpha)["page_1_table_1.csv"]
+    assert "beta,1" in zip_members(beta)["page_1_table_1.csv"]
+    assert os.path.exists(os.path.join(batch["temp_dir"], "id-alpha.zip"))
+    assert os.path.exists(os.path.join(batch["temp_dir"], "id-beta.zip"))
+
+    merged = zip_members(client.get("/batch/b1/download"))
+    assert "alpha,1" in merged["alpha/page_1_table_1.csv"]
+    assert "beta,1" in merged["beta/page_1_table_1.csv"]
+
+
+def test_batch_dir_is_registered_after_the_last_document(app_env, tmp_path, monkeypatch):
+    app = app_env
+    monkeypatch.setattr(app, "get_extractor", lambda api_key: FakeExtractor(tmp_path))
+    batch = make_batch(app, tmp_path, ["alpha", "beta"])
+    temp_dir = os.path.abspath(batch["temp_dir"])
+    first, second = batch["documents"]
+
+    app.run_bulk_document("key", batch, first, os.path.join(batch["temp_dir"], "alpha.pdf"))
+    # Downloads while the batch runs do not start the batch dir's TTL
+    assert app.app.test_client().get("/download/id-alpha").status_code == 200
+    assert temp_dir not in app.janitor._entries
+
+    app.run_bulk_document("key", batch, second, os.path.join(batch["temp_dir"], "beta.pdf"))
+    assert temp_dir in app.janitor._entries
+
+
+def test_refresh_ignores_untracked_paths(tmp_path):
+    janitor = ArtifactJanitor(index_path=str(tmp_path / "index.json"))
+    artifact = tmp_path / "upload"
+    artifact.mkdir()
+    janitor.refresh(str(artifact))
+    assert janitor.total_bytes() == 0
+
+    janitor.register(str(artifact))
+    (artifact / "tables.zip").write_bytes(b"x" * 100)
+    janitor.refresh(str(artifact))
+    assert janitor.total_bytes() == 100
+
+
+def test_evicting_the_output_directory_forgets_the_results(app_env, tmp_path, monkeypatch):
+    app = app_env
+    monkeypatch.chdir(tmp_path)
+    janitor = ArtifactJanitor(index_path=str(tmp_path / "index.json"), ttl_seconds=60,
+                              on_evict=app.forget_artifact)
+    monkeypatch.setattr(app, "janitor", janitor)
+    temp_dir = tmp_path / "upload"
+    temp_dir.mkdir()
+    (tmp_path / "extracted_tables").mkdir()
+    results = FakeExtractor(tmp_path / "extracted_tables").process_pdf(str(temp_dir / "report.pdf"))
+    # Output directories are stored relative to the working directory
+    results["output_directory"] = os.path.relpath(results["output_directory"])
+    app.store_model_results("ex1", "report.pdf", results, str(temp_dir))
+    janitor.register(str(temp_dir), "upload")
+
+    janitor._entries[os.path.abspath(results["output_directory"])]["last_access"] -= 3600
+    assert janitor.sweep() == [os.path.abspath(results["output_directory"])]
+
+    assert "ex1" not in app.results_store
+    assert app.app.test_client().get("/download/ex1").status_code == 404
+
+
+class GatedExtractor(FakeExtractor):
+    """FakeExtractor that streams one table, then waits until `release` is set"""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.release = threading.Event()
+
+    def process_pdf(self, pdf_path, on_table=None, **kwargs):
+        on_table({"title": "Costs", "headers": ["Item"], "data": [["Rent"]], "pages": [1]}, "costs.csv")
+        assert self.release.wait(5)
+        return super().process_pdf(pdf_path, **kwargs)
+
+
+def test_streamed_upload_is_registered_when_the_job_finishes(app_env, tmp_path, monkeypatch):
+    app = app_env
+    extractor = GatedExtractor(tmp_path)
+    monkeypatch.setattr(app, "get_extractor", lambda api_key: extractor)
+    monkeypatch.setattr(app, "check_memory", lambda *args: None)
+
+    response = app.app.test_client().post("/upload", content_type="multipart/form-data", data={
+        "file": (io.BytesIO(b"%PDF-1.4"), "report.pdf"), "api_key": "key", "mode": "model", "stream": "true"})
+    assert response.status_code == 200
+    # The PDF is still being read: its directory must not be on the janitor's clock yet
+    assert not any(entry["kind"] == "upload" for entry in app.janitor._entries.values())
+
+    extractor.release.set()
+    response.get_data()
+    deadline = time.time() + 5
+    while not any(entry["kind"] == "upload" for entry in app.janitor._entries.values()) and time.time() < deadline:
+        time.sleep(0.01)
+    temp_dir = app.results_store[response.headers["X-Extraction-Id"]]["temp_dir"]
+    assert app.janitor._entries[os.path.abspath(temp_dir)]["kind"] == "upload"
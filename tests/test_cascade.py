@@ -0,0 +1,123 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+import config
+from job_context import ExtractionJob
+
+Image = pytest.importorskip("PIL.Image")
+
+GOOD = {"has_tables": True, "tables": [{"title": "Costs", "headers": ["Item", "2023"],
+                                        "data": [["Rent", "10"], ["Staff", "20"]]}]}
+# A row wider than the headers fails the column check
+RAGGED = {"has_tables": True, "tables": [{"title": "Costs", "headers": ["Item", "2023"],
+                                          "data": [["Rent", "10", "5"]]}]}
+
+
+class ModelTransport:
+    """Answers with answers[model_name] after `latency` seconds and tracks concurrent calls"""
+
+    model_name = "cheap"
+
+    def __init__(self, answers, latency=0.0):
+        self.answers = answers
+        self.latency = latency
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _enter(self, model_name):
+        with self._lock:
+            self.calls.append(model_name)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _leave(self, model_name):
+        with self._lock:
+            self.in_flight -= 1
+        return {"text": json.dumps(self.answers[model_name]), "usage": {"input_tokens": 3, "output_tokens": 7}}
+
+    def generate(self, prompt, image=None, generation_config=None, model_name=None):
+        self._enter(model_name)
+        time.sleep(self.latency)
+        return self._leave(model_name)
+
+    async def generate_async(self, prompt, image=None, generation_config=None, model_name=None):
+        self._enter(model_name)
+        await asyncio.sleep(self.latency)
+        return self._leave(model_name)
+
+
+@pytest.fixture
+def make_extractor(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from pdf_extractor import PDFTableExtractor
+
+    def make(transport):
+        extractor = PDFTableExtractor("key", transport=transport, crop_regions=False,
+                                      model_cascade=["cheap", "strong"])
+        job = ExtractionJob(str(tmp_path / "doc.pdf"), tmp_path)
+        return extractor, job
+    return make
+
+
+def run_both(make_extractor, answers):
+    image = Image.new("RGB", (200, 300), "white")
+    outcomes = []
+    for mode in ("sync", "async"):
+        transport = ModelTransport(answers)
+        extractor, job = make_extractor(transport)
+        if mode == "sync":
+            result = extractor.extract_page_with_cascade(job, image, 1)
+        else:
+            result = asyncio.run(extractor.extract_page_with_cascade_async(job, image, 1))
+        outcomes.append((result, job, transport))
+    return outcomes
+
+
+def test_cascade_escalates_the_same_way_in_both_paths(make_extractor):
+    (sync_result, sync_job, sync_transport), (async_result, async_job, async_transport) = \
+        run_both(make_extractor, {"cheap": RAGGED, "strong": GOOD})
+
+    for result, job, transport in ((sync_result, sync_job, sync_transport), (async_result, async_job, async_transport)):
+        assert transport.calls == ["cheap", "strong"]
+        assert result["model"] == "strong"
+        assert result["tables"] == GOOD["tables"]
+        assert result["usage"]["calls"] == 2
+        assert job.results["model_stats"]["cheap"]["escalation_reasons"] == {"column_mismatch": 1}
+    assert sync_result == async_result
+
+
+def test_cheapest_model_is_kept_when_its_answer_passes(make_extractor):
+    for result, job, transport in run_both(make_extractor, {"cheap": GOOD, "strong": GOOD}):
+        assert transport.calls == ["cheap"]
+        assert result["model"] == "cheap"
+
+
+def test_spent_budget_skips_the_page_in_both_paths(make_extractor, monkeypatch):
+    monkeypatch.setattr(ExtractionJob, "budget_action", lambda self: "stop")
+    for result, job, transport in run_both(make_extractor, {"cheap": GOOD, "strong": GOOD}):
+        assert transport.calls == []
+        assert result["skipped"] and result["error"] == "token budget exceeded"
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_area_requests_are_bounded_by_region_workers(make_extractor, monkeypatch, mode):
+    monkeypatch.setattr(config, "REGION_WORKERS", 2)
+    transport = ModelTransport({"cheap": GOOD}, latency=0.02)
+    extractor, job = make_extractor(transport)
+    image = Image.new("RGB", (200, 300), "white")
+    plans = [[(0.0, i / 6, 1.0, (i + 1) / 6)] for i in range(6)]
+
+    if mode == "sync":
+        area_results = extractor._extract_area_plans(image, plans, 1, model_name="cheap")
+    else:
+        area_results = asyncio.run(extractor._extract_area_plans_async(image, plans, 1, model_name="cheap"))
+
+    assert len(area_results) == 6
+    assert len(transport.calls) == 6
+    assert transport.max_in_flight == 2
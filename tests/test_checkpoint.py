@@ -0,0 +1,160 @@
+import os
+import time
+
+import pytest
+
+from checkpoint import open_journal
+from janitor import ArtifactJanitor
+
+SCOPE = {"tenant": "key-a", "models": ["flash"], "prompt": "p1"}
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    path = tmp_path / "filing.pdf"
+    path.write_bytes(b"%PDF-1.4 test document")
+    return str(path)
+
+
+def page(n):
+    return {"has_tables": True, "tables": [{"title": f"Table {n}", "headers": ["A"], "data": [[str(n)]]}]}
+
+
+def test_resume_restores_recorded_pages(pdf, tmp_path):
+    journal = open_journal(pdf, str(tmp_path / "cp"), SCOPE)
+    journal.record(1, page(1))
+    journal.record(2, {"error": "timeout"})
+    journal.record(3, {"skipped": "budget"})
+    journal.record(4, page(4))
+    journal.close()
+
+    resumed = open_journal(pdf, str(tmp_path / "cp"), SCOPE)
+    try:
+        # Failed and skipped pages are retried
+        assert resumed.pages == {1: page(1), 4: page(4)}
+    finally:
+        resumed.close()
+
+
+def test_torn_last_line_is_dropped(pdf, tmp_path):
+    journal = open_journal(pdf, str(tmp_path / "cp"), SCOPE)
+    journal.record(1, page(1))
+    journal.close()
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"page": 2, "result": {"has_tab')
+
+    resumed = open_journal(pdf, str(tmp_path / "cp"), SCOPE)
+    resumed.record(2, page(2))
+    resumed.close()
+
+    assert open_journal(pdf, str(tmp_path / "cp"), SCOPE).pages == {1: page(1), 2: page(2)}
+
+
+@pytest.mark.parametrize("other_scope", [
+    dict(SCOPE, tenant="key-b"),
+    dict(SCOPE, models=["pro"]),
+    dict(SCOPE, prompt="p2"),
+])
+def test_other_tenant_or_settings_do_not_resume(pdf, tmp_path, other_scope):
+    journal = open_journal(pdf, str(tmp_path / "cp"), SCOPE)
+    journal.record(1, page(1))
+    journal.close()
+
+    other = open_journal(pdf, str(tmp_path / "cp"), other_scope)
+    try:
+        assert other.pages == {}
+        assert other.path != journal.path
+    finally:
+        other.close()
+
+
+def test_scope_values_are_not_stored(pdf, tmp_path):
+    journal = open_journal(pdf, str(tmp_path / "cp"), SCOPE)
+    journal.close()
+
+    assert "key-a" not in journal.path.read_text(encoding="utf-8")
+    assert "key-a" not in journal.path.name
+
+
+def test_journal_is_held_by_one_job(pdf, tmp_path):
+    journal = open_journal(pdf, str(tmp_path / "cp"), SCOPE)
+    try:
+        assert open_journal(pdf, str(tmp_path / "cp"), SCOPE) is None
+    finally:
+        journal.close()
+
+
+def test_completed_journal_is_removed(pdf, tmp_path):
+    journal = open_journal(pdf, str(tmp_path / "cp"), SCOPE)
+    journal.record(1, page(1))
+    journal.complete()
+
+    assert not journal.path.exists()
+    assert open_journal(pdf, str(tmp_path / "cp"), SCOPE).pages == {}
+
+
+def test_janitor_expires_abandoned_journals(pdf, tmp_path):
+    checkpoint_dir = tmp_path / "cp"
+    stale = open_journal(pdf, str(checkpoint_dir), SCOPE)
+    stale.close()
+    fresh = open_journal(pdf, str(checkpoint_dir), dict(SCOPE, tenant="key-b"))
+    fresh.close()
+    old = time.time() - 7200
+    os.utime(stale.path, (old, old))
+
+    janitor = ArtifactJanitor(index_path=str(tmp_path / "index.json"))
+    janitor.register_directory(str(checkpoint_dir), ttl_seconds=3600)
+    janitor.sweep()
+
+    assert not stale.path.exists()
+    assert fresh.path.exists()
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_failed_job_releases_its_journal_and_profiler(pdf, tmp_path, monkeypatch, mode):
+    pytest.importorskip("PIL.Image")
+    import asyncio
+    from concurrent.futures import Future
+
+    import config
+    import tracing
+    from job_context import ExtractionJob
+    from pdf_extractor import PDFTableExtractor
+
+    monkeypatch.setattr(config, "CHECKPOINT_PAGES", True)
+    monkeypatch.setattr(config, "CHECKPOINT_DIR", str(tmp_path / "cp"))
+    extractor = PDFTableExtractor("key", transport=object(), crop_regions=False)
+
+    def render_pages(pdf_path, trace, skip=(), zoom=3.0):
+        futures = [Future() for _ in range(3)]
+        for future in futures:
+            future.set_result(None)
+        return futures
+
+    async def extract_async(job, image, page_num):
+        return page(page_num)
+
+    def spool_tables(job, page_num):
+        if page_num == 2:
+            raise OSError("disk full")
+
+    monkeypatch.setattr(extractor, "render_pages", render_pages)
+    monkeypatch.setattr(extractor, "extract_page_with_cascade", lambda job, image, page_num: page(page_num))
+    monkeypatch.setattr(extractor, "extract_page_with_cascade_async", extract_async)
+    monkeypatch.setattr(extractor, "spool_tables", spool_tables)
+
+    job = ExtractionJob(pdf, tmp_path, trace=tracing.JobTrace("filing", sample_interval=0.01))
+    with pytest.raises(OSError):
+        if mode == "sync":
+            extractor.extract_job(job)
+        else:
+            asyncio.run(extractor.extract_job_async(job))
+
+    assert not tracing._profiling_lock.locked()
+    # The next run of the document is not locked out and resumes from the recorded pages
+    journal = open_journal(pdf, scope=extractor.checkpoint_scope(job))
+    assert journal is not None
+    try:
+        assert journal.pages == {1: page(1), 2: page(2)}
+    finally:
+        journal.close()
@@ -0,0 +1,56 @@
+import pytest
+
+import config
+from job_context import ExtractionJob
+from table_writer import IncrementalTableWriter
+
+
+class NoTransport:
+    model_name = "none"
+
+
+@pytest.fixture
+def extractor(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config, "VALIDATE_TOTALS", False)
+    from pdf_extractor import PDFTableExtractor
+    return PDFTableExtractor("key", transport=NoTransport(), crop_regions=False)
+
+
+def page(headers, *rows):
+    return {"has_tables": True, "tables": [{"title": "Segment Revenue", "headers": headers, "data": list(rows)}]}
+
+
+def test_variant_keys_are_not_reused_after_a_variant_is_finalized(extractor, tmp_path):
+    job = ExtractionJob(str(tmp_path / "report.pdf"), tmp_path)
+    job.table_writer = IncrementalTableWriter(tmp_path / ".spool", idle_pages=3)
+    pages = {
+        1: page(["Segment", "FY23"], ["Retail", "1"]),
+        2: page(["Region", "Q1", "Q2"], ["North", "2", "3"]),
+        3: page(["Product", "Units"], ["Widgets", "4"]),
+        4: page(["Segment", "FY23"], ["Wholesale", "5"]),
+        5: {"has_tables": False, "tables": []},
+        # Incompatible with the open base group while _v2 is finalized and _v3 still open
+        6: page(["Channel", "Share"], ["Online", "6"]),
+    }
+    for page_num, result in pages.items():
+        extractor.record_page(job, page_num, result)
+        extractor.spool_tables(job, page_num)
+    results = extractor.finish_job(job)
+
+    saved = sorted(entry["pages"] for entry in results["table_pages"].values())
+    assert saved == [[1, 4], [2], [3], [6]]
+    assert job.group_keys == {"Segment Revenue", "Segment Revenue_v2", "Segment Revenue_v3", "Segment Revenue_v4"}
+
+
+def test_variant_suffix_skips_open_keys(extractor):
+    tables_by_title = {}
+    group_keys = set()
+    extractor.group_page_tables(tables_by_title, page(["A", "B"], ["x", "1"])["tables"], 1, group_keys)
+    extractor.group_page_tables(tables_by_title, page(["C", "D"], ["y", "2"])["tables"], 2, group_keys)
+    extractor.group_page_tables(tables_by_title, page(["E", "F"], ["z", "3"])["tables"], 3, group_keys)
+    del tables_by_title["Segment Revenue_v2"]
+
+    extractor.group_page_tables(tables_by_title, page(["G", "H"], ["w", "4"])["tables"], 4, group_keys)
+    assert tables_by_title["Segment Revenue_v3"]["pages"] == [3]
+    assert tables_by_title["Segment Revenue_v4"]["pages"] == [4]
@@ -0,0 +1,165 @@
+import asyncio
+import gc
+import itertools
+import threading
+import time
+
+import pytest
+
+from model_transport import HedgingTransport, ModelTransportError
+from usage import get_token_ledger
+
+FAST, SLOW = 0.01, 0.5
+
+
+class ScriptedTransport:
+    """Answers call n after latencies[n] seconds with {"text": str(n)}; calls in `failing` raise"""
+
+    model_name = "test-model"
+
+    def __init__(self, latencies, failing=()):
+        self.latencies = latencies
+        self.failing = set(failing)
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def _next(self):
+        with self._lock:
+            n = next(self._counter)
+        return n, self.latencies[n] if n < len(self.latencies) else FAST
+
+    def _answer(self, n):
+        if n in self.failing:
+            raise ModelTransportError(f"call {n} failed", 500)
+        return {"text": str(n)}
+
+    def generate(self, prompt, image=None, generation_config=None, model_name=None):
+        n, latency = self._next()
+        time.sleep(latency)
+        return self._answer(n)
+
+    async def generate_async(self, prompt, image=None, generation_config=None, model_name=None):
+        n, latency = self._next()
+        await asyncio.sleep(latency)
+        return self._answer(n)
+
+
+def warmed_up(latencies, failing=(), samples=5, max_hedge_rate=1.0):
+    """Hedging transport whose first `samples` calls were fast"""
+    inner = ScriptedTransport([FAST] * samples + latencies, failing)
+    transport = HedgingTransport(inner, quantile=0.95, max_hedge_rate=max_hedge_rate, min_samples=samples)
+    for _ in range(samples):
+        transport.generate("warm up")
+    return transport, inner
+
+
+def test_no_hedge_before_min_samples():
+    inner = ScriptedTransport([SLOW])
+    transport = HedgingTransport(inner, max_hedge_rate=1.0, min_samples=5)
+
+    assert transport.generate("p") == {"text": "0"}
+    assert transport.stats["hedged"] == 0
+
+
+def test_slow_call_is_hedged_and_hedge_wins():
+    transport, inner = warmed_up([SLOW, FAST])
+
+    start = time.perf_counter()
+    response = transport.generate("p")
+
+    assert response == {"text": "6"}
+    assert time.perf_counter() - start < SLOW
+    assert transport.stats["hedged"] == 1 and transport.stats["hedge_wins"] == 1
+
+
+def test_fast_call_is_not_hedged():
+    transport, inner = warmed_up([0])
+
+    assert transport.generate("p") == {"text": "5"}
+    assert transport.stats["hedged"] == 0
+
+
+def test_hedge_rate_cap():
+    transport, inner = warmed_up([SLOW], max_hedge_rate=0.0)
+
+    assert transport.generate("p") == {"text": "5"}
+    assert transport.stats["hedged"] == 0
+
+
+def test_failed_loser_does_not_fail_the_call():
+    # The hedge fails quickly; the slow primary's answer is still used
+    transport, inner = warmed_up([SLOW, FAST], failing={6})
+
+    assert transport.generate("p") == {"text": "5"}
+    assert transport.stats["hedge_wins"] == 0
+
+
+def test_both_failing_raises():
+    transport, inner = warmed_up([SLOW, FAST], failing={5, 6})
+
+    with pytest.raises(ModelTransportError):
+        transport.generate("p")
+
+
+def test_async_slow_call_is_hedged_and_hedge_wins():
+    transport, inner = warmed_up([SLOW, FAST])
+
+    async def run():
+        start = time.perf_counter()
+        response = await transport.generate_async("p")
+        return response, time.perf_counter() - start
+
+    response, elapsed = asyncio.run(run())
+
+    assert response == {"text": "6"}
+    assert elapsed < SLOW
+    assert transport.stats["hedge_wins"] == 1
+
+
+class MeteredTransport(ScriptedTransport):
+    """ScriptedTransport whose answers used 10 input and 5 output tokens"""
+
+    def _answer(self, n):
+        return dict(super()._answer(n), usage={"input_tokens": 10, "output_tokens": 5})
+
+
+def metered(latencies, failing=(), samples=5):
+    inner = MeteredTransport([FAST] * samples + latencies, failing)
+    transport = HedgingTransport(inner, quantile=0.95, max_hedge_rate=1.0, min_samples=samples,
+                                 ledger_key=f"key-{id(inner)}")
+    for _ in range(samples):
+        transport.generate("warm up")
+    return transport
+
+
+def test_losing_call_is_charged_to_the_ledger():
+    transport = metered([SLOW, FAST])
+    used = get_token_ledger().used(transport.ledger_key)
+
+    assert transport.generate("p")["text"] == "6"
+    deadline = time.time() + 2 * SLOW
+    while transport.stats["discarded_tokens"] == 0 and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert transport.stats["discarded_tokens"] == 15
+    assert get_token_ledger().used(transport.ledger_key) == used + 15
+
+
+def test_async_losing_call_is_charged_and_its_failure_retrieved():
+    charged = metered([SLOW, FAST])
+    failing = metered([SLOW, FAST], failing={5})
+    unhandled = []
+
+    async def run():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unhandled.append(context))
+        assert (await charged.generate_async("p"))["text"] == "6"
+        assert (await failing.generate_async("p"))["text"] == "6"
+        # Let both losers finish, then drop them
+        await asyncio.sleep(SLOW + 0.1)
+        gc.collect()
+
+    asyncio.run(run())
+
+    assert charged.stats["discarded_tokens"] == 15
+    assert failing.stats["discarded_tokens"] == 0
+    assert unhandled == []
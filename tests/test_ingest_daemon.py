@@ -0,0 +1,150 @@
+import json
+import os
+import time
+
+import pytest
+
+from ingest_daemon import DONE, FAILED, MISSING_FILE, PROCESSING, QUEUED, IngestDaemon
+
+
+class FakeExtractor:
+    """Writes one CSV per document into the output root; files listed in `failing` raise"""
+
+    def __init__(self):
+        self.calls = []
+        self.failing = set()
+
+    def process_pdf(self, pdf_path, output_root=None, **kwargs):
+        self.calls.append(pdf_path)
+        if os.path.basename(pdf_path) in self.failing:
+            raise RuntimeError("extraction failed")
+        name = os.path.splitext(os.path.basename(pdf_path))[0]
+        output_dir = os.path.join(str(output_root), name)
+        os.makedirs(output_dir)
+        csv_path = os.path.join(output_dir, "table.csv")
+        with open(csv_path, "w") as f:
+            f.write("Item,Value\nRent,1\n")
+        return {"pdf_name": name, "output_directory": output_dir, "csv_files": [csv_path],
+                "total_tables_extracted": 1, "total_pages": 1}
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    watch, output = tmp_path / "incoming", tmp_path / "extracted"
+    watch.mkdir()
+    return watch, output
+
+
+def make_daemon(dirs, extractor, **kwargs):
+    watch, output = dirs
+    return IngestDaemon(str(watch), str(output), extractor, workers=2, **kwargs)
+
+
+def step(daemon):
+    """One scan and dispatch, then wait for the started extractions"""
+    daemon.dispatch(daemon.scan())
+    deadline = time.time() + 5
+    while daemon._running and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_files_are_picked_up_once_stable(dirs):
+    watch, _ = dirs
+    extractor = FakeExtractor()
+    daemon = make_daemon(dirs, extractor)
+    (watch / "a.pdf").write_bytes(b"%PDF-1 a")
+
+    assert daemon.scan() == []
+    step(daemon)
+
+    assert extractor.calls == [str(watch / "a.pdf")]
+    (entry,) = daemon.manifest.values()
+    assert entry["status"] == DONE
+    assert os.path.exists(entry["csv_files"][0])
+    with open(os.path.join(entry["output_directory"], "results.json")) as f:
+        assert json.load(f)["source"] == str(watch / "a.pdf")
+
+
+def test_changing_file_is_not_picked_up(dirs):
+    watch, _ = dirs
+    daemon = make_daemon(dirs, FakeExtractor())
+    pdf = watch / "a.pdf"
+    pdf.write_bytes(b"%PDF-1 a")
+    daemon.scan()
+    pdf.write_bytes(b"%PDF-1 a, still copying")
+
+    assert daemon.scan() == []
+    assert daemon.manifest == {}
+
+
+def test_same_contents_are_extracted_once(dirs):
+    watch, _ = dirs
+    extractor = FakeExtractor()
+    daemon = make_daemon(dirs, extractor)
+    (watch / "a.pdf").write_bytes(b"%PDF-1 same")
+    (watch / "copy.pdf").write_bytes(b"%PDF-1 same")
+
+    daemon.scan()
+    step(daemon)
+    step(daemon)
+
+    assert len(extractor.calls) == 1
+    (entry,) = daemon.manifest.values()
+    assert sorted(entry["files"]) == [str(watch / "a.pdf"), str(watch / "copy.pdf")]
+
+
+def test_interrupted_documents_are_requeued_on_restart(dirs):
+    _, output = dirs
+    output.mkdir()
+    (output / "manifest.json").write_text(json.dumps({
+        "abc": {"status": PROCESSING, "files": ["x.pdf"], "attempts": 1},
+        "def": {"status": DONE, "files": ["y.pdf"], "attempts": 1},
+    }))
+    (output / ".staging" / "partial").mkdir(parents=True)
+
+    daemon = make_daemon(dirs, FakeExtractor())
+
+    assert daemon.manifest["abc"]["status"] == QUEUED
+    assert daemon.manifest["def"]["status"] == DONE
+    assert list((output / ".staging").iterdir()) == []
+    with open(output / "manifest.json") as f:
+        assert json.load(f)["abc"]["status"] == QUEUED
+
+
+def test_failed_documents_back_off(dirs):
+    watch, _ = dirs
+    extractor = FakeExtractor()
+    extractor.failing.add("a.pdf")
+    daemon = make_daemon(dirs, extractor, retry_delay=60)
+    (watch / "a.pdf").write_bytes(b"%PDF-1 a")
+
+    daemon.scan()
+    step(daemon)
+    (digest, entry), = daemon.manifest.items()
+    assert entry["status"] == FAILED
+    assert entry["next_attempt"] >= time.time() + 55
+    assert daemon.scan() == []
+
+    entry["next_attempt"] = time.time() - 1
+    assert daemon.scan() == [digest]
+
+
+def test_missing_document_is_requeued_when_it_reappears(dirs):
+    watch, _ = dirs
+    extractor = FakeExtractor()
+    daemon = make_daemon(dirs, extractor)
+    pdf = watch / "a.pdf"
+    pdf.write_bytes(b"%PDF-1 a")
+    daemon.scan()
+    waiting = daemon.scan()
+    pdf.unlink()
+    daemon.dispatch(waiting)
+    (entry,) = daemon.manifest.values()
+    assert (entry["status"], entry["error"]) == (FAILED, MISSING_FILE)
+
+    (watch / "renamed.pdf").write_bytes(b"%PDF-1 a")
+    daemon.scan()
+    step(daemon)
+
+    assert entry["status"] == DONE
+    assert extractor.calls == [str(watch / "renamed.pdf")]
@@ -0,0 +1,92 @@
+import pytest
+
+import config
+from layout_templates import TemplateStore, build_template, get_template_store, grid_prompt, parse_grid_response
+
+TABLE = {
+    "title": "ACME INDUSTRIES LIMITED - Statement of Standalone Financial Results",
+    "headers": ["Sr. No.", "Particulars", "Quarter Ended 31.12.2024", "Quarter Ended 30.09.2024"],
+    "data": [
+        ["I", "Revenue from operations", "1,000.00", "950.00"],
+        ["II", "Other income", "100.00", "100.00"],
+        ["III", "Total Income (I+II)", "1,100.00", "1,050.00"],
+    ]
+}
+
+
+def page_content(company="ACME INDUSTRIES LIMITED", extra_numbers=()):
+    lines = [f"{company}", "Statement of Standalone Financial Results",
+             "Sr. No. Particulars Quarter Ended 31.12.2024 Quarter Ended 30.09.2024",
+             "I Revenue from operations 1,210.00 1,000.00",
+             "II Other income 90.00 100.00",
+             "III Total Income (I+II) 1,300.00 1,100.00"]
+    return "\n".join(lines + list(extra_numbers))
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TemplateStore(str(tmp_path / "templates.json"))
+    assert store.learn(TABLE, page_content())
+    return store
+
+
+def test_page_of_the_same_issuer_matches(store):
+    template = store.match(page_content())
+
+    assert template is not None
+    assert template["company"] == "ACME INDUSTRIES LIMITED"
+    assert [label[-1] for label in template["labels"]] == ["Revenue from operations", "Other income",
+                                                           "Total Income (I+II)"]
+
+
+def test_other_issuer_with_the_same_labels_is_rejected(store):
+    assert store.match(page_content(company="ACME HOLDINGS LIMITED")) is None
+
+
+def test_page_naming_no_issuer_is_rejected(store):
+    assert store.match(page_content(company="Statement for the quarter")) is None
+
+
+def test_page_with_a_second_table_is_rejected(store):
+    # Many more numbers than the template's table
+    assert store.match(page_content(extra_numbers=[f"Row {i} {i}.00 {i}.50" for i in range(20)])) is None
+
+
+def test_table_without_issuer_is_not_learned(tmp_path):
+    table = dict(TABLE, title="Statement of Standalone Financial Results")
+
+    assert build_template(table, "Statement of Standalone Financial Results") is None
+    assert TemplateStore(str(tmp_path / "templates.json")).learn(table) is None
+
+
+def test_stores_are_per_tenant(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "LAYOUT_TEMPLATES", True)
+    monkeypatch.setattr(config, "LAYOUT_TEMPLATES_DIR", str(tmp_path / "templates"))
+
+    get_template_store("key-a").learn(TABLE, page_content())
+
+    assert get_template_store("key-a").match(page_content()) is not None
+    assert get_template_store("key-b").match(page_content()) is None
+    assert get_template_store("key-a").path != get_template_store("key-b").path
+
+
+def test_grid_answer_is_rebuilt_with_template_labels(store):
+    template = store.match(page_content())
+    answer = '{"title": "Results", "headers": ["Q3", "Q2"], "grid": [["1,210.00", "1,000.00"], ["90.00", "100.00"], ["1,300.00", "1,100.00"]]}'
+
+    result = parse_grid_response(answer, template)
+
+    table = result["tables"][0]
+    assert table["headers"] == ["Sr. No.", "Particulars", "Q3", "Q2"]
+    assert table["data"][2] == ["III", "Total Income (I+II)", "1,300.00", "1,100.00"]
+    assert "Total Income (I+II)" in grid_prompt(template)
+
+
+@pytest.mark.parametrize("answer", [
+    '{"mismatch": true}',
+    '{"grid": [["1", "2"], ["3", "4"]]}',
+    '{"grid": [["1"], ["2"], ["3"]]}',
+    'not json',
+])
+def test_grid_answer_not_fitting_the_template_is_rejected(store, answer):
+    assert parse_grid_response(answer, store.match(page_content())) is None
@@ -0,0 +1,64 @@
+import csv
+
+import pytest
+
+import config
+from artifacts import open_artifact
+from local_extraction import column_names, extract_locally
+
+
+def test_empty_names_become_placeholders():
+    assert column_names(["Item", None, "", "2023"]) == ["Item", "Col1", "Col2", "2023"]
+
+
+def test_duplicates_are_prefixed_with_their_index():
+    assert column_names(["Item", "Value", None, "Value"]) == ["0-Item", "1-Value", "Col2", "3-Value"]
+
+
+def test_unique_names_are_kept():
+    assert column_names(["Item", "Value"]) == ["Item", "Value"]
+
+
+def write_table_pdf(path, pages, header):
+    fitz = pytest.importorskip("fitz")
+    doc = fitz.open()
+    for page_index in range(pages):
+        page = doc.new_page()
+        rows = [header] + [[f"row {page_index}.{r}", str(r), str(r * 2)] for r in range(3)]
+        top, left, width, height = 72, 72, 120, 24
+        for r, row in enumerate(rows):
+            for c, text in enumerate(row):
+                rect = fitz.Rect(left + c * width, top + r * height, left + (c + 1) * width, top + (r + 1) * height)
+                page.draw_rect(rect, color=(0, 0, 0), width=1)
+                if text:
+                    page.insert_text((rect.x0 + 4, rect.y1 - 8), text, fontsize=10)
+    doc.save(str(path))
+    doc.close()
+
+
+def test_headers_match_to_pandas(tmp_path):
+    pytest.importorskip("pandas")
+    fitz = pytest.importorskip("fitz")
+    pdf_path = tmp_path / "dup.pdf"
+    write_table_pdf(pdf_path, 1, ["Value", "", "Value"])
+    with fitz.open(str(pdf_path)) as doc:
+        tables = doc[0].find_tables().tables
+        assert tables
+        expected = list(tables[0].to_pandas().columns)
+
+    results = extract_locally(str(pdf_path), str(tmp_path))
+    with open_artifact(results["csv_files"][0], "r") as f:
+        assert next(csv.reader(f)) == expected
+
+
+def test_chunks_are_extracted_in_page_order(tmp_path, monkeypatch):
+    pdf_path = tmp_path / "pages.pdf"
+    write_table_pdf(pdf_path, 5, ["Item", "A", "B"])
+    monkeypatch.setattr(config, "LOCAL_CHUNK_PAGES", 2)
+    monkeypatch.setattr(config, "LOCAL_EXTRACT_PROCESSES", 2)
+
+    results = extract_locally(str(pdf_path), str(tmp_path))
+    assert results["total_pages"] == 5
+    assert results["pages_with_tables"] == 5
+    assert [page["page_number"] for page in results["page_results"]] == [1, 2, 3, 4, 5]
+    assert [results["table_pages"][path]["pages"] for path in results["csv_files"]] == [[1], [2], [3], [4], [5]]
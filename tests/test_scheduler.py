@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import time
+
+from scheduler import AsyncPageSlots, PageScheduler
+
+LARGE, SMALL = 100, 1
+
+
+def run_in_order(scheduler, submissions):
+    """Queue (tenant, document_pages, name) tasks behind a blocked worker and return the order they ran in"""
+    started, gate = threading.Event(), threading.Event()
+    order = []
+
+    def block():
+        started.set()
+        gate.wait(5)
+
+    blocker = scheduler.submit("gate", LARGE, block)
+    assert started.wait(5)
+    futures = [scheduler.submit(tenant, pages, order.append, name) for tenant, pages, name in submissions]
+    gate.set()
+    blocker.result(timeout=5)
+    for future in futures:
+        future.result(timeout=5)
+    return order
+
+
+def test_round_robin_across_tenants():
+    scheduler = PageScheduler(workers=1, tenant_limit=4, small_doc_pages=5, fast_lane_burst=3)
+
+    order = run_in_order(scheduler, [("a", LARGE, "a1"), ("a", LARGE, "a2"), ("a", LARGE, "a3"),
+                                     ("b", LARGE, "b1"), ("b", LARGE, "b2"), ("c", LARGE, "c1")])
+
+    assert order == ["a1", "b1", "c1", "a2", "b2", "a3"]
+
+
+def test_fast_lane_first_with_normal_lane_turns():
+    scheduler = PageScheduler(workers=1, tenant_limit=4, small_doc_pages=5, fast_lane_burst=2)
+
+    order = run_in_order(scheduler, [("t", LARGE, "n1"), ("t", LARGE, "n2"), ("t", LARGE, "n3"),
+                                     ("t", SMALL, "f1"), ("t", SMALL, "f2"), ("t", SMALL, "f3"),
+                                     ("t", SMALL, "f4")])
+
+    assert order == ["f1", "f2", "n1", "f3", "f4", "n2", "n3"]
+
+
+def test_tenant_limit_leaves_workers_to_other_tenants():
+    scheduler = PageScheduler(workers=4, tenant_limit=2)
+    release = threading.Event()
+    running = {"a": 0}
+    peak = {"a": 0}
+    lock = threading.Lock()
+
+    def page():
+        with lock:
+            running["a"] += 1
+            peak["a"] = max(peak["a"], running["a"])
+        release.wait(5)
+        with lock:
+            running["a"] -= 1
+
+    pages = [scheduler.submit("a", LARGE, page) for _ in range(6)]
+    # Tenant "a" holds two workers; "b" gets one of the idle ones right away
+    assert scheduler.submit("b", LARGE, time.perf_counter).result(timeout=2)
+    assert scheduler.snapshot()["queued"]["normal"] == 4
+
+    release.set()
+    for future in pages:
+        future.result(timeout=5)
+    assert peak["a"] == 2
+
+
+def test_task_exception_is_set_on_its_future():
+    scheduler = PageScheduler(workers=1)
+    future = scheduler.submit("a", LARGE, int, "not a number")
+
+    assert isinstance(future.exception(timeout=5), ValueError)
+    assert scheduler.submit("a", LARGE, int, "7").result(timeout=5) == 7
+
+
+def test_async_slots_cap_total_and_per_tenant():
+    async def run():
+        slots = AsyncPageSlots(limit=3, tenant_limit=2)
+        peak = {"total": 0, "a": 0}
+        running = {"a": 0}
+
+        async def page(tenant):
+            async with slots.slot(tenant):
+                running[tenant] = running.get(tenant, 0) + 1
+                peak["total"] = max(peak["total"], slots.in_flight)
+                peak["a"] = max(peak["a"], running.get("a", 0))
+                await asyncio.sleep(0.01)
+                running[tenant] -= 1
+
+        await asyncio.gather(*[page("a") for _ in range(6)], *[page("b") for _ in range(6)])
+        return slots, peak
+
+    slots, peak = asyncio.run(run())
+
+    assert peak == {"total": 3, "a": 2}
+    assert slots.in_flight == 0
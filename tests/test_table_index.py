@@ -0,0 +1,90 @@
+import csv
+
+import pytest
+
+from table_index import TableIndex, fts_query, like_pattern, line_item_column, parse_period
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("Quarter Ended December 31, 2024", {"period_type": "quarter", "period_end": "2024-12-31"}),
+    ("Nine Months Ended 31st December 2024", {"period_type": "nine_months", "period_end": "2024-12-31"}),
+    ("Half Year Ended 30-09-2024", {"period_type": "half_year", "period_end": "2024-09-30"}),
+    ("Year ended 31.03.24", {"period_type": "year", "period_end": "2024-03-31"}),
+    ("Particulars", {"period_type": None, "period_end": None}),
+])
+def test_parse_period(header, expected):
+    assert parse_period(header) == expected
+
+
+def test_parse_period_skips_impossible_dates():
+    assert parse_period("Quarter ended 31.02.2024")["period_end"] is None
+
+
+def test_line_item_column_from_header():
+    headers = ["Sr. No.", "Particulars", "Quarter Ended December 31, 2024"]
+    assert line_item_column(headers, [["I", "Revenue", "100"]]) == 1
+
+
+def test_line_item_column_skips_serial_numbers():
+    headers = ["", "", "Q3 FY25"]
+    rows = [["I", "Revenue from operations", "100"], ["II", "Other income", "5"], ["III", "Total income", "105"]]
+    assert line_item_column(headers, rows) == 1
+
+
+def test_line_item_column_without_text_column():
+    assert line_item_column(["Q1", "Q2"], [["1", "2"], ["3", "4"]]) is None
+
+
+def test_fts_query_quotes_every_word():
+    assert fts_query('revenue OR "tax') == '"revenue" "OR" """tax"'
+
+
+@pytest.fixture
+def index(tmp_path):
+    csv_path = tmp_path / "results.csv"
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ACME INDUSTRIES LIMITED - CONSOLIDATED FINANCIAL RESULTS"])
+        writer.writerow([])
+        writer.writerow(["Sr. No.", "Particulars", "Quarter Ended December 31, 2024", "Year Ended March 31, 2024"])
+        writer.writerow(["I", "Revenue from operations", "1,000.50", "3,900"])
+        writer.writerow(["II", "Other income (net)", "(20)", "80"])
+    index = TableIndex(str(tmp_path / "index.sqlite"))
+    index.ingest("ex1", "acme.pdf", [str(csv_path)])
+    return index
+
+
+def test_ingest_and_query(index):
+    facts = index.query(line_item="revenue", period_type="quarter")
+
+    assert len(facts) == 1
+    fact = facts[0]
+    assert fact["company"] == "ACME INDUSTRIES LIMITED"
+    assert (fact["statement_type"], fact["scope"]) == ("results", "consolidated")
+    assert (fact["period_end"], fact["value"]) == ("2024-12-31", 1000.5)
+
+
+@pytest.mark.parametrize("text", ['income (net)', 'income OR', '"other', 'NEAR(income', 'other*', 'a:b'])
+def test_query_syntax_in_user_input_is_literal(index, text):
+    # Must not raise sqlite3.OperationalError (FTS5 syntax error)
+    index.query(line_item=text)
+
+
+def test_like_pattern_escapes_wildcards():
+    assert like_pattern("50%_a\\b") == "%50\\%\\_a\\\\b%"
+
+
+def test_company_wildcards_are_literal(index):
+    assert len(index.query(company="acme")) == 4
+    assert index.query(company="%") == []
+    assert index.query(company="_") == []
+
+
+def test_negative_limit_is_not_unlimited(index):
+    assert len(index.query(limit=-1)) == 1
+    assert len(index.query(limit=0)) == 1
+
+
+def test_remove(index):
+    index.remove("ex1")
+    assert index.query(line_item="revenue") == []
@@ -0,0 +1,75 @@
+from table_regions import _merge_regions
+from tiling import FULL_PAGE, _drop_overlap, plan_bands, stitch_band_tables
+
+
+def band(*tables):
+    return {"has_tables": bool(tables), "tables": list(tables)}
+
+
+def test_overlapping_band_rows_are_kept_once():
+    first = band({"title": "Results", "headers": ["Item", "Q1"],
+                  "data": [["Revenue", "10"], ["Other income", "2"], ["Total income", "12"]]})
+    # The second band repeats the last two rows of the first, then its header row
+    second = band({"title": None, "headers": [],
+                   "data": [["Item", "Q1"], ["Other income", "2"], ["Total income", "12"], ["Expenses", "7"]]})
+
+    stitched = stitch_band_tables([first, second])
+
+    assert len(stitched) == 1
+    assert stitched[0]["data"] == [["Revenue", "10"], ["Other income", "2"], ["Total income", "12"],
+                                   ["Expenses", "7"]]
+
+
+def test_overlap_comparison_ignores_case_and_whitespace():
+    previous = [["Revenue", "10"], ["Other  income ", "2"]]
+    assert _drop_overlap(previous, [["other income", "2"], ["Expenses", "7"]], []) == [["Expenses", "7"]]
+
+
+def test_repeated_values_outside_the_overlap_are_kept():
+    previous = [["Revenue", "10"], ["Expenses", "7"]]
+    # "Revenue" appears earlier in the previous band, not at its end
+    assert _drop_overlap(previous, [["Revenue", "10"], ["Tax", "1"]], []) == [["Revenue", "10"], ["Tax", "1"]]
+
+
+def test_band_with_new_title_starts_a_new_table():
+    first = band({"title": "Standalone", "headers": ["Item"], "data": [["A"]]})
+    second = band({"title": "Consolidated", "headers": ["Item"], "data": [["A"]]})
+
+    stitched = stitch_band_tables([first, second])
+
+    assert [table["title"] for table in stitched] == ["Standalone", "Consolidated"]
+
+
+def test_headers_come_from_a_later_band_when_the_first_has_none():
+    first = band({"title": None, "headers": [], "data": [["A", "1"]]})
+    second = band({"title": None, "headers": ["Item", "Q1"], "data": [["B", "2"]]})
+
+    stitched = stitch_band_tables([first, second])
+
+    assert stitched[0]["headers"] == ["Item", "Q1"]
+    assert stitched[0]["data"] == [["A", "1"], ["B", "2"]]
+
+
+def test_dense_area_is_split_into_overlapping_bands():
+    # 40 text rows down the page, 100 tokens each
+    profile = [(0.5, i / 40, i / 40 + 0.01, 100.0) for i in range(40)]
+
+    bands = plan_bands(profile, FULL_PAGE, max_output_tokens=1000, target_fraction=1.0)
+
+    assert len(bands) > 1
+    assert bands[0][1] == 0.0 and bands[-1][3] == 1.0
+    for upper, lower in zip(bands, bands[1:]):
+        assert lower[1] < upper[3]
+
+
+def test_sparse_area_is_not_split():
+    profile = [(0.5, 0.1, 0.11, 10.0)]
+    assert plan_bands(profile, FULL_PAGE, max_output_tokens=8192) == [FULL_PAGE]
+
+
+def test_touching_regions_are_merged():
+    regions = [(0.1, 0.1, 0.4, 0.3), (0.39, 0.2, 0.6, 0.5), (0.1, 0.8, 0.3, 0.9)]
+
+    merged = _merge_regions(regions, pad=0.0)
+
+    assert sorted(merged) == [(0.1, 0.1, 0.6, 0.5), (0.1, 0.8, 0.3, 0.9)]
@@ -0,0 +1,57 @@
+from validation import normalize_label, parse_formula, validate_table
+
+HEADERS = ["Sr. No.", "Particulars", "Quarter Ended 31.12.2024", "Quarter Ended 30.09.2024"]
+
+
+def results_table(total_income=("1,100.00", "1,050.00"), profit=("300.00", "250.00")):
+    return {
+        "headers": HEADERS,
+        "data": [
+            ["I", "Revenue from operations", "1,000.00", "950.00"],
+            ["II", "Other income", "100.00", "100.00"],
+            ["III", "Total Income (I+II)", *total_income],
+            ["IV", "Expenses", "", ""],
+            ["a)", "Cost of materials consumed", "600.00", "(600.00)"],
+            ["b)", "Employee benefits expense", "200.00", "-"],
+            ["", "Total Expenses (a to b)", "800.00", "(600.00)"],
+            ["V", "Profit before tax (III-IV)", *profit],
+        ]
+    }
+
+
+def test_consistent_table_is_valid():
+    report = validate_table(results_table(profit=("300.00", "1,650.00")))
+
+    assert report["valid"], report["failures"]
+    # Total Income, Total Expenses and Profit before tax in both columns
+    assert report["checked"] == 6
+
+
+def test_failing_cell_is_reported():
+    report = validate_table(results_table(total_income=("1,100.00", "1,005.00"), profit=("300.00", "1,605.00")))
+
+    assert not report["valid"]
+    assert len(report["failures"]) == 1
+    failure = report["failures"][0]
+    assert (failure["row"], failure["column"], failure["formula"]) == (2, 3, "I+II")
+    assert (failure["expected"], failure["actual"]) == (1050.0, 1005.0)
+
+
+def test_rounding_within_tolerance_is_accepted():
+    report = validate_table(results_table(total_income=("1,100.01", "1,050.00"), profit=("300.01", "1,650.00")))
+    assert report["valid"], report["failures"]
+
+
+def test_table_without_identities_is_not_checked():
+    report = validate_table({"headers": ["Particulars", "Q1"], "data": [["Revenue", "10"], ["Other income", "2"]]})
+    assert report == {"checked": 0, "valid": True, "failures": []}
+
+
+def test_normalize_label():
+    assert [normalize_label(label) for label in ("(iv)", "a)", "III.", "12", "Total")] == ["iv", "a", "III", None, None]
+
+
+def test_parse_formula_needs_known_labels():
+    labels = {"I": [0], "II": [1]}
+    assert parse_formula("Total Income (I+II)", labels) == ("I+II", [(1, "I"), (1, "II")])
+    assert parse_formula("Total (I+IX)", labels) is None
@@ -0,0 +1,41 @@
+import csv
+
+from openpyxl import load_workbook
+
+from xlsx_export import numeric_cell, write_workbook
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(rows)
+    return str(path)
+
+
+def test_cells_and_page_metadata(tmp_path):
+    csv_path = write_csv(tmp_path / "table_page3_1.csv", [
+        ["Segment Results"],
+        [],
+        ["Particulars", "Q3"],
+        ["Revenue\x07 from operations", "(1,234.50)"],
+        ["=1+2", "0012"],
+    ])
+    xlsx_path = tmp_path / "tables.xlsx"
+
+    assert write_workbook([csv_path], str(xlsx_path), {csv_path: {"pages": [3]}}) == 1
+
+    sheet = load_workbook(xlsx_path).active
+    rows = [[cell.value for cell in row] for row in sheet.iter_rows()]
+    assert rows[0][0] == "Segment Results"
+    assert rows[1][0] == "Pages: 3"
+    assert rows[-2] == ["Revenue from operations", -1234.5]
+    assert rows[-1] == ["=1+2", "0012"]
+    formula_cell = sheet.cell(row=len(rows), column=1)
+    assert formula_cell.data_type == "s" and formula_cell.number_format == "@"
+
+
+def test_numeric_cell_formats():
+    assert numeric_cell("13,542.40") == (13542.4, "#,##0.00")
+    assert numeric_cell("(135.30)") == (-135.3, "0.00;(0.00)")
+    assert numeric_cell("12.5%") == (0.125, "0.0%")
+    assert numeric_cell("0012") is None
+    assert numeric_cell("-") is None
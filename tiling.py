@@ -0,0 +1,199 @@
+"""
+Adaptive tiling for pages whose tables overflow the model's output budget.
+
+The JSON for a dense schedule can exceed max_output_tokens, which truncates the
+response and loses the whole page. We estimate the output size of a page (or of
+a table region) from its text layer; when it is too large, the area is split
+into overlapping horizontal bands cut in the whitespace between text rows. The
+bands are extracted in parallel and their rows are stitched back together,
+dropping the rows duplicated by the overlap.
+
+Areas and bands are (x0, y0, x1, y1) fractions of the page, like the regions
+from table_regions.py.
+"""
+import math
+import re
+from typing import Dict, List, Tuple
+
+Area = Tuple[float, float, float, float]
+# (x centre, top, bottom, estimated output tokens) of one word, in page fractions
+WordCost = Tuple[float, float, float, float]
+
+FULL_PAGE: Area = (0.0, 0.0, 1.0, 1.0)
+
+# Rough token cost of a word in the model's JSON answer: the text itself plus
+# quotes, comma and whitespace around each cell
+CHARS_PER_TOKEN = 3.5
+JSON_TOKENS_PER_WORD = 2.0
+# Fixed cost of the JSON envelope, title and headers
+BASE_OUTPUT_TOKENS = 300
+# Largest number of rows compared when removing the overlap between bands
+MAX_OVERLAP_ROWS = 12
+
+BAND_PROMPT_NOTE = """
+
+        NOTE - THIS IMAGE IS A HORIZONTAL SLICE OF A LARGER PAGE:
+        - The table may start above or continue below this slice
+        - Extract every row that is fully visible, in order
+        - If the column headers are not visible, return "headers": []
+        - If the title is not visible, return "title": null
+        """
+
+
+def page_token_profiles(pdf_path: str) -> List[List[WordCost]]:
+    """
+    Compute the per-word output-token profile of every page
+
+    Args:
+        pdf_path (str): Path to the PDF file
+
+    Returns:
+        One list of word costs per page (empty for pages without a text layer)
+    """
+    import fitz
+
+    doc = fitz.open(pdf_path)
+    profiles = []
+    try:
+        for page in doc:
+            width, height = page.rect.width, page.rect.height
+            profile = []
+            if width > 0 and height > 0:
+                for x0, y0, x1, y1, text, *_ in page.get_text("words"):
+                    cost = len(text) / CHARS_PER_TOKEN + JSON_TOKENS_PER_WORD
+                    profile.append(((x0 + x1) / 2 / width, y0 / height, y1 / height, cost))
+            profiles.append(profile)
+    finally:
+        doc.close()
+    return profiles
+
+
+def _words_in_area(profile: List[WordCost], area: Area) -> List[WordCost]:
+    return [w for w in profile
+            if area[0] <= w[0] <= area[2] and area[1] <= (w[1] + w[2]) / 2 <= area[3]]
+
+
+def estimate_output_tokens(profile: List[WordCost], area: Area = FULL_PAGE) -> int:
+    """
+    Estimate how many output tokens the model needs to transcribe an area
+
+    Args:
+        profile (List[WordCost]): Word costs of the page
+        area (Area): Area of the page, as fractions
+
+    Returns:
+        int: Estimated output tokens (0 when the page has no text layer)
+    """
+    words = _words_in_area(profile, area)
+    if not words:
+        return 0
+    return int(BASE_OUTPUT_TOKENS + sum(w[3] for w in words))
+
+
+def plan_bands(profile: List[WordCost], area: Area, max_output_tokens: int,
+               target_fraction: float = 0.6, overlap: float = 0.02, count: int = None) -> List[Area]:
+    """
+    Split an area into overlapping horizontal bands that each fit the output budget
+
+    Args:
+        profile (List[WordCost]): Word costs of the page
+        area (Area): Area to split
+        max_output_tokens (int): Model output budget per request
+        target_fraction (float): Share of the budget each band should use
+        overlap (float): Overlap added above and below each cut, as a page fraction
+        count (int): Force this number of bands instead of estimating it
+
+    Returns:
+        List[Area]: Bands top to bottom; [area] when no split is needed
+    """
+    words = sorted(_words_in_area(profile, area), key=lambda w: w[1])
+
+    if count is None:
+        estimate = estimate_output_tokens(profile, area)
+        count = math.ceil(estimate / (max_output_tokens * target_fraction)) if estimate else 1
+    if count <= 1:
+        return [area]
+
+    x0, top, x1, bottom = area
+    cuts = []
+    if words:
+        # Cut where the running token total crosses k/count, in the gap below that row
+        total = sum(w[3] for w in words)
+        running, k = 0.0, 1
+        for i, word in enumerate(words[:-1]):
+            running += word[3]
+            if running >= total * k / count:
+                next_top = words[i + 1][1]
+                row_bottom = max(w[2] for w in words[:i + 1])
+                cut = (row_bottom + next_top) / 2 if next_top > row_bottom else word[2]
+                if not cuts or cut > cuts[-1]:
+                    cuts.append(cut)
+                k += 1
+                if k >= count:
+                    break
+    else:
+        # No text layer (scanned page): equal bands
+        cuts = [top + (bottom - top) * k / count for k in range(1, count)]
+
+    edges = [top] + cuts + [bottom]
+    return [
+        (x0, max(top, edges[i] - overlap), x1, min(bottom, edges[i + 1] + overlap))
+        for i in range(len(edges) - 1)
+    ]
+
+
+def is_truncated(result: Dict) -> bool:
+    """Whether an extraction result was cut off by the output token limit"""
+    return bool(result.get("truncated")) or result.get("error") == "parse_error"
+
+
+def _normalize_row(row: List) -> Tuple:
+    return tuple(re.sub(r'\s+', ' ', str(cell).strip().lower()) for cell in row)
+
+
+def _drop_overlap(previous_rows: List[List], new_rows: List[List], headers: List) -> List[List]:
+    """Remove the leading rows of a band that repeat the end of the previous band"""
+    normalized_headers = _normalize_row(headers) if headers else None
+    new_rows = [row for row in new_rows if _normalize_row(row) != normalized_headers]
+
+    previous = [_normalize_row(row) for row in previous_rows[-MAX_OVERLAP_ROWS:]]
+    current = [_normalize_row(row) for row in new_rows[:MAX_OVERLAP_ROWS]]
+    for size in range(min(len(previous), len(current)), 0, -1):
+        if previous[-size:] == current[:size]:
+            return new_rows[size:]
+    return new_rows
+
+
+def stitch_band_tables(band_results: List[Dict]) -> List[Dict]:
+    """
+    Stitch the tables extracted from consecutive bands back together
+
+    The first table of each band (after the first) continues the last table of
+    the previous band unless it carries a different title.
+
+    Args:
+        band_results (List[Dict]): Extraction results of the bands, top to bottom
+
+    Returns:
+        List[Dict]: Stitched tables
+    """
+    stitched = []
+    for band_index, result in enumerate(band_results):
+        tables = result.get("tables", []) if result.get("has_tables") else []
+        for table_index, table in enumerate(tables):
+            table = dict(table)
+            table["data"] = list(table.get("data", []))
+
+            if band_index > 0 and table_index == 0 and stitched:
+                previous = stitched[-1]
+                title = (table.get("title") or "").strip().lower()
+                previous_title = (previous.get("title") or "").strip().lower()
+                if not title or title == previous_title:
+                    previous["data"].extend(
+                        _drop_overlap(previous["data"], table["data"], previous.get("headers")))
+                    if not previous.get("headers") and table.get("headers"):
+                        previous["headers"] = table["headers"]
+                    continue
+
+            stitched.append(table)
+    return stitched
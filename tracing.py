@@ -0,0 +1,209 @@
+"""
+Opt-in per-job tracing for PDFTableExtractor.
+
+A JobTrace records timed spans (render, encode, model call, parse, grouping,
+save, ...) from any thread and writes them as Chrome trace-event JSON, which can
+be opened in chrome://tracing or https://ui.perfetto.dev to see pipeline overlap
+and stalls. Optionally it also runs cProfile on the job thread and a sampling
+stack profiler over all threads, whose folded-stack output feeds flamegraph.pl
+or speedscope. Profiling slows the job down and one profiler sees every thread,
+so only one job at a time is profiled; a job that finds the profilers taken
+records its spans only.
+
+NULL_TRACE is a no-op stand-in so callers can always write
+
+    with trace.span("parse", page=3):
+        ...
+"""
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+# Held by the one job whose profilers are running
+_profiling_lock = threading.Lock()
+
+
+class JobTrace:
+    """Collects spans for a single extraction job"""
+
+    def __init__(self, name: str, profile: bool = False, sample_interval: Optional[float] = None):
+        """
+        Args:
+            name (str): Job name shown as the process name in the trace viewer
+            profile (bool): Run cProfile on the thread that starts the trace
+            sample_interval (float): Seconds between stack samples of all threads,
+                None disables the sampling profiler
+        """
+        self.name = name
+        self.enabled = True
+        self._events = []
+        self._thread_names = {}
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+
+        self._profiler = cProfile.Profile() if profile else None
+        self._sample_interval = sample_interval
+        self._samples = Counter()
+        self._sampler = None
+        self._stop_sampling = threading.Event()
+        self._profiling = False
+
+    def _now_us(self) -> float:
+        return (time.perf_counter() - self._origin) * 1_000_000
+
+    def _record(self, event: Dict):
+        thread = threading.current_thread()
+        event["pid"] = self._pid
+        event["tid"] = thread.ident
+        with self._lock:
+            self._thread_names.setdefault(thread.ident, thread.name)
+            self._events.append(event)
+
+    @contextmanager
+    def span(self, name: str, category: str = "pipeline", **args):
+        """
+        Record a complete ("X") event around a block of code
+
+        Args:
+            name (str): Span name, e.g. "render" or "model_call"
+            category (str): Trace category
+            **args: Extra details shown in the viewer (page number, model, ...)
+        """
+        start = self._now_us()
+        try:
+            yield
+        finally:
+            self._record({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start,
+                "dur": self._now_us() - start,
+                "args": args
+            })
+
+    def instant(self, name: str, category: str = "pipeline", **args):
+        """Record a point-in-time ("i") event"""
+        self._record({
+            "name": name,
+            "cat": category,
+            "ph": "i",
+            "s": "t",
+            "ts": self._now_us(),
+            "args": args
+        })
+
+    def start(self):
+        """Start the optional profilers, unless another job is being profiled"""
+        if not (self._profiler or self._sample_interval):
+            return
+        if not _profiling_lock.acquire(blocking=False):
+            print(f"Profiler busy with another job, tracing {self.name} without profiling")
+            self._profiler = None
+            self._sample_interval = None
+            return
+        self._profiling = True
+        if self._profiler:
+            self._profiler.enable()
+        if self._sample_interval:
+            self._sampler = threading.Thread(target=self._sample_loop, name="trace-sampler", daemon=True)
+            self._sampler.start()
+
+    def stop(self):
+        """Stop the optional profilers (safe to call more than once)"""
+        if not self._profiling:
+            return
+        if self._profiler:
+            self._profiler.disable()
+        if self._sampler:
+            self._stop_sampling.set()
+            self._sampler.join()
+            self._sampler = None
+        self._profiling = False
+        _profiling_lock.release()
+
+    def _sample_loop(self):
+        own_ident = threading.get_ident()
+        while not self._stop_sampling.wait(self._sample_interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                    frame = frame.f_back
+                thread_name = self._thread_names.get(ident, str(ident))
+                self._samples[";".join([thread_name] + stack[::-1])] += 1
+
+    def write(self, output_dir: Path, base_name: str) -> Dict[str, str]:
+        """
+        Write the trace and any profiler output next to the job's other outputs
+
+        Args:
+            output_dir (Path): Job output directory
+            base_name (str): File name prefix, usually the PDF name
+
+        Returns:
+            Dict[str, str]: Paths of the written files by kind
+        """
+        output_dir = Path(output_dir)
+        files = {}
+
+        with self._lock:
+            events = list(self._events)
+            thread_names = dict(self._thread_names)
+
+        metadata = [{"name": "process_name", "ph": "M", "pid": self._pid, "args": {"name": self.name}}]
+        for tid, thread_name in thread_names.items():
+            metadata.append({"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid,
+                             "args": {"name": thread_name}})
+
+        trace_path = output_dir / f"{base_name}_trace.json"
+        with open(trace_path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+        files["trace"] = str(trace_path)
+
+        if self._profiler:
+            profile_path = output_dir / f"{base_name}_profile.prof"
+            self._profiler.dump_stats(str(profile_path))
+            files["profile"] = str(profile_path)
+
+        if self._samples:
+            folded_path = output_dir / f"{base_name}_stacks.folded"
+            with open(folded_path, 'w', encoding='utf-8') as f:
+                for stack, count in self._samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            files["stacks"] = str(folded_path)
+
+        return files
+
+
+class _NullTrace:
+    """No-op trace used when tracing is disabled"""
+
+    enabled = False
+
+    @contextmanager
+    def span(self, name: str, category: str = "pipeline", **args):
+        yield
+
+    def instant(self, name: str, category: str = "pipeline", **args):
+        pass
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+NULL_TRACE = _NullTrace()
@@ -0,0 +1,105 @@
+"""
+Token usage accounting and budgets.
+
+Every model call reports its input/output token counts (see model_transport.py)
+and the size of the image it sent. The counts are summed per page, per model and
+per job into the results of process_pdf, and recorded per API key in a
+process-wide TokenLedger over a sliding window.
+
+Budgets are checked before each page is extracted:
+
+* JOB_TOKEN_BUDGET caps the tokens of one document
+* KEY_TOKEN_BUDGET caps the tokens of one API key over KEY_BUDGET_WINDOW_SECONDS
+
+Once a budget is exhausted, BUDGET_ACTION decides what happens to the remaining
+pages: "stop" skips them, "degrade" keeps extracting them with the first model
+of the cascade only and without re-extraction retries.
+"""
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, Optional
+
+import config
+
+USAGE_FIELDS = ("input_tokens", "output_tokens", "calls", "image_pixels")
+
+
+def empty_usage() -> Dict[str, int]:
+    return {field: 0 for field in USAGE_FIELDS}
+
+
+def sum_usage(results: Iterable[Dict]) -> Dict[str, int]:
+    """Add up the "usage" of extraction results (or plain usage dicts)"""
+    total = empty_usage()
+    for result in results:
+        usage = result.get("usage", result) if result else None
+        for field in USAGE_FIELDS:
+            total[field] += (usage or {}).get(field, 0) or 0
+    return total
+
+
+def total_tokens(usage: Dict) -> int:
+    return (usage.get("input_tokens") or 0) + (usage.get("output_tokens") or 0)
+
+
+def estimate_cost(model_name: str, usage: Dict) -> Optional[float]:
+    """
+    Cost of a model's usage from config.MODEL_PRICES
+
+    Returns:
+        Cost in the price list's currency, None if the model has no price
+    """
+    prices = config.MODEL_PRICES.get(model_name)
+    if not prices:
+        return None
+    input_price, output_price = prices
+    return round((usage.get("input_tokens", 0) * input_price
+                  + usage.get("output_tokens", 0) * output_price) / 1_000_000, 6)
+
+
+class TokenLedger:
+    """Tokens used per API key over a sliding window"""
+
+    def __init__(self, window_seconds: float = None):
+        """
+        Args:
+            window_seconds (float): Length of the window budgets apply to
+        """
+        self.window_seconds = config.KEY_BUDGET_WINDOW_SECONDS if window_seconds is None else window_seconds
+        self._entries = {}  # key -> deque of (timestamp, tokens)
+        self._totals = {}  # key -> tokens within the window
+        self._lock = threading.Lock()
+
+    def _expire(self, key: str, now: float):
+        entries = self._entries.get(key)
+        while entries and now - entries[0][0] > self.window_seconds:
+            self._totals[key] -= entries.popleft()[1]
+
+    def record(self, key: str, tokens: int):
+        """Add tokens spent by a key"""
+        if not tokens:
+            return
+        now = time.time()
+        with self._lock:
+            self._expire(key, now)
+            self._entries.setdefault(key, deque()).append((now, tokens))
+            self._totals[key] = self._totals.get(key, 0) + tokens
+
+    def used(self, key: str) -> int:
+        """Tokens spent by a key within the window"""
+        with self._lock:
+            self._expire(key, time.time())
+            return self._totals.get(key, 0)
+
+    def exhausted(self, key: str) -> bool:
+        """Whether a key has used up config.KEY_TOKEN_BUDGET"""
+        return bool(config.KEY_TOKEN_BUDGET) and self.used(key) >= config.KEY_TOKEN_BUDGET
+
+
+_ledger = TokenLedger()
+
+
+def get_token_ledger() -> TokenLedger:
+    """Process-wide ledger shared by all jobs"""
+    return _ledger
@@ -0,0 +1,178 @@
+"""
+Arithmetic validation of extracted financial tables.
+
+Result statements spell out their own subtotal identities in the row labels:
+"Total Income (I+II)", "Profit before Tax (V-VI)", "Total Expenses (a to g)".
+validate_table resolves those references to rows through the serial number
+column (I, II, ... / a), b), ...) and checks every identity in every value
+column at once with matrix arithmetic, so a table with hundreds of cells costs
+one DataFrame conversion and one matrix product.
+
+Failures are reported per cell; the extractor uses them to re-extract only the
+pages holding failing rows instead of the whole document.
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+from table_index import line_item_column
+
+_ROMAN = re.compile(r'^[IVXL]+$')
+_LABEL_IN_TEXT = re.compile(r'^\(?([IVXL]+|[a-z])[).]\s+')
+_FORMULA = re.compile(r'\(\s*([A-Za-z]{1,5}(?:\s*[+\-]\s*[A-Za-z]{1,5})+|[a-z]\s+to\s+[a-z])\s*\)')
+
+# Cells are rounded to 2 decimals, so each term may be off by half a unit
+ROUNDING_PER_TERM = 0.01
+RELATIVE_TOLERANCE = 1e-4
+
+
+def normalize_label(label: str) -> Optional[str]:
+    """Serial number as a reference key: "(iv)" -> "iv", "a)" -> "a", "III." -> "III" """
+    label = (label or "").strip().strip('().').strip()
+    if _ROMAN.match(label) or re.match(r'^([a-z]|[ivxl]+)$', label):
+        return label
+    return None
+
+
+def parse_formula(text: str, labels: Dict[str, List[int]]) -> Optional[Tuple[str, List[Tuple[int, str]]]]:
+    """
+    Identity referenced in a line item, e.g. "Total Income (I+II)"
+
+    Args:
+        text (str): Line item text
+        labels (Dict[str, List[int]]): Known serial number labels of the table
+
+    Returns:
+        (expression, list of (sign, label) terms), or None when the text holds
+        no identity made only of known labels
+    """
+    for match in reversed(list(_FORMULA.finditer(text or ""))):
+        expression = match.group(1)
+
+        span = re.match(r'^([a-z])\s+to\s+([a-z])$', expression)
+        if span:
+            first, last = ord(span.group(1)), ord(span.group(2))
+            terms = [(1, chr(c)) for c in range(first, last + 1) if chr(c) in labels]
+            if terms:
+                return expression, terms
+            continue
+
+        tokens = re.findall(r'([+\-]?)\s*([A-Za-z]+)', expression)
+        terms = [(-1 if sign == '-' else 1, label) for sign, label in tokens]
+        if all(label in labels for _, label in terms):
+            return expression, terms
+    return None
+
+
+def numeric_frame(rows: List[List[str]], width: int):
+    """
+    Parse all cells to numbers in one vectorized pass
+
+    Handles thousands separators, "(x)" negatives and "-" for nil; text cells
+    become NaN.
+    """
+    import pandas as pd
+
+    frame = pd.DataFrame([list(row[:width]) + [''] * (width - len(row)) for row in rows], dtype=object)
+    cells = frame.astype(str).apply(lambda column: column.str.strip().str.replace(r'[,₹\s]', '', regex=True))
+    cells = cells.replace({'-': '0', '–': '0', '—': '0'})
+    cells = cells.apply(lambda column: column.str.replace(r'^\((.+)\)$', r'-\1', regex=True))
+    return cells.apply(pd.to_numeric, errors='coerce')
+
+
+def validate_table(table: Dict) -> Dict:
+    """
+    Check the subtotal and total identities of a table
+
+    Args:
+        table (Dict): Table with "headers" and "data" (rows of strings)
+
+    Returns:
+        Dict with "checked" (cells checked), "valid" and "failures", a list of
+        {"row", "column", "header", "formula", "expected", "actual"}
+    """
+    import numpy as np
+
+    headers = list(table.get("headers") or [])
+    rows = [[str(cell) if cell is not None else '' for cell in row] for row in table.get("data") or []]
+    report = {"checked": 0, "valid": True, "failures": []}
+    if not rows:
+        return report
+
+    width = max(len(headers), max(len(row) for row in rows))
+    headers += [f"Column_{i + 1}" for i in range(len(headers), width)]
+    item_col = line_item_column(headers, rows)
+    if item_col is None:
+        return report
+
+    items = [row[item_col] if item_col < len(row) else '' for row in rows]
+    values = numeric_frame(rows, width).to_numpy(dtype=float)[:, item_col + 1:]
+    present = ~np.isnan(values)
+
+    # Serial number labels, from the column left of the line items or the item text
+    row_labels = {}
+    for i, row in enumerate(rows):
+        label = normalize_label(row[item_col - 1]) if 0 < item_col <= len(row) else None
+        if label is None:
+            match = _LABEL_IN_TEXT.match(items[i].strip())
+            label = normalize_label(match.group(1)) if match else None
+        if label:
+            row_labels[i] = label
+
+    # Rows each label stands for
+    labels = {}
+    for i, label in row_labels.items():
+        if label in labels:
+            continue
+        labels[label] = [i]
+        if present[i].any():
+            # "Tax Expense - Current Tax" followed by "- Deferred Tax": the label covers both
+            if re.search(r'\s-\s', items[i]):
+                for j in range(i + 1, len(rows)):
+                    if j in row_labels or not items[j].strip().startswith('-'):
+                        break
+                    labels[label].append(j)
+            continue
+        # A label on a heading row ("IV Expenses") stands for the total closing its block
+        for j in range(i + 1, len(rows)):
+            if _ROMAN.match(row_labels.get(j, '')):
+                break
+            if items[j].strip().lower().startswith('total') and present[j].any():
+                labels[label] = [j]
+                break
+
+    identities = []
+    for i, item in enumerate(items):
+        formula = parse_formula(item, labels)
+        if formula and all(i not in labels[label] for _, label in formula[1]):
+            identities.append((i, formula[1], formula[0]))
+    if not identities:
+        return report
+
+    # Expected totals for every identity and column at once
+    coefficients = np.zeros((len(identities), len(rows)))
+    for k, (_, terms, _) in enumerate(identities):
+        for sign, label in terms:
+            coefficients[k, labels[label]] += sign
+    expected = coefficients @ np.nan_to_num(values)
+    referenced = np.abs(coefficients) @ present.astype(float) > 0
+
+    targets = [i for i, _, _ in identities]
+    actual = values[targets]
+    terms_count = np.abs(coefficients).sum(axis=1, keepdims=True)
+    tolerance = ROUNDING_PER_TERM * (terms_count + 1) + RELATIVE_TOLERANCE * np.abs(actual)
+    checked = present[targets] & referenced
+    failed = checked & (np.abs(expected - np.nan_to_num(actual)) > tolerance)
+
+    report["checked"] = int(checked.sum())
+    for k, col in zip(*np.nonzero(failed)):
+        row, _, formula = identities[k]
+        report["failures"].append({
+            "row": int(row),
+            "column": int(col + item_col + 1),
+            "header": headers[col + item_col + 1],
+            "formula": formula,
+            "expected": round(float(expected[k, col]), 2),
+            "actual": round(float(actual[k, col]), 2)
+        })
+    report["valid"] = not report["failures"]
+    return report
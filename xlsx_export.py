@@ -0,0 +1,129 @@
+"""
+XLSX workbook export of extracted tables.
+
+Every combined table becomes one sheet: the title and source pages in header
+rows, then the table's header row and its data rows. The workbook is written
+with openpyxl's write-only mode and the CSVs are read row by row, so memory
+stays flat however many rows the tables hold.
+
+Cells that are amounts ("13,542.40", "(135.30)", "12.5%") are written as real
+numbers with a number format matching the filing; everything else is written
+as a text-formatted string, so text such as "=1+2" or "0012" is never
+reinterpreted by Excel. Control characters, which XML cannot hold, are dropped.
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from amounts import parse_amount
+from artifacts import TableCSVReader, logical_name
+
+MAX_SHEET_TITLE = 31
+_INVALID_SHEET_CHARS = re.compile(r'[\[\]:*?/\\]')
+# Nil markers and zero-padded codes ("0012") stay text
+_NUMBER = re.compile(r'^\(?-?(0|[1-9][0-9,]*)(\.[0-9]+)?\)?%?$')
+
+
+def sheet_title(name: str, used: set) -> str:
+    """
+    Valid, unique worksheet name for a table
+
+    Args:
+        name (str): Table or file name
+        used (set): Names already taken in the workbook, updated in place
+    """
+    base = _INVALID_SHEET_CHARS.sub('_', name).strip("' ") or "Table"
+    title = base[:MAX_SHEET_TITLE]
+    counter = 2
+    while title.lower() in used:
+        suffix = f" ({counter})"
+        title = base[:MAX_SHEET_TITLE - len(suffix)] + suffix
+        counter += 1
+    used.add(title.lower())
+    return title
+
+
+def number_format(text: str) -> str:
+    """Excel number format reproducing an amount's separators and decimals"""
+    value = text.strip().replace('₹', '').replace(' ', '')
+    decimals = len(value.strip('()%').partition('.')[2])
+    digits = '0.' + '0' * decimals if decimals else '0'
+    if value.endswith('%'):
+        return digits + '%'
+    positive = ('#,##' + digits) if ',' in value else digits
+    return f"{positive};({positive})" if value.startswith('(') else positive
+
+
+def numeric_cell(text: str) -> Optional[Tuple[float, str]]:
+    """(value, number format) for an amount cell, None for text"""
+    if not _NUMBER.match(text.strip().replace('₹', '').replace(' ', '')):
+        return None
+    value = parse_amount(text)
+    if value is None:
+        return None
+    fmt = number_format(text)
+    if fmt.endswith('%'):
+        value /= 100
+    return value, fmt
+
+
+def _cells(sheet, values: Iterable[str], font=None) -> List:
+    """Write-only cells: amounts as numbers, everything else as strings (header cells always)"""
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    cells = []
+    for text in values:
+        text = '' if text is None else str(text)
+        number = None if font else numeric_cell(text)
+        if number:
+            cell = WriteOnlyCell(sheet, value=number[0])
+            cell.number_format = number[1]
+        else:
+            cell = WriteOnlyCell(sheet, value=ILLEGAL_CHARACTERS_RE.sub('', text))
+            # Strings starting with "=" stay text, not formulas
+            cell.data_type = 's'
+            cell.number_format = '@'
+        if font:
+            cell.font = font
+        cells.append(cell)
+    return cells
+
+
+def write_workbook(csv_files: List[str], xlsx_path: str, table_pages: Dict[str, Dict] = None) -> int:
+    """
+    Write one sheet per table CSV into an XLSX workbook
+
+    Args:
+        csv_files (List[str]): Table CSV artifacts, compressed or not
+        xlsx_path (str): Workbook to create
+        table_pages (Dict[str, Dict]): CSV path -> {"pages": [...]} from the
+            extraction results; single-page tables only have their pages there
+
+    Returns:
+        int: Number of sheets written
+    """
+    from openpyxl import Workbook
+    from openpyxl.styles import Font
+
+    workbook = Workbook(write_only=True)
+    bold = Font(bold=True)
+    used = set()
+
+    for csv_file in csv_files:
+        with TableCSVReader(csv_file) as table:
+            name = logical_name(csv_file).rsplit('.', 1)[0]
+            sheet = workbook.create_sheet(sheet_title(name, used))
+
+            sheet.append(_cells(sheet, [table.title or name], bold))
+            pages = table.pages or (table_pages or {}).get(csv_file, {}).get("pages")
+            if pages:
+                sheet.append(_cells(sheet, ["Pages: " + ", ".join(str(p) for p in pages)]))
+            sheet.append([])
+            sheet.append(_cells(sheet, table.headers, bold))
+            for row in table.rows():
+                sheet.append(_cells(sheet, row))
+
+    if not used:
+        workbook.create_sheet("Tables")
+    workbook.save(xlsx_path)
+    return len(used)